@@ -80,7 +80,24 @@ class Settings(BaseSettings):
     QUEUE_MAX_SIZE: int = Field(default=10000)
     QUEUE_VISIBILITY_TIMEOUT: int = Field(default=300)  # 5分钟
     QUEUE_MAX_RETRIES: int = Field(default=3)
+    # 单股分析失败后从图检查点恢复的重试次数（需启用 TA_CHECKPOINT_ENABLED）
+    ANALYSIS_RESUME_MAX_RETRIES: int = Field(default=1)
+    # 通过 WebSocket 推送运行中节点的 LLM 输出（按间隔合并推送）
+    LLM_TOKEN_STREAM_ENABLED: bool = Field(default=True)
+    LLM_TOKEN_STREAM_FLUSH_MS: int = Field(default=100)
+    # 记忆库（ChromaDB）定期压缩：近似重复合并、过期淘汰、容量上限（仅 persistent / http 模式，memory 模式重启即清空）
+    MEMORY_COMPACTION_ENABLED: bool = Field(default=True)
+    MEMORY_COMPACTION_CRON: str = Field(default="30 2 * * *")  # 每日凌晨2:30
+    MEMORY_MAX_ITEMS_PER_COLLECTION: int = Field(default=2000)
+    MEMORY_DEDUP_SIMILARITY: float = Field(default=0.95)
+    MEMORY_MAX_AGE_DAYS: int = Field(default=180)  # 超过天数且从未被检索到的记忆将被淘汰
+    MEMORY_RETENTION_HALF_LIFE_DAYS: float = Field(default=90.0)
     WORKER_HEARTBEAT_INTERVAL: int = Field(default=30)  # 30秒
+    # 单个 Worker 进程同时执行的分析任务数（分析主要在等待 LLM 响应）
+    # 队列全局并发上限（系统设置 max_concurrent_tasks，默认 3）之外的槽位领取不到任务，Worker 启动时按上限截断
+    WORKER_MAX_CONCURRENT_TASKS: int = Field(default=3)
+    # 收到 SIGTERM 后等待执行中任务完成的最长时间，超时的任务停止并交还租约，以相同ID重新入队（不计重试次数）
+    WORKER_SHUTDOWN_TIMEOUT_SECONDS: float = Field(default=600.0)
 
 
     # 队列轮询/清理间隔（秒）
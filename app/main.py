@@ -174,6 +174,22 @@ async def _print_config_summary(logger):
         logger.error(f"Failed to print config summary: {e}")
 
 
+async def _compact_memory_collections():
+    """定时压缩记忆库（在线程池中执行，避免阻塞事件循环）"""
+    from tradingagents.agents.utils.memory_maintenance import compact_memory_collections
+
+    try:
+        await asyncio.to_thread(
+            compact_memory_collections,
+            max_items=settings.MEMORY_MAX_ITEMS_PER_COLLECTION,
+            dedup_similarity=settings.MEMORY_DEDUP_SIMILARITY,
+            max_age_days=settings.MEMORY_MAX_AGE_DAYS,
+            half_life_days=settings.MEMORY_RETENTION_HALF_LIFE_DAYS,
+        )
+    except Exception as e:
+        logging.getLogger("app.main").error(f"❌ 记忆库压缩失败: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
@@ -195,11 +211,30 @@ async def lifespan(app: FastAPI):
     # 显示配置摘要
     await _print_config_summary(logger)
 
+    # 定时任务
+    scheduler = AsyncIOScheduler(timezone=settings.TIMEZONE)
+    from tradingagents.agents.utils.chromadb_config import get_chromadb_mode
+    memory_mode = get_chromadb_mode()
+    if settings.MEMORY_COMPACTION_ENABLED and memory_mode == "memory":
+        logger.info("🧹 记忆库为内存模式（TA_CHROMA_MODE=memory），重启即清空，不启用压缩任务")
+    elif settings.MEMORY_COMPACTION_ENABLED:
+        scheduler.add_job(
+            _compact_memory_collections,
+            CronTrigger.from_crontab(settings.MEMORY_COMPACTION_CRON, timezone=settings.TIMEZONE),
+            id="memory_compaction",
+            name="记忆库压缩",
+            max_instances=1,
+            coalesce=True,
+        )
+        logger.info(f"🧹 记忆库压缩任务已启用（{memory_mode}模式）: {settings.MEMORY_COMPACTION_CRON}")
+    scheduler.start()
+
     logger.info("TradingAgents FastAPI backend started")
 
     try:
         yield
     finally:
+        scheduler.shutdown(wait=False)
         await close_db()
         logger.info("TradingAgents FastAPI backend stopped")
 
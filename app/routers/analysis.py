@@ -16,6 +16,7 @@ from app.routers.auth_db import get_current_user
 from app.services.queue.queue_service import get_queue_service, QueueService
 from app.services.analysis.analysis_service import get_analysis_service
 from app.services.analysis.simple_analysis_service import get_simple_analysis_service
+from app.services.analysis.performance_statistics_service import performance_statistics_service
 from app.services.websocket_manager import get_websocket_manager
 from app.models.analysis import (
     SingleAnalysisRequest, BatchAnalysisRequest, AnalysisParameters,
@@ -39,6 +40,10 @@ class BatchAnalyzeRequest(BaseModel):
     description: Optional[str] = Field(None, description="批次描述")
 
 
+class UserWeightRequest(BaseModel):
+    weight: float = Field(..., gt=0, description="调度权重：同一优先级中每轮获得的执行时间配额倍数")
+
+
 # 新版API端点
 @router.post("/single", response_model=Dict[str, Any])
 async def submit_single_analysis(
@@ -152,6 +157,15 @@ async def get_task_status_new(
                 if start_time:
                     elapsed_time = (current_time - start_time).total_seconds()
 
+                # 按同类任务的历史耗时估计总耗时与剩余时间
+                estimated_total_time = 0
+                try:
+                    estimated_total_time = round(
+                        await get_queue_service().estimate_duration(task_result.get("parameters"))
+                    )
+                except Exception as e:
+                    logger.warning(f"⚠️ [STATUS] 估计任务耗时失败: {e}")
+
                 status_data = {
                     "task_id": task_id,
                     "status": status,
@@ -161,8 +175,8 @@ async def get_task_status_new(
                     "start_time": start_time,
                     "end_time": task_result.get("completed_at"),
                     "elapsed_time": elapsed_time,
-                    "remaining_time": 0,  # 无法准确估算
-                    "estimated_total_time": 0,
+                    "remaining_time": max(estimated_total_time - elapsed_time, 0) if status != "completed" else 0,
+                    "estimated_total_time": estimated_total_time,
                     "symbol": task_result.get("symbol") or task_result.get("stock_code"),
                     "stock_code": task_result.get("symbol") or task_result.get("stock_code"),  # 兼容字段
                     "stock_symbol": task_result.get("symbol") or task_result.get("stock_code"),
@@ -1124,13 +1138,55 @@ async def get_task_details(
         user: dict = Depends(get_current_user),
         svc: QueueService = Depends(get_queue_service)
 ):
-    """获取任务详情（使用不同的路径避免冲突）"""
+    """获取任务详情（使用不同的路径避免冲突），包含预计剩余耗时 eta"""
     t = await svc.get_task(task_id)
     if not t or t.get("user") != user["id"]:
         raise HTTPException(status_code=404, detail="任务不存在")
+    t["eta"] = await svc.get_task_eta(task_id)
     return t
 
 
+# ==================== 性能统计 ====================
+
+@router.get("/performance/nodes", response_model=Dict[str, Any])
+async def get_node_performance_stats(
+        days: int = Query(default=7, ge=1, le=90, description="统计时间窗口（天）"),
+        research_depth: Optional[str] = Query(default=None, description="按分析深度过滤"),
+        user: dict = Depends(get_current_user)
+):
+    """按节点统计耗时与 token 的 p50/p95，用于定位需要优化的节点"""
+    try:
+        stats = await performance_statistics_service.get_node_percentiles(
+            days=days,
+            research_depth=research_depth
+        )
+        return {
+            "success": True,
+            "data": stats,
+            "message": "节点性能统计获取成功"
+        }
+    except Exception as e:
+        logger.error(f"❌ 获取节点性能统计失败: {e}")
+        raise HTTPException(status_code=500, detail=f"获取节点性能统计失败: {str(e)}")
+
+
+@router.get("/performance/runtime", response_model=Dict[str, Any])
+async def get_runtime_performance_stats(
+        user: dict = Depends(get_current_user)
+):
+    """当前 API 进程的运行时指标：LLM 响应缓存与 embedding 缓存命中率、LLM 连接复用率、并发上限与排队等待、ChromaDB 锁等待"""
+    try:
+        stats = await asyncio.to_thread(performance_statistics_service.get_runtime_stats)
+        return {
+            "success": True,
+            "data": stats,
+            "message": "运行时指标获取成功"
+        }
+    except Exception as e:
+        logger.error(f"❌ 获取运行时指标失败: {e}")
+        raise HTTPException(status_code=500, detail=f"获取运行时指标失败: {str(e)}")
+
+
 # ==================== 僵尸任务管理 ====================
 
 @router.get("/admin/zombie-tasks")
@@ -1188,6 +1244,30 @@ async def cleanup_zombie_tasks(
         raise HTTPException(status_code=500, detail=f"清理僵尸任务失败: {str(e)}")
 
 
+@router.put("/admin/queue/user-weights/{user_id}")
+async def set_queue_user_weight(
+        user_id: str,
+        req: UserWeightRequest,
+        user: dict = Depends(get_current_user),
+        svc: QueueService = Depends(get_queue_service)
+):
+    """设置用户在任务队列中的调度权重（仅管理员）
+
+    权重为 2 的用户在同一优先级中获得约 2 倍于默认用户的执行时间
+    """
+    # 检查管理员权限
+    if user.get("username") != "admin":
+        raise HTTPException(status_code=403, detail="仅管理员可访问")
+
+    await svc.set_user_weight(user_id, req.weight)
+    logger.info(f"⚖️ [队列] 用户调度权重已更新: {user_id} -> {req.weight}")
+    return {
+        "success": True,
+        "data": {"user_id": user_id, "weight": req.weight},
+        "message": "用户调度权重已更新"
+    }
+
+
 @router.post("/tasks/{task_id}/mark-failed")
 async def mark_task_as_failed(
         task_id: str,
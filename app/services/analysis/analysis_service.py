@@ -4,8 +4,9 @@
 """
 
 import asyncio
+import functools
+import threading
 import uuid
-import json
 import logging
 from datetime import datetime
 from typing import Dict, Any, List, Optional, Callable
@@ -21,7 +22,7 @@ from tradingagents.utils.logging_init import init_logging
 
 init_logging()
 
-from tradingagents.graph.trading_graph import TradingAgentsGraph
+from tradingagents.graph.trading_graph import GraphRunCancelled, TradingAgentsGraph
 from tradingagents.default_config import DEFAULT_CONFIG
 
 from app.models.analysis import (
@@ -58,7 +59,6 @@ class AnalysisService:
 
         # 初始化使用统计服务
         self.usage_service = UsageStatisticsService()
-        self._trading_graph_cache = {}
 
         # 进度跟踪器缓存
         self._progress_trackers: Dict[str, RedisProgressTracker] = {}
@@ -94,21 +94,21 @@ class AnalysisService:
             return PyObjectId(new_object_id)
 
     def _get_trading_graph(self, config: Dict[str, Any]) -> TradingAgentsGraph:
-        """获取或创建TradingAgents图实例（带缓存）- 与单股分析保持一致"""
-        config_key = json.dumps(config, sort_keys=True)
-
-        if config_key not in self._trading_graph_cache:
-            # 直接使用完整配置，不再合并DEFAULT_CONFIG（因为create_analysis_config已经处理了）
-            # 这与单股分析服务和web目录的方式一致
-            self._trading_graph_cache[config_key] = TradingAgentsGraph(
-                selected_analysts=config.get("selected_analysts", ["market", "fundamentals"]),
-                debug=config.get("debug", False),
-                config=config
-            )
+        """创建TradingAgents图实例 - 与单股分析保持一致
 
-            logger.info(f"创建新的TradingAgents实例: {config.get('llm_provider', 'default')}")
+        ⚠️ 每个任务使用独立实例：Worker 并发执行多个任务，TradingAgentsGraph 含可变状态
+        （ticker、curr_state、_current_task_id 等），共享实例会导致任务间数据混淆
+        """
+        # 直接使用完整配置，不再合并DEFAULT_CONFIG（因为create_analysis_config已经处理了）
+        # 这与单股分析服务和web目录的方式一致
+        trading_graph = TradingAgentsGraph(
+            selected_analysts=config.get("selected_analysts", ["market", "fundamentals"]),
+            debug=config.get("debug", False),
+            config=config
+        )
 
-        return self._trading_graph_cache[config_key]
+        logger.info(f"创建新的TradingAgents实例: {config.get('llm_provider', 'default')}")
+        return trading_graph
 
     def _execute_analysis_sync_with_progress(self, task: AnalysisTask,
                                              progress_tracker: RedisProgressTracker) -> AnalysisResult:
@@ -345,7 +345,7 @@ class AnalysisService:
             analysis_date = task.parameters.analysis_date or datetime.now().strftime("%Y-%m-%d")
 
             # 调用现有的分析方法（同步调用）
-            _, decision = trading_graph.propagate(task.symbol, analysis_date)
+            _, decision = trading_graph.propagate(task.symbol, analysis_date, task_id=task.task_id)
 
             execution_time = (datetime.now(timezone.utc) - start_time).total_seconds()
 
@@ -639,7 +639,8 @@ class AnalysisService:
                     user_id=str(converted_user_id),
                     symbol=task.symbol,
                     params=queue_params,
-                    batch_id=task.batch_id
+                    batch_id=task.batch_id,
+                    task_id=task.task_id,
                 )
 
             logger.info(f"批量分析任务已提交: {batch_id} - {len(tasks)}个股票")
@@ -658,14 +659,25 @@ class AnalysisService:
     async def execute_analysis_task(
             self,
             task: AnalysisTask,
-            progress_callback: Optional[Callable[[int, str], None]] = None
+            progress_callback: Optional[Callable[[int, str], None]] = None,
+            retry_on_failure: bool = False,
+            lease_token: Optional[str] = None,
+            cancel_event: Optional[threading.Event] = None
     ) -> AnalysisResult:
-        """执行单个分析任务"""
+        """执行单个分析任务
+
+        retry_on_failure: 调用方（队列 Worker）可能以相同任务ID重试失败的任务。此时失败时保留图检查点，
+            且不写入 FAILED 状态，由调用方确定不再重试后调用 mark_task_failed
+        lease_token: 队列租约令牌。开始时以该令牌认领任务，结果与状态只在令牌仍是最新时写入，
+            租约已被重新分配的 Worker 不会覆盖新持有者的结果（写入被拒绝时抛出 GraphRunCancelled）
+        cancel_event: 设置后分析在下一个节点开始前停止（租约失效或 Worker 关闭时由调用方设置）
+        """
         try:
             logger.info(f"开始执行分析任务: {task.task_id} - {task.symbol}")
 
-            # 更新任务状态
-            await self._update_task_status(task.task_id, AnalysisStatus.PROCESSING, 0)
+            # 更新任务状态（携带租约令牌时即认领任务）
+            if not await self._update_task_status(task.task_id, AnalysisStatus.PROCESSING, 0, lease_token=lease_token):
+                raise GraphRunCancelled(f"任务已被更新的租约认领，放弃执行: {task.task_id}")
 
             if progress_callback:
                 progress_callback(10, "初始化分析引擎...")
@@ -730,8 +742,16 @@ class AnalysisService:
             start_time = datetime.utcnow()
             analysis_date = task.parameters.analysis_date or datetime.now().strftime("%Y-%m-%d")
 
-            # 调用现有的分析方法
-            _, decision = trading_graph.propagate(task.symbol, analysis_date)
+            # 调用现有的分析方法（在线程池中执行，Worker 心跳可在分析期间按时续期任务租约）
+            loop = asyncio.get_running_loop()
+            _, decision = await loop.run_in_executor(
+                None,
+                functools.partial(
+                    trading_graph.propagate,
+                    task.symbol, analysis_date, task_id=task.task_id,
+                    keep_checkpoint_on_failure=retry_on_failure, cancel_event=cancel_event
+                ),
+            )
 
             execution_time = (datetime.utcnow() - start_time).total_seconds()
 
@@ -765,15 +785,20 @@ class AnalysisService:
                 progress_callback(100, "分析完成")
 
             # 更新任务状态
-            await self._update_task_status(task.task_id, AnalysisStatus.COMPLETED, 100, result)
+            written = await self._update_task_status(
+                task.task_id, AnalysisStatus.COMPLETED, 100, result, lease_token=lease_token
+            )
 
-            # 记录 token 使用
+            # 记录 token 使用（结果未写入时 token 也已消耗）
             try:
                 # 记录使用情况
                 await self._record_token_usage(task, result, llm_provider, deep_model or quick_model)
             except Exception as e:
                 logger.error(f"⚠️  记录 token 使用失败: {e}")
 
+            if not written:
+                raise GraphRunCancelled(f"任务租约已失效，结果未写入: {task.task_id}")
+
             logger.info(f"分析任务完成: {task.task_id} - 耗时{execution_time:.2f}秒")
 
             return result
@@ -781,25 +806,34 @@ class AnalysisService:
         except Exception as e:
             logger.error(f"执行分析任务失败: {task.task_id} - {e}")
 
-            # 更新任务状态为失败
-            error_result = AnalysisResult(error_message=str(e))
-            await self._update_task_status(task.task_id, AnalysisStatus.FAILED, 0, error_result)
+            # 更新任务状态为失败（可能重试时由调用方决定）
+            if not retry_on_failure and not isinstance(e, GraphRunCancelled):
+                await self.mark_task_failed(task.task_id, str(e), lease_token)
 
             raise
 
+    async def mark_task_failed(self, task_id: str, error_message: str, lease_token: Optional[str] = None) -> None:
+        """将任务标记为失败（携带租约令牌时只在令牌仍是最新时写入）"""
+        error_result = AnalysisResult(error_message=error_message)
+        await self._update_task_status(task_id, AnalysisStatus.FAILED, 0, error_result, lease_token=lease_token)
+
     async def _update_task_status(
             self,
             task_id: str,
             status: AnalysisStatus,
             progress: int,
             result: Optional[AnalysisResult] = None,
-    ) -> None:
-        """更新任务状态（委托至拆分的工具函数）"""
+            lease_token: Optional[str] = None,
+    ) -> bool:
+        """更新任务状态（委托至拆分的工具函数），返回 False 表示租约已失效、写入被拒绝"""
         try:
             from app.services.analysis.status_update_utils import perform_update_task_status
-            await perform_update_task_status(task_id, status, progress, result)
+            if not await perform_update_task_status(task_id, status, progress, result, lease_token):
+                logger.warning(f"⚠️ 任务租约已失效，忽略状态更新: {task_id} -> {status} (令牌: {lease_token})")
+                return False
         except Exception as e:
             logger.error(f"更新任务状态失败: {task_id} - {e}")
+        return True
 
     async def _update_task_status_with_tracker(
             self,
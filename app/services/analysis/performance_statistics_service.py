@@ -0,0 +1,134 @@
+"""
+分析性能统计服务
+基于 analysis_reports 中保存的 performance_metrics，按节点统计耗时与 token 分位数；
+另提供当前进程的运行时指标（LLM 响应缓存、embedding 缓存、LLM 连接池与并发控制、ChromaDB 锁等待）
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from app.core.database import get_mongo_db
+from tradingagents.agents.utils.embedding_cache import get_embedding_cache_stats
+from tradingagents.agents.utils.memory import get_chromadb_lock_stats
+from tradingagents.llm_adapters.client_pool import get_llm_client_registry
+from tradingagents.llm_adapters.concurrency import get_llm_concurrency_controller
+from tradingagents.llm_adapters.response_cache import get_llm_cache_stats
+
+logger = logging.getLogger("app.services.performance_statistics_service")
+
+# 逐节点统计的指标字段
+NODE_METRIC_FIELDS = [
+    "wall_time", "llm_time", "tool_time", "other_time",
+    "prompt_tokens", "completion_tokens", "estimated_prompt_tokens",
+]
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    """线性插值分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+class PerformanceStatisticsService:
+    """分析性能统计服务"""
+
+    def __init__(self):
+        self.collection_name = "analysis_reports"
+
+    async def get_node_percentiles(
+        self,
+        days: int = 7,
+        research_depth: Optional[str] = None,
+        limit: int = 2000
+    ) -> Dict[str, Any]:
+        """统计时间窗口内每个节点的 p50/p95
+
+        Args:
+            days: 时间窗口（天）
+            research_depth: 按分析深度过滤（可选）
+            limit: 最多参与统计的运行数
+        """
+        db = get_mongo_db()
+        since = datetime.utcnow() - timedelta(days=days)
+        query: Dict[str, Any] = {
+            "created_at": {"$gte": since},
+            "performance_metrics.node_timings": {"$exists": True},
+        }
+        if research_depth:
+            query["research_depth"] = research_depth
+
+        cursor = db[self.collection_name].find(
+            query,
+            {"performance_metrics": 1, "created_at": 1}
+        ).sort("created_at", -1).limit(limit)
+
+        samples: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+        totals: List[float] = []
+        run_count = 0
+        async for doc in cursor:
+            metrics = doc.get("performance_metrics") or {}
+            run_count += 1
+            if metrics.get("total_time") is not None:
+                totals.append(float(metrics["total_time"]))
+
+            node_metrics = metrics.get("node_metrics")
+            if node_metrics:
+                for node_name, node_data in node_metrics.items():
+                    if "other_time" not in node_data and not node_name.startswith("tools_"):
+                        # 旧记录把非工具节点的非 LLM 时间记在 tool_time 中
+                        node_data = {**node_data, "other_time": node_data.get("tool_time", 0.0), "tool_time": 0.0}
+                    for field in NODE_METRIC_FIELDS:
+                        if field in node_data:
+                            samples[node_name][field].append(float(node_data[field]))
+            else:
+                # 旧记录只有节点耗时
+                for node_name, elapsed in (metrics.get("node_timings") or {}).items():
+                    samples[node_name]["wall_time"].append(float(elapsed))
+
+        nodes = {}
+        for node_name, fields in samples.items():
+            nodes[node_name] = {
+                "runs": len(fields.get("wall_time", [])),
+                **{
+                    field: {
+                        "p50": round(_percentile(values, 50), 3),
+                        "p95": round(_percentile(values, 95), 3),
+                    }
+                    for field, values in fields.items()
+                },
+            }
+
+        logger.info(f"📊 节点性能统计完成: {run_count} 次运行, {len(nodes)} 个节点, 窗口 {days} 天")
+        return {
+            "window_days": days,
+            "since": since.isoformat(),
+            "runs": run_count,
+            "total_time": {
+                "p50": round(_percentile(totals, 50), 2),
+                "p95": round(_percentile(totals, 95), 2),
+            },
+            "nodes": dict(sorted(nodes.items(), key=lambda kv: -kv[1].get("wall_time", {}).get("p95", 0))),
+        }
+
+    def get_runtime_stats(self) -> Dict[str, Any]:
+        """当前进程的运行时指标（进程内计数，重启后清零）"""
+        return {
+            "llm_cache": get_llm_cache_stats(),
+            "embedding_cache": get_embedding_cache_stats(),
+            "llm_client_pool": get_llm_client_registry().get_stats(),
+            "llm_concurrency": get_llm_concurrency_controller().get_stats(),
+            "chromadb_locks": get_chromadb_lock_stats(),
+        }
+
+
+# 创建全局实例
+performance_statistics_service = PerformanceStatisticsService()
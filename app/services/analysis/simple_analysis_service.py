@@ -451,7 +451,11 @@ def create_analysis_config(
         config["max_risk_discuss_rounds"] = 1
         config["memory_enabled"] = False  # 禁用记忆以加速
         config["online_tools"] = True  # 统一使用在线工具，避免离线工具的各种问题
-        logger.info(f"🔧 [1级-快速分析] {market_type}使用统一工具，确保数据源正确和稳定性")
+        # 快速配置档：跳过研究经理与风险辩论，每个分析师最多1次工具调用，社交媒体分析师只用本地数据
+        # 注意：InternalLLM 目前所有节点固定使用 qwen-plus，不区分快速/深度模型，提速来自精简的图
+        config["analysis_profile"] = "fast"
+        config["max_tool_calls"] = 1
+        logger.info(f"🔧 [1级-快速分析] {market_type}快速配置档：分析师→风险经理")
         logger.info(f"🔧 [1级-快速分析] 使用用户配置的模型: quick={quick_model}, deep={deep_model}")
 
     elif research_depth == "基础":
@@ -1032,19 +1036,76 @@ class SimpleAnalysisService:
         """同步执行分析（在共享线程池中运行）"""
         # 🔧 使用共享线程池，支持多个任务并发执行
         # 不再每次创建新的线程池，避免串行执行
+        from app.core.config import settings
+        from tradingagents.graph.checkpointing import get_graph_checkpointer
+
+        # 启用图检查点时，瞬时故障后以相同任务ID重试，从最后完成的节点继续
+        max_retries = settings.ANALYSIS_RESUME_MAX_RETRIES if get_graph_checkpointer() is not None else 0
+
         loop = asyncio.get_event_loop()
-        logger.info(f"🚀 [线程池] 提交分析任务到共享线程池: {task_id} - {request.symbol}")
-        result = await loop.run_in_executor(
-            self._thread_pool,  # 使用共享线程池
-            self._run_analysis_sync,
-            task_id,
-            user_id,
-            request,
-            progress_tracker
-        )
+        token_sink = self._register_token_stream(task_id, loop) if settings.LLM_TOKEN_STREAM_ENABLED else None
+        try:
+            result = await self._run_with_resume_retries(loop, task_id, user_id, request, progress_tracker, max_retries)
+        finally:
+            if token_sink is not None:
+                from tradingagents.llm_adapters.token_stream import unregister_token_sink
+                unregister_token_sink(task_id)
         logger.info(f"✅ [线程池] 分析任务执行完成: {task_id}")
         return result
 
+    def _register_token_stream(self, task_id: str, loop: asyncio.AbstractEventLoop):
+        """为任务注册 LLM token 增量推送（仅在有 WebSocket 订阅时流式调用）"""
+        from app.core.config import settings
+        from app.services.websocket_manager import get_websocket_manager
+        from tradingagents.llm_adapters.token_stream import TokenStreamCoalescer, register_token_sink
+
+        websocket_manager = get_websocket_manager()
+        sink = TokenStreamCoalescer(
+            task_id,
+            publish=lambda messages: websocket_manager.publish_threadsafe(task_id, messages, loop),
+            is_active=lambda: websocket_manager.has_connections(task_id),
+            flush_interval=settings.LLM_TOKEN_STREAM_FLUSH_MS / 1000.0,
+        )
+        register_token_sink(task_id, sink)
+        return sink
+
+    async def _run_with_resume_retries(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        task_id: str,
+        user_id: str,
+        request: SingleAnalysisRequest,
+        progress_tracker: Optional[RedisProgressTracker],
+        max_retries: int
+    ) -> Dict[str, Any]:
+        """在共享线程池中执行分析，瞬时故障（限流、超时、5xx）时按检查点重试
+
+        确定性错误重试只会重复消耗 LLM 调用，直接失败；不再重试时清理该任务的检查点
+        """
+        from tradingagents.graph.checkpointing import delete_checkpoint, get_graph_checkpointer
+        from tradingagents.llm_adapters.resilience import is_service_failure
+
+        attempt = 0
+        while True:
+            logger.info(f"🚀 [线程池] 提交分析任务到共享线程池: {task_id} - {request.symbol}")
+            try:
+                result = await loop.run_in_executor(
+                    self._thread_pool,  # 使用共享线程池
+                    self._run_analysis_sync,
+                    task_id,
+                    user_id,
+                    request,
+                    progress_tracker
+                )
+                return result
+            except Exception as e:
+                # _run_analysis_sync 将原始异常包装为用户友好的错误信息
+                if attempt >= max_retries or not is_service_failure(e.__cause__ or e):
+                    await loop.run_in_executor(self._thread_pool, delete_checkpoint, get_graph_checkpointer(), task_id)
+                    raise
+                attempt += 1
+                logger.warning(f"🔁 [检查点恢复] 分析失败，从检查点重试 ({attempt}/{max_retries}): {task_id} - {e}")
+
     def _run_analysis_sync(
         self,
         task_id: str,
@@ -1501,7 +1562,8 @@ class SimpleAnalysisService:
                 request.stock_code,
                 analysis_date,
                 progress_callback=graph_progress_callback,
-                task_id=task_id
+                task_id=task_id,
+                keep_checkpoint_on_failure=True  # 由 _run_with_resume_retries 决定重试或清理
             )
 
             logger.info(f"✅ trading_graph.propagate 执行完成")
@@ -18,10 +18,17 @@ async def perform_update_task_status(
     status: AnalysisStatus,
     progress: int,
     result: Optional[AnalysisResult] = None,
-) -> None:
+    lease_token: Optional[str] = None,
+) -> bool:
     """Update a task's status in MongoDB and Redis.
 
     Mirrors the original logic in AnalysisService._update_task_status.
+
+    With a queue lease token the write is fenced: PROCESSING claims the task
+    unless a newer token already has or it was cancelled, and COMPLETED/FAILED
+    only apply while the stored token is still ours. CANCELLED clears the
+    stored token. Returns False when the write is rejected. Tasks enqueued
+    without a MongoDB record (compat /analyze endpoints) have nothing to fence.
     """
     db = get_mongo_db()
     redis_service = get_redis_service()
@@ -39,7 +46,26 @@ async def perform_update_task_status(
         if result:
             update_data["result"] = result.dict()
 
-    await db.analysis_tasks.update_one({"task_id": task_id}, {"$set": update_data})
+    query: Dict[str, Any] = {"task_id": task_id}
+    if lease_token is not None:
+        token = int(lease_token)
+        if status == AnalysisStatus.PROCESSING:
+            # Lease tokens only grow; a claim never goes back to an older one.
+            query["lease_token"] = {"$not": {"$gt": token}}
+            query["status"] = {"$ne": AnalysisStatus.CANCELLED}
+            update_data["lease_token"] = token
+        else:
+            query["lease_token"] = token
+
+    update: Dict[str, Any] = {"$set": update_data}
+    if status == AnalysisStatus.CANCELLED:
+        # Cancelling revokes the lease, so the running worker's result write no longer matches.
+        update["$unset"] = {"lease_token": ""}
+
+    update_result = await db.analysis_tasks.update_one(query, update)
+    if lease_token is not None and update_result.matched_count == 0:
+        if await db.analysis_tasks.find_one({"task_id": task_id}, {"_id": 1}) is not None:
+            return False
 
     progress_key = RedisKeys.TASK_PROGRESS.format(task_id=task_id)
     await redis_service.set_json(
@@ -52,6 +78,7 @@ async def perform_update_task_status(
         },
         ttl=3600,
     )
+    return True
 
 
 async def perform_update_task_status_with_tracker(
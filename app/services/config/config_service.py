@@ -484,6 +484,7 @@ class ConfigService:
                 "enable_monitoring": True,
                 # Worker/Queue intervals
                 "worker_heartbeat_interval_seconds": 30,
+                "worker_max_concurrent_tasks": 3,
                 "queue_poll_interval_seconds": 1.0,
                 "queue_cleanup_interval_seconds": 60.0,
                 # SSE intervals
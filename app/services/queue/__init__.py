@@ -2,6 +2,7 @@
 Queue 子包
 - keys: Redis 键名与常量
 - helpers: 队列相关的 Redis 操作辅助函数
+- scripts: 队列原子操作的 Lua 脚本
 """
 from .keys import (
     READY_LIST,
@@ -14,9 +15,26 @@ from .keys import (
     USER_PROCESSING_PREFIX,
     GLOBAL_CONCURRENT_KEY,
     VISIBILITY_TIMEOUT_PREFIX,
+    INFLIGHT_ZSET,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_BATCH,
+    PRIORITY_SCHEDULED,
+    PRIORITY_LEVELS,
+    USER_QUEUE_PREFIX,
+    ROUND_ROBIN_PREFIX,
+    DEFICIT_PREFIX,
+    USER_WEIGHTS_KEY,
+    DURATION_ESTIMATES_KEY,
+    DURATION_SAMPLES_KEY,
     DEFAULT_USER_CONCURRENT_LIMIT,
     GLOBAL_CONCURRENT_LIMIT,
     VISIBILITY_TIMEOUT_SECONDS,
+    DEQUEUE_MAX_VISITS,
+    DEFAULT_USER_WEIGHT,
+    DRR_QUANTUM_SECONDS,
+    SJF_AGING_RATE,
+    DURATION_EWMA_ALPHA,
+    DEFAULT_DURATION_BY_DEPTH,
 )
 
 from .helpers import (
@@ -26,5 +44,15 @@ from .helpers import (
     unmark_task_processing,
     set_visibility_timeout,
     clear_visibility_timeout,
+    task_duration_class,
+    default_duration_estimate,
 )
 
+from .scripts import (
+    ENQUEUE_SCRIPT,
+    DEQUEUE_SCRIPT,
+    REQUEUE_EXPIRED_SCRIPT,
+    RENEW_LEASE_SCRIPT,
+    FINISH_TASK_SCRIPT,
+    DEQUEUE_STALE,
+)
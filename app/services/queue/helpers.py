@@ -3,7 +3,7 @@
 """
 from __future__ import annotations
 import time
-from typing import Dict
+from typing import Any, Dict, Optional
 from redis.asyncio import Redis
 
 from .keys import (
@@ -12,8 +12,38 @@ from .keys import (
     SET_PROCESSING,
     USER_PROCESSING_PREFIX,
     VISIBILITY_TIMEOUT_PREFIX,
+    INFLIGHT_ZSET,
+    DEFAULT_DURATION_BY_DEPTH,
 )
 
+_DEPTH_LEVELS = {1: "快速", 2: "基础", 3: "标准", 4: "深度", 5: "全面"}
+_DEFAULT_ANALYSTS = ["market", "fundamentals", "news", "social"]
+
+
+def _normalize_depth(depth: Any) -> str:
+    if isinstance(depth, (int, float)) or str(depth).isdigit():
+        return _DEPTH_LEVELS.get(int(depth), "标准")
+    return str(depth or "标准")
+
+
+def task_duration_class(params: Optional[Dict[str, Any]]) -> str:
+    """任务耗时分类：研究深度|分析师|市场"""
+    params = params or {}
+    analysts = params.get("selected_analysts") or _DEFAULT_ANALYSTS
+    return "|".join([
+        _normalize_depth(params.get("research_depth")),
+        "+".join(sorted(analysts)),
+        str(params.get("market_type") or "A股"),
+    ])
+
+
+def default_duration_estimate(params: Optional[Dict[str, Any]]) -> float:
+    """没有历史样本时的耗时估计：按研究深度，并按分析师数量缩放"""
+    params = params or {}
+    base = DEFAULT_DURATION_BY_DEPTH.get(_normalize_depth(params.get("research_depth")), 480)
+    analysts = params.get("selected_analysts") or _DEFAULT_ANALYSTS
+    return base * (1 + len(analysts)) / (1 + len(_DEFAULT_ANALYSTS))
+
 
 async def check_user_concurrent_limit(r: Redis, user_id: str, limit: int) -> bool:
     """检查用户并发限制"""
@@ -45,17 +75,20 @@ async def unmark_task_processing(r: Redis, task_id: str, user_id: str) -> None:
 async def set_visibility_timeout(r: Redis, task_id: str, worker_id: str, visibility_timeout: int) -> None:
     """设置可见性超时"""
     timeout_key = VISIBILITY_TIMEOUT_PREFIX + task_id
+    timeout_at = int(time.time()) + visibility_timeout
     timeout_data: Dict[str, str] = {
         "task_id": task_id,
         "worker_id": worker_id,
-        "timeout_at": str(int(time.time()) + visibility_timeout),
+        "timeout_at": str(timeout_at),
     }
     await r.hset(timeout_key, mapping=timeout_data)
     await r.expire(timeout_key, visibility_timeout)
+    await r.zadd(INFLIGHT_ZSET, {task_id: timeout_at})
 
 
 async def clear_visibility_timeout(r: Redis, task_id: str) -> None:
     """清除可见性超时"""
     timeout_key = VISIBILITY_TIMEOUT_PREFIX + task_id
     await r.delete(timeout_key)
+    await r.zrem(INFLIGHT_ZSET, task_id)
 
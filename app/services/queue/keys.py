@@ -3,7 +3,7 @@
 """
 
 # Redis键名常量
-READY_LIST = "qa:ready"
+READY_LIST = "qa:ready"  # 旧版单一FIFO队列，仅用于迁移升级前遗留的任务
 
 TASK_PREFIX = "qa:task:"
 BATCH_PREFIX = "qa:batch:"
@@ -16,9 +16,37 @@ BATCH_TASKS_PREFIX = "qa:batch_tasks:"
 USER_PROCESSING_PREFIX = "qa:user_processing:"
 GLOBAL_CONCURRENT_KEY = "qa:global_concurrent"
 VISIBILITY_TIMEOUT_PREFIX = "qa:visibility:"
+INFLIGHT_ZSET = "qa:inflight"  # 处理中任务，分数为租约到期时间戳
+
+# 优先级与用户间公平调度（按优先级严格出队，同一优先级内按用户做加权赤字轮转 DRR）
+PRIORITY_INTERACTIVE = "interactive"  # 交互提交的单股分析
+PRIORITY_BATCH = "batch"  # 批量分析
+PRIORITY_SCHEDULED = "scheduled"  # 定时任务
+PRIORITY_LEVELS = (PRIORITY_INTERACTIVE, PRIORITY_BATCH, PRIORITY_SCHEDULED)  # 出队顺序
+USER_QUEUE_PREFIX = "qa:ready:"  # 用户子队列 qa:ready:{priority}:{user}
+ROUND_ROBIN_PREFIX = "qa:rr:"  # 各优先级中有排队任务的用户轮转表（ZSET，分数为轮转位置）
+DEFICIT_PREFIX = "qa:deficit:"  # 各优先级中用户的赤字计数（HASH）
+USER_WEIGHTS_KEY = "qa:user_weights"  # 用户权重：每轮获得的执行时间配额倍数（HASH）
+
+# 耗时估计：分类 (研究深度|分析师|市场) -> 耗时 EWMA（秒）与样本数
+DURATION_ESTIMATES_KEY = "qa:duration_estimates"
+DURATION_SAMPLES_KEY = "qa:duration_samples"
 
 # 配置常量 - 开源版限制
 DEFAULT_USER_CONCURRENT_LIMIT = 3
 GLOBAL_CONCURRENT_LIMIT = 3  # 开源版全局最大并发限制为3
 VISIBILITY_TIMEOUT_SECONDS = 300  # 5分钟
+DEQUEUE_MAX_VISITS = 50  # 出队时每个优先级最多访问的用户次数（跳过已达并发上限的用户）
+DEFAULT_USER_WEIGHT = 1
+DRR_QUANTUM_SECONDS = 600  # DRR 每轮为用户增加的执行时间配额（秒，乘以用户权重）
+SJF_AGING_RATE = 0.5  # 短作业优先的老化系数：每等待1秒，等效预计耗时减少0.5秒
+DURATION_EWMA_ALPHA = 0.2  # 耗时 EWMA 的新样本权重
+# 没有历史样本时按研究深度估计的耗时（秒，4个分析师）
+DEFAULT_DURATION_BY_DEPTH = {
+    "快速": 180,
+    "基础": 300,
+    "标准": 480,
+    "深度": 750,
+    "全面": 1200,
+}
 
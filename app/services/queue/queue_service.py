@@ -26,21 +26,47 @@ from app.services.queue import (
     USER_PROCESSING_PREFIX,
     GLOBAL_CONCURRENT_KEY,
     VISIBILITY_TIMEOUT_PREFIX,
+    INFLIGHT_ZSET,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_BATCH,
+    PRIORITY_LEVELS,
+    USER_QUEUE_PREFIX,
+    ROUND_ROBIN_PREFIX,
+    DEFICIT_PREFIX,
+    USER_WEIGHTS_KEY,
+    DURATION_ESTIMATES_KEY,
+    DURATION_SAMPLES_KEY,
     DEFAULT_USER_CONCURRENT_LIMIT,
     GLOBAL_CONCURRENT_LIMIT,
     VISIBILITY_TIMEOUT_SECONDS,
+    DEQUEUE_MAX_VISITS,
+    DEFAULT_USER_WEIGHT,
+    DRR_QUANTUM_SECONDS,
+    SJF_AGING_RATE,
+    DURATION_EWMA_ALPHA,
+    ENQUEUE_SCRIPT,
+    DEQUEUE_SCRIPT,
+    REQUEUE_EXPIRED_SCRIPT,
+    RENEW_LEASE_SCRIPT,
+    FINISH_TASK_SCRIPT,
+    DEQUEUE_STALE,
     check_user_concurrent_limit,
     check_global_concurrent_limit,
     mark_task_processing,
     unmark_task_processing,
     set_visibility_timeout,
     clear_visibility_timeout,
+    task_duration_class,
+    default_duration_estimate,
 )
 
 logger = logging.getLogger(__name__)
 
 # Redis键名与配置常量由 app.services.queue.keys 提供（此处不再重复定义）
 
+# 出队脚本的预读快照被并发修改时的最大重试次数
+_DEQUEUE_STALE_RETRIES = 3
+
 
 class QueueService:
     """增强版队列服务类"""
@@ -50,15 +76,36 @@ class QueueService:
         self.user_concurrent_limit = DEFAULT_USER_CONCURRENT_LIMIT
         self.global_concurrent_limit = GLOBAL_CONCURRENT_LIMIT
         self.visibility_timeout = VISIBILITY_TIMEOUT_SECONDS
+        self.dequeue_max_visits = DEQUEUE_MAX_VISITS
+        self.default_user_weight = DEFAULT_USER_WEIGHT
+        self.drr_quantum = DRR_QUANTUM_SECONDS
+        self.sjf_aging_rate = SJF_AGING_RATE
+        self._enqueue_script = redis.register_script(ENQUEUE_SCRIPT)
+        self._dequeue_script = redis.register_script(DEQUEUE_SCRIPT)
+        self._requeue_expired_script = redis.register_script(REQUEUE_EXPIRED_SCRIPT)
+        self._renew_lease_script = redis.register_script(RENEW_LEASE_SCRIPT)
+        self._finish_task_script = redis.register_script(FINISH_TASK_SCRIPT)
 
     async def enqueue_task(
         self,
         user_id: str,
         symbol: str,
         params: Dict[str, Any],
-        batch_id: Optional[str] = None
+        batch_id: Optional[str] = None,
+        priority: Optional[str] = None,
+        task_id: Optional[str] = None,
     ) -> str:
-        """任务入队，支持并发控制（开源版FIFO队列）"""
+        """任务入队，支持并发控制
+
+        priority: interactive / batch / scheduled；未指定时批量任务为 batch，其余为 interactive。
+        task_id: 已在 MongoDB 建档的任务应传入其 task_id，队列与 analysis_tasks 共用同一个 ID，
+        worker 按租约令牌隔离写入时才能命中对应的任务文档；未指定时生成新 ID。
+        任务进入所属用户在该优先级下的子队列，出队时按优先级及用户间加权轮转调度，
+        同一用户的任务按预计耗时短作业优先（随等待时间老化）。
+        """
+        priority = priority or (PRIORITY_BATCH if batch_id else PRIORITY_INTERACTIVE)
+        if priority not in PRIORITY_LEVELS:
+            raise ValueError(f"未知的任务优先级: {priority}")
 
         # 检查用户并发限制
         if not await self._check_user_concurrent_limit(user_id):
@@ -68,7 +115,7 @@ class QueueService:
         if not await self._check_global_concurrent_limit():
             raise ValueError(f"系统达到全局并发限制 ({self.global_concurrent_limit})")
 
-        task_id = str(uuid.uuid4())
+        task_id = task_id or str(uuid.uuid4())
         key = TASK_PREFIX + task_id
         now = int(time.time())
 
@@ -77,9 +124,11 @@ class QueueService:
             "user": user_id,
             "symbol": symbol,
             "status": "queued",
+            "priority": priority,
             "created_at": str(now),
             "params": json.dumps(params or {}),
-            "enqueued_at": str(now)
+            "enqueued_at": str(now),
+            **await self._schedule_fields(params, time.time()),
         }
 
         if batch_id:
@@ -88,94 +137,270 @@ class QueueService:
         # 保存任务数据
         await self.r.hset(key, mapping=mapping)
 
-        # 添加到FIFO队列
-        await self.r.lpush(READY_LIST, task_id)
+        # 放入用户子队列，并加入该优先级的用户轮转表
+        await self._push_task(task_id, user_id, priority)
 
         if batch_id:
             await self.r.sadd(BATCH_TASKS_PREFIX + batch_id, task_id)
 
-        logger.info(f"任务已入队: {task_id}")
+        logger.info(f"任务已入队: {task_id} (优先级: {priority})")
         return task_id
 
+    async def estimate_duration(self, params: Optional[Dict[str, Any]]) -> float:
+        """预计耗时（秒）：同类任务的耗时 EWMA，没有样本时按研究深度估计"""
+        try:
+            estimate = await self.r.hget(DURATION_ESTIMATES_KEY, task_duration_class(params))
+            if estimate:
+                return float(estimate)
+        except Exception as e:
+            logger.warning(f"读取任务耗时估计失败: {e}")
+        return default_duration_estimate(params)
+
+    async def _schedule_fields(self, params: Optional[Dict[str, Any]], enqueued_at: float) -> Dict[str, str]:
+        """调度字段：耗时分类、预计耗时与子队列分数（短作业优先 + 老化）
+
+        分数使用精确到微秒的入队时间，预计耗时相同的任务按入队顺序出队。
+        """
+        expected = await self.estimate_duration(params)
+        return {
+            "duration_class": task_duration_class(params),
+            "expected_duration": f"{expected:.1f}",
+            "queue_score": f"{expected + self.sjf_aging_rate * enqueued_at:.6f}",
+        }
+
+    async def _push_task(self, task_id: str, user_id: str, priority: str):
+        await self._enqueue_script(
+            keys=self._task_queue_keys(task_id, user_id, priority),
+            args=[task_id, user_id],
+        )
+
+    def _task_queue_keys(self, task_id: str, user_id: str, priority: str) -> List[str]:
+        """任务数据、所属用户子队列与该优先级的用户轮转表"""
+        return [TASK_PREFIX + task_id, self._user_queue_key(priority, user_id), ROUND_ROBIN_PREFIX + priority]
+
+    async def _task_owner(self, task_id: str) -> tuple[Optional[str], str]:
+        """读取任务所属用户与优先级（入队后不再变化），用于展开脚本的 KEYS"""
+        user_id, priority = await self.r.hmget(TASK_PREFIX + task_id, ["user", "priority"])
+        return user_id, priority or PRIORITY_BATCH
+
+    async def migrate_legacy_queue(self) -> int:
+        """将升级前旧版 FIFO 队列中遗留的任务迁移到用户子队列（按原出队顺序）"""
+        migrated = 0
+        try:
+            while True:
+                task_id = await self.r.rpop(READY_LIST)
+                if not task_id:
+                    break
+                task_key = TASK_PREFIX + task_id
+                user_id, priority, batch_id, params, enqueued_at = await self.r.hmget(
+                    task_key, ["user", "priority", "batch_id", "params", "enqueued_at"]
+                )
+                if not user_id:
+                    continue
+                try:
+                    params = json.loads(params or "{}")
+                except Exception:
+                    params = {}
+                priority = priority or (PRIORITY_BATCH if batch_id else PRIORITY_INTERACTIVE)
+                await self.r.hset(task_key, mapping={
+                    "priority": priority,
+                    **await self._schedule_fields(params, float(enqueued_at or time.time())),
+                })
+                await self._push_task(task_id, user_id, priority)
+                migrated += 1
+
+            if migrated:
+                logger.info(f"已迁移 {migrated} 个旧版队列中的任务")
+        except Exception as e:
+            logger.error(f"迁移旧版队列失败: {e}")
+        return migrated
+
     async def dequeue_task(self, worker_id: str) -> Optional[Dict[str, Any]]:
-        """从FIFO队列中取出任务"""
+        """按优先级与用户间公平调度取出任务
+
+        优先级严格有序（interactive > batch > scheduled），同一优先级内各用户按权重轮流出队（DRR，
+        成本为预计耗时），同一用户的任务短作业优先。
+        出队、并发限制检查、处理中标记、可见性超时与状态更新在一个 Lua 脚本中原子完成，
+        多个 Worker 并发出队时不会重复计数，也不会因 Worker 中途退出而丢失任务。
+        返回的任务数据包含 lease_token，续期/确认/重试时需携带。
+        """
         try:
-            # 从FIFO队列获取任务
-            task_id = await self.r.rpop(READY_LIST)
-            if not task_id:
+            for _ in range(_DEQUEUE_STALE_RETRIES):
+                keys, args = await self._dequeue_keys(worker_id)
+                if keys is None:
+                    return None
+                result = await self._dequeue_script(keys=keys, args=args)
+                if result != DEQUEUE_STALE:
+                    break
+            else:
+                logger.warning(f"队列变化频繁，本次未能出队: Worker {worker_id}")
                 return None
+            if not result:
+                return None
+            task_id, lease_token = result
 
-            # 获取任务详情
             task_data = await self.get_task(task_id)
             if not task_data:
                 logger.warning(f"任务数据不存在: {task_id}")
                 return None
+            task_data["lease_token"] = lease_token
 
-            user_id = task_data.get("user")
-
-            # 再次检查并发限制（防止竞态条件）
-            if not await self._check_user_concurrent_limit(user_id):
-                # 如果超过限制，将任务放回队列
-                await self.r.lpush(READY_LIST, task_id)
-                logger.warning(f"用户 {user_id} 并发限制，任务重新入队: {task_id}")
-                return None
-
-            # 标记任务为处理中
-            await self._mark_task_processing(task_id, user_id, worker_id)
-
-            # 设置可见性超时
-            await self._set_visibility_timeout(task_id, worker_id)
-
-            # 更新任务状态
-            await self.r.hset(TASK_PREFIX + task_id, mapping={
-                "status": "processing",
-                "worker_id": worker_id,
-                "started_at": str(int(time.time()))
-            })
-
-            logger.info(f"任务已出队: {task_id} -> Worker: {worker_id}")
+            logger.info(f"任务已出队: {task_id} -> Worker: {worker_id} (租约令牌: {lease_token})")
             return task_data
 
         except Exception as e:
             logger.error(f"出队失败: {e}")
             return None
 
-    async def ack_task(self, task_id: str, success: bool = True) -> bool:
-        """确认任务完成"""
+    async def _dequeue_keys(self, worker_id: str) -> tuple[Optional[List[str]], List[Any]]:
+        """预读出队脚本可能访问的键：各优先级轮转表前 max_visits 个用户及其子队列头部的两个任务
+
+        DRR 每次访问轮转表头部的用户并将其移到表尾，一次出队最多访问 max_visits 个用户，
+        出队的任务及决定是否继续轮到该用户的下一个任务都在子队列头部两个之内。
+        所有优先级都没有排队的用户时返回 (None, [])。
+        """
+        pipe = self.r.pipeline()
+        for priority in PRIORITY_LEVELS:
+            pipe.zrange(ROUND_ROBIN_PREFIX + priority, 0, self.dequeue_max_visits - 1)
+        users_by_priority = await pipe.execute()
+        if not any(users_by_priority):
+            return None, []
+
+        pipe = self.r.pipeline()
+        for priority, users in zip(PRIORITY_LEVELS, users_by_priority):
+            for user_id in users:
+                pipe.zrange(self._user_queue_key(priority, user_id), 0, 1)
+        heads = iter(await pipe.execute())
+
+        keys: List[str] = [SET_PROCESSING, INFLIGHT_ZSET, USER_WEIGHTS_KEY]
+        args: List[Any] = [
+            self.dequeue_max_visits,
+            self.global_concurrent_limit,
+            self.user_concurrent_limit,
+            worker_id,
+            int(time.time()),
+            self.visibility_timeout,
+            self.default_user_weight,
+            self.drr_quantum,
+        ]
+        for priority, users in zip(PRIORITY_LEVELS, users_by_priority):
+            keys += [ROUND_ROBIN_PREFIX + priority, DEFICIT_PREFIX + priority]
+            args.append(len(users))
+            for user_id in users:
+                task_ids = next(heads)
+                keys += [self._user_queue_key(priority, user_id), USER_PROCESSING_PREFIX + user_id]
+                args += [user_id, len(task_ids)]
+                for task_id in task_ids:
+                    keys += [TASK_PREFIX + task_id, VISIBILITY_TIMEOUT_PREFIX + task_id]
+                    args.append(task_id)
+        return keys, args
+
+    async def _finish_task(self, task_id: str, outcome: str, lease_token: Optional[str], max_retries: int = 0) -> int:
+        user_id, priority = await self._task_owner(task_id)
+        if not user_id:
+            return 0
+        return int(await self._finish_task_script(
+            keys=[
+                INFLIGHT_ZSET, SET_PROCESSING, SET_COMPLETED, SET_FAILED,
+                DURATION_ESTIMATES_KEY, DURATION_SAMPLES_KEY,
+                TASK_PREFIX + task_id,
+                VISIBILITY_TIMEOUT_PREFIX + task_id,
+                USER_PROCESSING_PREFIX + user_id,
+                self._user_queue_key(priority, user_id),
+                ROUND_ROBIN_PREFIX + priority,
+            ],
+            args=[
+                task_id,
+                lease_token or "",
+                outcome,
+                int(time.time()),
+                max_retries,
+                DURATION_EWMA_ALPHA,
+                user_id,
+            ],
+        ))
+
+    async def ack_task(self, task_id: str, success: bool = True, lease_token: Optional[str] = None) -> bool:
+        """确认任务完成
+
+        lease_token: 出队时获得的租约令牌；任务已被重新分配或取消时确认将被拒绝
+        """
         try:
-            task_data = await self.get_task(task_id)
-            if not task_data:
+            result = await self._finish_task(task_id, "completed" if success else "failed", lease_token)
+            if result < 0:
+                logger.warning(f"任务租约已失效，忽略确认: {task_id} (令牌: {lease_token})")
+                return False
+            if not result:
                 return False
 
-            user_id = task_data.get("user")
-            worker_id = task_data.get("worker_id")
+            logger.info(f"任务已确认: {task_id} (成功: {success})")
+            return True
 
-            # 从处理中集合移除
-            await self._unmark_task_processing(task_id, user_id)
+        except Exception as e:
+            logger.error(f"确认任务失败: {e}")
+            return False
 
-            # 清除可见性超时
-            await self._clear_visibility_timeout(task_id)
+    async def retry_task(self, task_id: str, max_retries: int, lease_token: Optional[str] = None) -> bool:
+        """失败任务以相同任务ID重新入队（配合图检查点从断点继续执行）
 
-            # 更新任务状态
-            status = "completed" if success else "failed"
-            await self.r.hset(TASK_PREFIX + task_id, mapping={
-                "status": status,
-                "completed_at": str(int(time.time()))
-            })
+        Returns:
+            True 表示已重新入队；超过最大重试次数或租约已失效时返回 False，由调用方确认失败
+        """
+        try:
+            result = await self._finish_task(task_id, "retry", lease_token, max_retries)
+            if result < 0:
+                logger.warning(f"任务租约已失效，不再重试: {task_id} (令牌: {lease_token})")
+                return False
+            if not result:
+                return False
 
-            # 添加到相应的集合
-            if success:
-                await self.r.sadd(SET_COMPLETED, task_id)
-            else:
-                await self.r.sadd(SET_FAILED, task_id)
+            retries = await self.r.hget(TASK_PREFIX + task_id, "retries")
+            logger.warning(f"任务重试入队: {task_id} (第 {retries}/{max_retries} 次)")
+            return True
 
-            logger.info(f"任务已确认: {task_id} (成功: {success})")
+        except Exception as e:
+            logger.error(f"任务重试入队失败: {task_id} - {e}")
+            return False
+
+    async def release_task(self, task_id: str, lease_token: Optional[str] = None) -> bool:
+        """交还未完成任务的租约，以相同任务ID重新入队且不计重试次数（Worker 关闭时使用）
+
+        Returns:
+            True 表示已重新入队；租约已失效时返回 False
+        """
+        try:
+            result = await self._finish_task(task_id, "release", lease_token)
+            if result < 0:
+                logger.warning(f"任务租约已失效，无需交还: {task_id} (令牌: {lease_token})")
+                return False
+            if not result:
+                return False
+
+            logger.info(f"任务租约已交还，重新入队: {task_id}")
             return True
 
         except Exception as e:
-            logger.error(f"确认任务失败: {e}")
+            logger.error(f"交还任务租约失败: {task_id} - {e}")
             return False
 
+    async def renew_lease(self, task_id: str, lease_token: str) -> bool:
+        """续期任务租约（由 Worker 心跳调用）
+
+        Returns:
+            False 表示租约已失效（任务已被重新分配、取消或完成），Worker 不应再确认该任务
+        """
+        try:
+            renewed = await self._renew_lease_script(
+                keys=[INFLIGHT_ZSET, TASK_PREFIX + task_id, VISIBILITY_TIMEOUT_PREFIX + task_id],
+                args=[task_id, lease_token, int(time.time()), self.visibility_timeout],
+            )
+            return bool(renewed)
+
+        except Exception as e:
+            logger.error(f"续期任务租约失败: {task_id} - {e}")
+            # 续期请求失败不代表租约失效，等待下次心跳重试
+            return True
+
     async def create_batch(self, user_id: str, symbols: List[str], params: Dict[str, Any]) -> tuple[str, int]:
         batch_id = str(uuid.uuid4())
         now = int(time.time())
@@ -223,17 +448,40 @@ class QueueService:
         return data
 
     async def stats(self) -> Dict[str, int]:
-        queued = await self.r.llen(READY_LIST)
+        queued_by_priority = {}
+        for priority in PRIORITY_LEVELS:
+            users = await self.r.zrange(ROUND_ROBIN_PREFIX + priority, 0, -1)
+            queued_by_priority[priority] = await self._count_queued(priority, users)
         processing = await self.r.scard(SET_PROCESSING)
         completed = await self.r.scard(SET_COMPLETED)
         failed = await self.r.scard(SET_FAILED)
         return {
-            "queued": int(queued or 0),
+            "queued": sum(queued_by_priority.values()),
+            **{f"queued_{priority}": count for priority, count in queued_by_priority.items()},
             "processing": int(processing or 0),
             "completed": int(completed or 0),
             "failed": int(failed or 0),
         }
 
+    async def _count_queued(self, priority: str, users: List[str]) -> int:
+        """统计指定用户在某一优先级下排队的任务数"""
+        if not users:
+            return 0
+        pipe = self.r.pipeline()
+        for user_id in users:
+            pipe.zcard(self._user_queue_key(priority, user_id))
+        return sum(int(count or 0) for count in await pipe.execute())
+
+    @staticmethod
+    def _user_queue_key(priority: str, user_id: str) -> str:
+        return f"{USER_QUEUE_PREFIX}{priority}:{user_id}"
+
+    async def set_user_weight(self, user_id: str, weight: float):
+        """设置用户调度权重：同一优先级中每轮获得的执行时间配额倍数（默认1）"""
+        if weight <= 0:
+            raise ValueError(f"用户权重必须大于0: {weight}")
+        await self.r.hset(USER_WEIGHTS_KEY, user_id, str(weight))
+
     # 新增：并发控制方法
     async def _check_user_concurrent_limit(self, user_id: str) -> bool:
         """检查用户并发限制（委托 helpers）"""
@@ -263,70 +511,105 @@ class QueueService:
         """获取用户队列状态"""
         user_processing_key = USER_PROCESSING_PREFIX + user_id
         processing_count = await self.r.scard(user_processing_key)
+        queued_count = 0
+        for priority in PRIORITY_LEVELS:
+            queued_count += await self._count_queued(priority, [user_id])
 
         return {
+            "queued": queued_count,
             "processing": int(processing_count or 0),
             "concurrent_limit": self.user_concurrent_limit,
             "available_slots": max(0, self.user_concurrent_limit - int(processing_count or 0))
         }
 
-    async def cleanup_expired_tasks(self):
-        """清理过期任务（可见性超时）"""
-        try:
-            # 获取所有可见性超时键
-            timeout_keys = await self.r.keys(VISIBILITY_TIMEOUT_PREFIX + "*")
+    async def get_task_eta(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """估计任务剩余耗时
+
+        处理中：预计耗时 - 已运行时间；排队中：同一用户子队列中排在前面的任务按用户并发上限分摊，
+        再加上自身预计耗时（粗略估计，不计其他用户与更高优先级的任务）。
+        """
+        task_key = TASK_PREFIX + task_id
+        status, priority, user_id, expected, started_at, queue_score = await self.r.hmget(
+            task_key, ["status", "priority", "user", "expected_duration", "started_at", "queue_score"]
+        )
+        if not status or expected is None:
+            return None
 
-            current_time = int(time.time())
-            expired_tasks = []
+        expected = float(expected)
+        now = time.time()
+        if status == "processing":
+            remaining = max(expected - (now - float(started_at or now)), 0)
+        elif status == "queued":
+            ahead = await self.r.zrangebyscore(
+                self._user_queue_key(priority or PRIORITY_BATCH, user_id), "-inf", f"({queue_score}"
+            )
+            waiting = 0.0
+            if ahead:
+                pipe = self.r.pipeline()
+                for ahead_id in ahead:
+                    pipe.hget(TASK_PREFIX + ahead_id, "expected_duration")
+                waiting = sum(float(value or 0) for value in await pipe.execute())
+            remaining = waiting / max(self.user_concurrent_limit, 1) + expected
+        else:
+            remaining = 0
 
-            for timeout_key in timeout_keys:
-                timeout_data = await self.r.hgetall(timeout_key)
-                if timeout_data:
-                    timeout_at = int(timeout_data.get("timeout_at", 0))
-                    if current_time > timeout_at:
-                        task_id = timeout_data.get("task_id")
-                        if task_id:
-                            expired_tasks.append(task_id)
+        return {
+            "expected_duration": round(expected),
+            "eta_seconds": round(remaining),
+            "estimated_completion_at": int(now + remaining),
+        }
 
-            # 处理过期任务
-            for task_id in expired_tasks:
-                await self._handle_expired_task(task_id)
+    async def cleanup_expired_tasks(self, batch_size: int = 100):
+        """清理过期任务（可见性超时）
 
-            if expired_tasks:
-                logger.warning(f"处理了 {len(expired_tasks)} 个过期任务")
+        从租约到期索引中按分数取出已到期的任务，逐个用脚本原子地重新入队，
+        开销只与过期任务数有关，不扫描键空间。
+        """
+        try:
+            current_time = int(time.time())
+            requeued = 0
+            while True:
+                expired_tasks = await self.r.zrangebyscore(
+                    INFLIGHT_ZSET, "-inf", current_time, start=0, num=batch_size
+                )
+                if not expired_tasks:
+                    break
+                for task_id in expired_tasks:
+                    if await self._handle_expired_task(task_id, current_time):
+                        requeued += 1
+                if len(expired_tasks) < batch_size:
+                    break
+
+            if requeued:
+                logger.warning(f"处理了 {requeued} 个过期任务")
 
         except Exception as e:
             logger.error(f"清理过期任务失败: {e}")
 
-    async def _handle_expired_task(self, task_id: str):
-        """处理过期任务"""
+    async def _handle_expired_task(self, task_id: str, now: Optional[int] = None) -> bool:
+        """处理过期任务：原子地移出处理中集合并重新入队"""
         try:
-            task_data = await self.get_task(task_id)
-            if not task_data:
-                return
-
-            user_id = task_data.get("user")
-
-            # 从处理中集合移除
-            await self._unmark_task_processing(task_id, user_id)
-
-            # 清除可见性超时
-            await self._clear_visibility_timeout(task_id)
-
-            # 重新加入队列
-            await self.r.lpush(READY_LIST, task_id)
-
-            # 更新任务状态
-            await self.r.hset(TASK_PREFIX + task_id, mapping={
-                "status": "queued",
-                "worker_id": "",
-                "requeued_at": str(int(time.time()))
-            })
-
-            logger.warning(f"过期任务重新入队: {task_id}")
+            user_id, priority = await self._task_owner(task_id)
+            keys = [INFLIGHT_ZSET, SET_PROCESSING, VISIBILITY_TIMEOUT_PREFIX + task_id, TASK_PREFIX + task_id]
+            if user_id:
+                keys += [
+                    USER_PROCESSING_PREFIX + user_id,
+                    self._user_queue_key(priority, user_id),
+                    ROUND_ROBIN_PREFIX + priority,
+                ]
+            requeued = await self._requeue_expired_script(
+                keys=keys,
+                args=[task_id, now or int(time.time()), user_id or ""],
+            )
+            if requeued:
+                logger.warning(f"过期任务重新入队: {task_id}")
+            return bool(requeued)
 
         except Exception as e:
             logger.error(f"处理过期任务失败: {task_id} - {e}")
+            # 移出索引，避免同一任务反复失败阻塞清理循环
+            await self.r.zrem(INFLIGHT_ZSET, task_id)
+            return False
 
     async def cancel_task(self, task_id: str) -> bool:
         """取消任务"""
@@ -339,12 +622,14 @@ class QueueService:
             user_id = task_data.get("user")
 
             if status == "processing":
-                # 如果正在处理中，从处理集合移除
+                # 如果正在处理中，从处理集合移除，并使执行中 Worker 的租约令牌失效
                 await self._unmark_task_processing(task_id, user_id)
                 await self._clear_visibility_timeout(task_id)
+                await self.r.hincrby(TASK_PREFIX + task_id, "lease_token", 1)
             elif status == "queued":
-                # 如果在队列中，从队列移除
-                await self.r.lrem(READY_LIST, 0, task_id)
+                # 如果在队列中，从用户子队列移除（子队列变空后由出队脚本移出轮转表）
+                priority = task_data.get("priority") or PRIORITY_BATCH
+                await self.r.zrem(self._user_queue_key(priority, user_id), task_id)
 
             # 更新任务状态
             await self.r.hset(TASK_PREFIX + task_id, mapping={
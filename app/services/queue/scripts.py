@@ -0,0 +1,314 @@
+"""
+队列原子操作的 Lua 脚本
+
+出队涉及"取任务 → 检查并发限制 → 标记处理中 → 设置可见性超时 → 更新状态"多个步骤，
+分多次往返执行时，多个 Worker 并发会导致任务乱序、计数重复，Worker 在中途退出时任务丢失。
+这里将整个过程放在一个脚本中由 Redis 原子执行；过期任务的重新入队、租约续期与任务确认同理。
+
+优先级与公平调度：任务按优先级（interactive > batch > scheduled）与所属用户放入子队列
+qa:ready:{priority}:{user}；出队时按优先级严格顺序查找，同一优先级内按用户轮转表做加权赤字轮转（DRR），
+某个用户一次提交大量批量任务不会阻塞其他用户的任务，交互请求也不会排在批量任务之后。
+
+耗时感知（短作业优先）：子队列为 ZSET，分数 = 预计耗时 + 老化系数 × 入队时间，
+等价于"预计耗时 - 老化系数 × 已等待时间"，短任务优先而长任务随等待时间逐渐前移，不会饿死。
+DRR 的任务成本为预计耗时（秒），每轮为用户增加 quantum × 权重 的赤字，用户间按执行时间公平分配。
+预计耗时按 (研究深度, 分析师, 市场) 分类，由完成任务的实际耗时以 EWMA 更新。
+
+租约与防护令牌（fencing token）：每次出队或过期重新入队都会递增任务的 lease_token，
+Worker 续期、确认、重试时必须携带出队时拿到的令牌，任务被重新分配后旧 Worker 的操作将被拒绝。
+
+键名约定：脚本访问的每个键都由 KEYS 传入，脚本内不拼接键名（满足 Redis 的脚本键声明要求）。
+出队涉及的用户与任务由调用方预先读取并展开为 KEYS；脚本执行时发现需要的键不在其中
+（预读之后队列被其他 Worker 修改），返回 STALE，由调用方重新预读后重试。
+Redis Cluster 还要求同一脚本的键位于同一哈希槽，部署到 Cluster 时需为队列键名加上相同的 hash tag。
+"""
+
+# 公共片段：按任务的 queue_score 放入所属用户在其优先级下的子队列，
+# 用户不在该优先级的轮转表中时追加到表尾。重新入队/重试沿用入队时的分数，已等待的时间不会清零
+_PUSH_TASK_LUA = """
+local function push_task(task_key, queue_key, rr_key, task_id, user_id)
+    local score = tonumber(redis.call('HGET', task_key, 'queue_score') or '') or 0
+    redis.call('ZADD', queue_key, score, task_id)
+    if not redis.call('ZSCORE', rr_key, user_id) then
+        local last = redis.call('ZRANGE', rr_key, -1, -1, 'WITHSCORES')
+        redis.call('ZADD', rr_key, last[2] and tonumber(last[2]) + 1 or 0, user_id)
+    end
+end
+"""
+
+# 出队脚本的预读快照已过期，调用方需重新预读后重试
+DEQUEUE_STALE = 0
+
+# 入队：任务数据已写入 task_key（含 queue_score）
+# KEYS[1] 任务数据  KEYS[2] 用户子队列  KEYS[3] 该优先级的用户轮转表
+# ARGV: task_id, user_id
+ENQUEUE_SCRIPT = _PUSH_TASK_LUA + """
+push_task(KEYS[1], KEYS[2], KEYS[3], ARGV[1], ARGV[2])
+return 1
+"""
+
+# 出队：按优先级顺序，在每个优先级的用户轮转表中做加权赤字轮转（DRR）：
+# 轮到的用户取子队列中分数最小的任务，赤字不足其预计耗时则增加 quantum × 权重，
+# 足够则出队并扣减；赤字不足下一个任务或子队列为空时轮到下一个用户。
+# 已达并发上限的用户直接跳过，不累积赤字，其任务保持原位，其他用户不受阻塞。
+# 短作业优先只决定用户子队列内部的顺序；哪个用户出队由 DRR 决定，用户间按执行时间公平分配，
+# 不会因为某个用户的任务都较短而持续抢占其他用户。
+# KEYS[1] 全局处理中集合  KEYS[2] 租约到期索引（ZSET）  KEYS[3] 用户权重
+# 之后按优先级顺序依次为：轮转表、赤字表；其中每个用户依次为：子队列、处理中集合；
+# 该用户子队列头部的每个任务依次为：任务数据、可见性超时
+# ARGV: max_visits, global_limit, user_limit, worker_id, now, visibility_timeout, default_weight, quantum,
+#       之后按 KEYS 的顺序依次为：该优先级的用户数；每个用户的 user_id、头部任务数；头部任务ID...
+# 返回：{任务ID, 租约令牌}；没有可执行的任务时返回 nil；预读快照已过期时返回 DEQUEUE_STALE
+DEQUEUE_SCRIPT = """
+local max_visits = tonumber(ARGV[1])
+local global_limit = tonumber(ARGV[2])
+local user_limit = tonumber(ARGV[3])
+local worker_id = ARGV[4]
+local now = tonumber(ARGV[5])
+local visibility_timeout = tonumber(ARGV[6])
+local default_weight = tonumber(ARGV[7])
+local quantum = tonumber(ARGV[8])
+
+-- 还原预读的键：priorities[i] = {rr_key, deficit_key, users = {user_id -> {queue_key, processing_key,
+-- tasks = {task_id -> {task_key, visibility_key}}}}}
+local priorities = {}
+local k = 3
+local a = 9
+while a <= #ARGV do
+    local block = {rr_key = KEYS[k + 1], deficit_key = KEYS[k + 2], users = {}}
+    k = k + 2
+    local user_count = tonumber(ARGV[a])
+    a = a + 1
+    for _ = 1, user_count do
+        local user = {queue_key = KEYS[k + 1], processing_key = KEYS[k + 2], tasks = {}}
+        k = k + 2
+        local task_count = tonumber(ARGV[a + 1])
+        block.users[ARGV[a]] = user
+        a = a + 2
+        for _ = 1, task_count do
+            user.tasks[ARGV[a]] = {task_key = KEYS[k + 1], visibility_key = KEYS[k + 2]}
+            k = k + 2
+            a = a + 1
+        end
+    end
+    table.insert(priorities, block)
+end
+
+if redis.call('SCARD', KEYS[1]) >= global_limit then
+    return false
+end
+
+local function rotate(rr_key, user_id)
+    local last = redis.call('ZRANGE', rr_key, -1, -1, 'WITHSCORES')
+    redis.call('ZADD', rr_key, tonumber(last[2]) + 1, user_id)
+end
+
+local function deactivate(block, user_id)
+    redis.call('ZREM', block.rr_key, user_id)
+    redis.call('HDEL', block.deficit_key, user_id)
+end
+
+local function task_cost(task)
+    local expected = redis.call('HGET', task.task_key, 'expected_duration')
+    return tonumber(expected or '') or quantum
+end
+
+for _, block in ipairs(priorities) do
+    local rr_key = block.rr_key
+    local deficit_key = block.deficit_key
+    local visits = 0
+    while visits < max_visits do
+        local user_id = redis.call('ZRANGE', rr_key, 0, 0)[1]
+        if not user_id then
+            break
+        end
+        visits = visits + 1
+
+        local user = block.users[user_id]
+        if not user then
+            return 0
+        end
+        local queue_key = user.queue_key
+        local task_id = redis.call('ZRANGE', queue_key, 0, 0)[1]
+        local task = task_id and user.tasks[task_id]
+        if task_id and not task then
+            return 0
+        end
+
+        if not task_id then
+            -- 子队列已空（任务被取消），用户退出轮转
+            deactivate(block, user_id)
+        elseif redis.call('EXISTS', task.task_key) == 0 then
+            -- 任务数据已不存在，移出队列
+            redis.call('ZREM', queue_key, task_id)
+        elseif redis.call('SCARD', user.processing_key) >= user_limit then
+            rotate(rr_key, user_id)
+        else
+            local cost = task_cost(task)
+            local deficit = tonumber(redis.call('HGET', deficit_key, user_id) or '0')
+            if deficit < cost then
+                local weight = tonumber(redis.call('HGET', KEYS[3], user_id) or '') or default_weight
+                if weight <= 0 then
+                    weight = default_weight
+                end
+                deficit = deficit + quantum * weight
+            end
+
+            if deficit < cost then
+                redis.call('HSET', deficit_key, user_id, tostring(deficit))
+                rotate(rr_key, user_id)
+            else
+                local next_task_id = redis.call('ZRANGE', queue_key, 1, 1)[1]
+                local next_task = next_task_id and user.tasks[next_task_id]
+                if next_task_id and not next_task then
+                    return 0
+                end
+
+                redis.call('ZREM', queue_key, task_id)
+                deficit = deficit - cost
+                if not next_task then
+                    deactivate(block, user_id)
+                else
+                    redis.call('HSET', deficit_key, user_id, tostring(deficit))
+                    if deficit < task_cost(next_task) then
+                        rotate(rr_key, user_id)
+                    end
+                end
+
+                redis.call('SADD', user.processing_key, task_id)
+                redis.call('SADD', KEYS[1], task_id)
+
+                redis.call('HSET', task.visibility_key,
+                    'task_id', task_id,
+                    'worker_id', worker_id,
+                    'timeout_at', tostring(now + visibility_timeout))
+                redis.call('EXPIRE', task.visibility_key, visibility_timeout)
+                redis.call('ZADD', KEYS[2], now + visibility_timeout, task_id)
+
+                redis.call('HSET', task.task_key,
+                    'status', 'processing',
+                    'worker_id', worker_id,
+                    'started_at', tostring(now))
+                local lease_token = redis.call('HINCRBY', task.task_key, 'lease_token', 1)
+                return {task_id, tostring(lease_token)}
+            end
+        end
+    end
+end
+return false
+"""
+
+# 过期任务重新入队：租约仍已过期（期间未被续期或确认）时才处理，避免与确认/续期竞争
+# KEYS[1] 租约到期索引  KEYS[2] 全局处理中集合  KEYS[3] 可见性超时  KEYS[4] 任务数据
+# KEYS[5] 用户处理中集合  KEYS[6] 用户子队列  KEYS[7] 用户轮转表（任务数据已不存在时只传前4个）
+# ARGV: task_id, now, user_id
+# 返回：1 已重新入队；0 无需处理
+REQUEUE_EXPIRED_SCRIPT = _PUSH_TASK_LUA + """
+local task_id = ARGV[1]
+local deadline = redis.call('ZSCORE', KEYS[1], task_id)
+if not deadline or tonumber(deadline) > tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('ZREM', KEYS[1], task_id)
+redis.call('SREM', KEYS[2], task_id)
+redis.call('DEL', KEYS[3])
+
+local task_key = KEYS[4]
+if #KEYS < 7 or redis.call('HGET', task_key, 'user') ~= ARGV[3] then
+    return 0
+end
+redis.call('SREM', KEYS[5], task_id)
+if redis.call('HGET', task_key, 'status') ~= 'processing' then
+    return 0
+end
+
+push_task(task_key, KEYS[6], KEYS[7], task_id, ARGV[3])
+redis.call('HSET', task_key, 'status', 'queued', 'worker_id', '', 'requeued_at', ARGV[2])
+-- 使原 Worker 的令牌失效
+redis.call('HINCRBY', task_key, 'lease_token', 1)
+return 1
+"""
+
+# 租约续期：令牌匹配且任务仍在处理中时延长租约
+# KEYS[1] 租约到期索引  KEYS[2] 任务数据  KEYS[3] 可见性超时
+# ARGV: task_id, lease_token, now, visibility_timeout
+# 返回：1 已续期；0 租约已失效（任务已被重新分配、取消或完成）
+RENEW_LEASE_SCRIPT = """
+local task_id = ARGV[1]
+local task_key = KEYS[2]
+if redis.call('HGET', task_key, 'lease_token') ~= ARGV[2] then
+    return 0
+end
+if redis.call('HGET', task_key, 'status') ~= 'processing' then
+    return 0
+end
+if not redis.call('ZSCORE', KEYS[1], task_id) then
+    return 0
+end
+
+local deadline = tonumber(ARGV[3]) + tonumber(ARGV[4])
+redis.call('ZADD', KEYS[1], deadline, task_id)
+redis.call('HSET', KEYS[3], 'timeout_at', tostring(deadline))
+redis.call('EXPIRE', KEYS[3], tonumber(ARGV[4]))
+return 1
+"""
+
+# 结束租约：确认完成/失败，或以相同任务ID重试入队；release 同样重新入队但不计重试次数（Worker 关闭时交还任务）。
+# 首次执行即成功的任务以实际耗时更新所属分类的耗时 EWMA（重试的任务从检查点恢复，耗时不具代表性）
+# KEYS[1] 租约到期索引  KEYS[2] 全局处理中集合  KEYS[3] 已完成集合  KEYS[4] 失败集合
+# KEYS[5] 耗时估计  KEYS[6] 耗时样本数  KEYS[7] 任务数据  KEYS[8] 可见性超时
+# KEYS[9] 用户处理中集合  KEYS[10] 用户子队列  KEYS[11] 用户轮转表
+# ARGV: task_id, lease_token（为空时不校验）, outcome(completed/failed/retry/release), now, max_retries,
+#       ewma_alpha, user_id
+# 返回：1 成功；0 任务不存在或重试次数已用尽；-1 令牌不匹配（租约已失效）
+FINISH_TASK_SCRIPT = _PUSH_TASK_LUA + """
+local task_id = ARGV[1]
+local outcome = ARGV[3]
+local task_key = KEYS[7]
+if redis.call('EXISTS', task_key) == 0 or redis.call('HGET', task_key, 'user') ~= ARGV[7] then
+    return 0
+end
+if ARGV[2] ~= '' and redis.call('HGET', task_key, 'lease_token') ~= ARGV[2] then
+    return -1
+end
+if outcome == 'retry' then
+    local retries = redis.call('HINCRBY', task_key, 'retries', 1)
+    if retries > tonumber(ARGV[5]) then
+        return 0
+    end
+end
+
+redis.call('SREM', KEYS[9], task_id)
+redis.call('SREM', KEYS[2], task_id)
+redis.call('DEL', KEYS[8])
+redis.call('ZREM', KEYS[1], task_id)
+
+if outcome == 'retry' or outcome == 'release' then
+    -- 沿用入队时的分数，已等待的时间保留，尽快重试
+    push_task(task_key, KEYS[10], KEYS[11], task_id, ARGV[7])
+    redis.call('HSET', task_key, 'status', 'queued', 'worker_id', '', 'requeued_at', ARGV[4])
+    redis.call('HINCRBY', task_key, 'lease_token', 1)
+else
+    redis.call('HSET', task_key, 'status', outcome, 'completed_at', ARGV[4])
+    if outcome == 'completed' then
+        redis.call('SADD', KEYS[3], task_id)
+
+        local duration_class = redis.call('HGET', task_key, 'duration_class')
+        local started_at = tonumber(redis.call('HGET', task_key, 'started_at') or '')
+        if duration_class and started_at and not redis.call('HGET', task_key, 'retries') then
+            local duration = tonumber(ARGV[4]) - started_at
+            if duration > 0 then
+                local alpha = tonumber(ARGV[6])
+                local previous = tonumber(redis.call('HGET', KEYS[5], duration_class) or '')
+                local estimate = previous and (alpha * duration + (1 - alpha) * previous) or duration
+                redis.call('HSET', KEYS[5], duration_class, tostring(estimate))
+                redis.call('HINCRBY', KEYS[6], duration_class, 1)
+                redis.call('HSET', task_key, 'duration', tostring(duration))
+            end
+        end
+    else
+        redis.call('SADD', KEYS[4], task_id)
+    end
+end
+return 1
+"""
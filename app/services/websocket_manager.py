@@ -6,7 +6,8 @@ WebSocket 连接管理器
 import asyncio
 import json
 import logging
-from typing import Dict, Set, Any
+from concurrent.futures import Future
+from typing import Dict, Set, Any, List, Optional
 from fastapi import WebSocket, WebSocketDisconnect
 
 logger = logging.getLogger(__name__)
@@ -59,6 +60,26 @@ class WebSocketManager:
                     if task_id in self.active_connections:
                         self.active_connections[task_id].discard(connection)
 
+    def has_connections(self, task_id: str) -> bool:
+        """是否有客户端订阅该任务（供工作线程快速判断，只读不加锁）"""
+        return bool(self.active_connections.get(task_id))
+
+    async def send_messages(self, task_id: str, messages: List[Dict[str, Any]]):
+        """按顺序发送一批消息"""
+        for message in messages:
+            await self.send_progress_update(task_id, message)
+
+    def publish_threadsafe(
+        self,
+        task_id: str,
+        messages: List[Dict[str, Any]],
+        loop: asyncio.AbstractEventLoop
+    ) -> Optional[Future]:
+        """从分析线程投递消息到事件循环，返回可查询发送是否完成的 Future（用于背压）"""
+        if not self.has_connections(task_id) or loop.is_closed():
+            return None
+        return asyncio.run_coroutine_threadsafe(self.send_messages(task_id, messages), loop)
+
     async def broadcast_to_user(self, user_id: str, message: Dict[str, Any]):
         """向用户的所有连接广播消息"""
         # 这里可以扩展为按用户ID管理连接
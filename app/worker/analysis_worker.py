@@ -5,40 +5,60 @@
 
 import asyncio
 import logging
+import os
 import signal
 import sys
+import threading
 import uuid
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Set
 
 # 添加项目根目录到路径
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
-from app.services.queue_service import get_queue_service
-from app.services.analysis_service import get_analysis_service
+from app.services.queue.queue_service import get_queue_service
+from app.services.analysis.analysis_service import get_analysis_service
 from app.core.database import init_database, close_database
 from app.core.redis_client import init_redis, close_redis
 from app.core.config import settings
 from app.models.analysis import AnalysisTask, AnalysisParameters
-from app.services.config_provider import provider as config_provider
+from app.services.config.config_provider import provider as config_provider
 from app.services.queue import DEFAULT_USER_CONCURRENT_LIMIT, GLOBAL_CONCURRENT_LIMIT, VISIBILITY_TIMEOUT_SECONDS
+from tradingagents.graph.checkpointing import delete_checkpoint, get_graph_checkpointer
+from tradingagents.llm_adapters.resilience import is_service_failure
 
 logger = logging.getLogger(__name__)
 
+# 关闭超时后通知分析停止，等待分析线程在节点之间退出的时间（执行中的 LLM 调用无法中断）
+_CANCEL_GRACE_SECONDS = 30
+
 
 class AnalysisWorker:
-    """分析任务Worker类"""
+    """分析任务Worker类
+
+    同时持有最多 max_concurrent_tasks 个任务租约，由信号量限制并发；分析在专用线程池中执行，
+    事件循环负责出队、心跳与租约续期。收到 SIGTERM/SIGINT 后停止出队，等待执行中的任务完成再退出；
+    超过关闭超时的任务在节点之间停止，租约交还队列（不计重试次数），由其他 Worker 从检查点继续。
+    """
 
     def __init__(self, worker_id: Optional[str] = None):
         self.worker_id = worker_id or f"worker-{uuid.uuid4().hex[:8]}"
         self.queue_service = None
         self.running = False
-        self.current_task = None
+        self.active_tasks: Dict[str, Optional[str]] = {}  # 执行中的任务ID -> 租约令牌
+        self._cancel_events: Dict[str, threading.Event] = {}  # 执行中的任务ID -> 取消信号（分析线程在节点间检查）
+        self._inflight: Set[asyncio.Task] = set()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.abandoned_tasks = 0  # 关闭时仍未停止的分析线程数，需强制退出进程
 
         # 配置参数（可由系统设置覆盖）
+        self.max_concurrent_tasks = int(getattr(settings, 'WORKER_MAX_CONCURRENT_TASKS', 3))
+        self.shutdown_timeout = float(getattr(settings, 'WORKER_SHUTDOWN_TIMEOUT_SECONDS', 600))
         self.heartbeat_interval = int(getattr(settings, 'WORKER_HEARTBEAT_INTERVAL', 30))
         self.max_retries = int(getattr(settings, 'QUEUE_MAX_RETRIES', 3))
         self.poll_interval = float(getattr(settings, 'QUEUE_POLL_INTERVAL_SECONDS', 1))  # 队列轮询间隔（秒）
@@ -50,7 +70,7 @@ class AnalysisWorker:
 
     def _signal_handler(self, signum, frame):
         """信号处理器，优雅关闭"""
-        logger.info(f"收到信号 {signum}，准备关闭Worker...")
+        logger.info(f"收到信号 {signum}，停止领取新任务，等待 {len(self.active_tasks)} 个执行中的任务完成...")
         self.running = False
 
     async def start(self):
@@ -79,11 +99,28 @@ class AnalysisWorker:
                 self.queue_service.global_concurrent_limit = int(effective_settings.get("max_concurrent_tasks", GLOBAL_CONCURRENT_LIMIT))
                 self.queue_service.visibility_timeout = int(effective_settings.get("default_analysis_timeout", VISIBILITY_TIMEOUT_SECONDS))
                 # Worker intervals
+                self.max_concurrent_tasks = int(effective_settings.get("worker_max_concurrent_tasks", self.max_concurrent_tasks))
                 self.heartbeat_interval = int(effective_settings.get("worker_heartbeat_interval_seconds", self.heartbeat_interval))
                 self.poll_interval = float(effective_settings.get("queue_poll_interval_seconds", self.poll_interval))
                 self.cleanup_interval = float(effective_settings.get("queue_cleanup_interval_seconds", self.cleanup_interval))
             except Exception:
                 pass
+
+            # 迁移升级前旧版FIFO队列中遗留的任务
+            await self.queue_service.migrate_legacy_queue()
+
+            # 并发执行的分析任务各占一个线程；另留少量线程给其他阻塞调用
+            # 队列全局并发上限之外的槽位领取不到任务，不必占用
+            global_limit = self.queue_service.global_concurrent_limit
+            if self.max_concurrent_tasks > global_limit:
+                logger.info(f"Worker 并发数 {self.max_concurrent_tasks} 超过队列全局并发上限 {global_limit}，按 {global_limit} 执行")
+            self.max_concurrent_tasks = max(1, min(self.max_concurrent_tasks, global_limit))
+            self._slots = asyncio.Semaphore(self.max_concurrent_tasks)
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrent_tasks + 4, thread_name_prefix=f"{self.worker_id}-analysis"
+            )
+            asyncio.get_running_loop().set_default_executor(self._executor)
+
             # 启动心跳任务
             heartbeat_task = asyncio.create_task(self._heartbeat_loop())
 
@@ -93,6 +130,9 @@ class AnalysisWorker:
             # 主工作循环
             await self._work_loop()
 
+            # 等待执行中的任务完成（期间心跳继续续期租约）
+            await self._drain()
+
             # 取消后台任务
             heartbeat_task.cancel()
             cleanup_task.cancel()
@@ -110,17 +150,28 @@ class AnalysisWorker:
             await self._cleanup()
 
     async def _work_loop(self):
-        """主工作循环"""
-        logger.info(f"✅ Worker {self.worker_id} 开始工作")
+        """主工作循环：有空闲槽位时出队，任务在后台并发执行"""
+        logger.info(f"✅ Worker {self.worker_id} 开始工作 (最大并发: {self.max_concurrent_tasks})")
 
         while self.running:
             try:
-                # 从队列获取任务
-                task_data = await self.queue_service.dequeue_task(self.worker_id)
+                # 槽位已满时等待，不阻塞在信号量上，以便及时响应关闭信号
+                if self._slots.locked():
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+
+                await self._slots.acquire()
+                try:
+                    # 从队列获取任务
+                    task_data = await self.queue_service.dequeue_task(self.worker_id)
+                except BaseException:
+                    self._slots.release()
+                    raise
 
                 if task_data:
-                    await self._process_task(task_data)
+                    self._start_task(task_data)
                 else:
+                    self._slots.release()
                     # 没有任务，短暂休眠
                     await asyncio.sleep(self.poll_interval)
 
@@ -130,6 +181,44 @@ class AnalysisWorker:
 
         logger.info(f"🔄 Worker {self.worker_id} 工作循环结束")
 
+    def _start_task(self, task_data: Dict[str, Any]):
+        """在后台执行任务，完成后释放槽位"""
+        async def run():
+            try:
+                await self._process_task(task_data)
+            finally:
+                self._slots.release()
+
+        task = asyncio.create_task(run(), name=f"analysis-{task_data.get('id')}")
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _drain(self):
+        """等待执行中的任务完成；超时后通知分析停止并交还租约，任务以相同ID重新入队
+
+        分析在线程中执行，取消 asyncio 任务无法停止线程：超时后设置取消信号，分析在下一个节点开始前退出，
+        由 _process_task 交还租约。宽限期内仍未退出的（卡在 LLM 调用中）直接交还租约，
+        令牌随之递增，线程之后的结果写入与确认都会被拒绝；进程随后强制退出，不等待这些线程。
+        """
+        if not self._inflight:
+            return
+
+        logger.info(f"⏳ 等待 {len(self._inflight)} 个执行中的任务完成 (最长 {self.shutdown_timeout:.0f}秒)")
+        _, pending = await asyncio.wait(set(self._inflight), timeout=self.shutdown_timeout)
+        if not pending:
+            return
+
+        logger.warning(f"⚠️ {len(pending)} 个任务未在关闭超时内完成，停止分析并重新入队")
+        for cancel_event in self._cancel_events.values():
+            cancel_event.set()
+        _, pending = await asyncio.wait(pending, timeout=_CANCEL_GRACE_SECONDS)
+        if not pending:
+            return
+
+        for task_id, lease_token in list(self.active_tasks.items()):
+            await self.queue_service.release_task(task_id, lease_token)
+        self.abandoned_tasks = len(pending)
+
     async def _process_task(self, task_data: Dict[str, Any]):
         """处理单个任务"""
         task_id = task_data.get("id")
@@ -138,8 +227,11 @@ class AnalysisWorker:
 
         logger.info(f"📊 开始处理任务: {task_id} - {stock_code}")
 
-        self.current_task = task_id
+        lease_token = task_data.get("lease_token")
+        self.active_tasks[task_id] = lease_token
+        cancel_event = self._cancel_events[task_id] = threading.Event()
         success = False
+        error: Optional[BaseException] = None
 
         try:
             # 构建分析任务对象
@@ -150,45 +242,87 @@ class AnalysisWorker:
 
             parameters = AnalysisParameters(**parameters_dict)
 
+            analysis_service = get_analysis_service()
             task = AnalysisTask(
                 task_id=task_id,
-                user_id=user_id,
+                user_id=analysis_service._convert_user_id(user_id),  # 兼容接口入队的用户ID不一定是 ObjectId
+                symbol=stock_code,
                 stock_code=stock_code,
                 batch_id=task_data.get("batch_id"),
                 parameters=parameters
             )
 
             # 执行分析
-            result = await get_analysis_service().execute_analysis_task(
+            result = await analysis_service.execute_analysis_task(
                 task,
-                progress_callback=self._progress_callback
+                progress_callback=lambda progress, message: self._progress_callback(task_id, progress, message),
+                retry_on_failure=True,
+                lease_token=lease_token,
+                cancel_event=cancel_event
             )
 
             success = True
             logger.info(f"✅ 任务完成: {task_id} - 耗时: {result.execution_time:.2f}秒")
 
+        except asyncio.CancelledError as e:
+            logger.warning(f"⚠️ 任务被中断: {task_id}")
+            error = e
+            raise
+
         except Exception as e:
             logger.error(f"❌ 任务执行失败: {task_id} - {e}")
             logger.error(traceback.format_exc())
+            error = e
 
         finally:
-            # 确认任务完成
+            # 携带租约令牌：任务已被重新分配时，本 Worker 的确认/重试会被拒绝
             try:
-                await self.queue_service.ack_task(task_id, success)
+                if success:
+                    await self.queue_service.ack_task(task_id, True, lease_token)
+                elif cancel_event.is_set() and not self.running:
+                    # 关闭超时被中断：交还租约，不计重试次数；检查点保留，其他 Worker 从断点继续
+                    await self.queue_service.release_task(task_id, lease_token)
+                elif not (self._should_retry(error)
+                          and await self.queue_service.retry_task(task_id, self.max_retries, lease_token)):
+                    # 不再重试：确认失败、写入失败状态并清理检查点
+                    if await self.queue_service.ack_task(task_id, False, lease_token):
+                        await get_analysis_service().mark_task_failed(task_id, str(error) or "任务被中断", lease_token)
+                        await asyncio.get_running_loop().run_in_executor(
+                            None, delete_checkpoint, get_graph_checkpointer(), task_id
+                        )
             except Exception as e:
                 logger.error(f"确认任务失败: {task_id} - {e}")
 
-            self.current_task = None
+            self.active_tasks.pop(task_id, None)
+            self._cancel_events.pop(task_id, None)
+
+    def _should_retry(self, error: Optional[BaseException]) -> bool:
+        """失败的任务是否以相同任务ID重新入队
 
-    def _progress_callback(self, progress: int, message: str):
+        被中断（事件循环关闭时取消）的任务总是重新入队；其他失败只在启用图检查点（重试从断点继续）时重试，
+        且只重试限流、超时、5xx 等瞬时故障，确定性错误重试只会重复消耗 LLM 调用
+        """
+        if isinstance(error, asyncio.CancelledError):
+            return True
+        if get_graph_checkpointer() is None:
+            return False
+        return is_service_failure(error)
+
+    def _progress_callback(self, task_id: str, progress: int, message: str):
         """进度回调函数"""
-        logger.debug(f"任务进度 {self.current_task}: {progress}% - {message}")
+        logger.debug(f"任务进度 {task_id}: {progress}% - {message}")
 
     async def _heartbeat_loop(self):
-        """心跳循环"""
-        while self.running:
+        """心跳循环（同时续期执行中任务的租约，关闭时持续到任务排空）"""
+        if self.queue_service and self.heartbeat_interval * 2 > self.queue_service.visibility_timeout:
+            logger.warning(
+                f"⚠️ 心跳间隔 {self.heartbeat_interval}秒 超过可见性超时的一半 "
+                f"({self.queue_service.visibility_timeout}秒)，租约可能来不及续期"
+            )
+        while self.running or self.active_tasks:
             try:
                 await self._send_heartbeat()
+                await self._renew_leases()
                 await asyncio.sleep(self.heartbeat_interval)
             except asyncio.CancelledError:
                 break
@@ -205,7 +339,8 @@ class AnalysisWorker:
             heartbeat_data = {
                 "worker_id": self.worker_id,
                 "timestamp": datetime.utcnow().isoformat(),
-                "current_task": self.current_task,
+                "current_tasks": list(self.active_tasks),
+                "max_concurrent_tasks": self.max_concurrent_tasks,
                 "status": "active" if self.running else "stopping"
             }
 
@@ -215,6 +350,19 @@ class AnalysisWorker:
         except Exception as e:
             logger.error(f"发送心跳失败: {e}")
 
+    async def _renew_leases(self):
+        """续期执行中任务的租约，长时间运行的分析不会因可见性超时被重复执行"""
+        if not self.queue_service:
+            return
+        for task_id, lease_token in list(self.active_tasks.items()):
+            cancel_event = self._cancel_events.get(task_id)
+            if cancel_event is None or cancel_event.is_set():
+                continue
+            if lease_token and not await self.queue_service.renew_lease(task_id, lease_token):
+                # 结果写入已按租约令牌防护；停止分析，不再为注定被拒绝的结果消耗 LLM 调用
+                logger.warning(f"⚠️ 任务租约已失效（已被重新分配、取消或完成），停止执行: {task_id}")
+                cancel_event.set()
+
     async def _cleanup_loop(self):
         """清理循环，定期清理过期任务"""
         while self.running:
@@ -231,6 +379,9 @@ class AnalysisWorker:
         """清理资源"""
         logger.info(f"🧹 清理Worker资源: {self.worker_id}")
 
+        if self._executor:
+            self._executor.shutdown(wait=False)
+
         try:
             # 清理心跳记录
             from app.core.redis_client import get_redis_service
@@ -267,6 +418,12 @@ async def main():
         logger.error(f"Worker异常退出: {e}")
         sys.exit(1)
 
+    if worker.abandoned_tasks:
+        # 线程池线程在解释器退出时会被等待，卡在 LLM 调用中的线程会使关闭超时失效；租约已交还，直接退出
+        logger.warning(f"⚠️ {worker.abandoned_tasks} 个分析线程未能停止（任务已重新入队），强制退出")
+        logging.shutdown()
+        os._exit(0)
+
     logger.info("Worker已安全退出")
 
 
@@ -0,0 +1,160 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+from app.services.queue import DEQUEUE_STALE, INFLIGHT_ZSET, SET_PROCESSING, TASK_PREFIX
+from app.services.queue import queue_service as queue_service_module
+from app.services.queue.queue_service import QueueService
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """queue_service 使用的时钟（只替换该模块中的 time）"""
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(queue_service_module, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def queue(clock, monkeypatch):
+    async def estimate_duration(self, params):
+        return float((params or {}).get("expected", 600))
+
+    monkeypatch.setattr(QueueService, "estimate_duration", estimate_duration)
+    q = QueueService(fakeredis.aioredis.FakeRedis(decode_responses=True))
+    q.user_concurrent_limit = 100
+    q.global_concurrent_limit = 100
+    return q
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_dequeue_respects_global_limit(queue):
+    queue.global_concurrent_limit = 1
+
+    async def run():
+        for symbol in ("000001", "000002", "000003"):
+            await queue.enqueue_task(user_id="u1", symbol=symbol, params={})
+        results = await asyncio.gather(*(queue.dequeue_task(f"worker-{i}") for i in range(5)))
+        taken = [r for r in results if r]
+        assert len(taken) == 1
+        assert taken[0]["lease_token"] == "1"
+        assert await queue.r.scard(SET_PROCESSING) == 1
+        assert await queue.r.zcard(INFLIGHT_ZSET) == 1
+
+    _run(run())
+
+
+def test_expired_lease_is_requeued_with_new_token(queue, clock):
+    async def run():
+        task_id = await queue.enqueue_task(user_id="u1", symbol="000001", params={})
+        token = (await queue.dequeue_task("worker-1"))["lease_token"]
+        deadline = await queue.r.zscore(INFLIGHT_ZSET, task_id)
+        assert deadline == clock[0] + queue.visibility_timeout
+
+        # 到期前续期，租约到期时间后移
+        clock[0] += 100
+        assert await queue.renew_lease(task_id, token)
+        assert not await queue._handle_expired_task(task_id, int(deadline) + 1)
+
+        clock[0] += queue.visibility_timeout + 1
+        await queue.cleanup_expired_tasks()
+        assert await queue.r.hget(TASK_PREFIX + task_id, "status") == "queued"
+        assert await queue.r.zscore(INFLIGHT_ZSET, task_id) is None
+        assert not await queue.renew_lease(task_id, token)
+        assert not await queue.ack_task(task_id, True, token)
+
+        task = await queue.dequeue_task("worker-2")
+        assert task["id"] == task_id
+        assert int(task["lease_token"]) == int(token) + 2
+        assert await queue.ack_task(task_id, True, task["lease_token"])
+
+    _run(run())
+
+
+def test_drr_serves_users_by_weight(queue):
+    async def run():
+        for i in range(8):
+            await queue.enqueue_task(user_id="heavy", symbol=f"h{i}", params={}, batch_id="b1")
+            await queue.enqueue_task(user_id="light", symbol=f"l{i}", params={}, batch_id="b2")
+        await queue.set_user_weight("heavy", 3)
+
+        served = [(await queue.dequeue_task("worker-1"))["user"] for _ in range(8)]
+        assert served.count("heavy") == 6
+        assert served.count("light") == 2
+
+    _run(run())
+
+
+def test_interactive_priority_is_served_before_batch(queue):
+    async def run():
+        await queue.enqueue_task(user_id="u1", symbol="000001", params={}, batch_id="b1")
+        interactive_id = await queue.enqueue_task(user_id="u2", symbol="000002", params={})
+        assert (await queue.dequeue_task("worker-1"))["id"] == interactive_id
+
+    _run(run())
+
+
+def test_sjf_prefers_short_task_within_user(queue, clock):
+    async def run():
+        await queue.enqueue_task(user_id="u1", symbol="long", params={"expected": 1000})
+        clock[0] += 10
+        await queue.enqueue_task(user_id="u1", symbol="short", params={"expected": 100})
+        assert (await queue.dequeue_task("worker-1"))["symbol"] == "short"
+
+    _run(run())
+
+
+def test_sjf_aging_promotes_long_waiting_task(queue, clock):
+    async def run():
+        await queue.enqueue_task(user_id="u1", symbol="long", params={"expected": 1000})
+        # 等待 2000 秒后，老化使长任务的等效耗时（1000 - 0.5 × 2000）低于新到的短任务
+        clock[0] += 2000
+        await queue.enqueue_task(user_id="u1", symbol="short", params={"expected": 100})
+        assert (await queue.dequeue_task("worker-1"))["symbol"] == "long"
+
+    _run(run())
+
+
+def test_retry_is_exhausted_but_release_is_not_counted(queue):
+    async def run():
+        task_id = await queue.enqueue_task(user_id="u1", symbol="000001", params={})
+
+        token = (await queue.dequeue_task("worker-1"))["lease_token"]
+        assert await queue.release_task(task_id, token)
+        for _ in range(2):
+            token = (await queue.dequeue_task("worker-1"))["lease_token"]
+            assert await queue.retry_task(task_id, 2, token)
+
+        token = (await queue.dequeue_task("worker-1"))["lease_token"]
+        assert not await queue.retry_task(task_id, 2, token)
+        assert await queue.ack_task(task_id, False, token)
+        assert await queue.r.hget(TASK_PREFIX + task_id, "status") == "failed"
+        assert await queue.r.hget(TASK_PREFIX + task_id, "retries") == "3"
+        assert await queue.dequeue_task("worker-1") is None
+
+    _run(run())
+
+
+def test_stale_key_snapshot_is_rejected_and_retried(queue, clock):
+    async def run():
+        for symbol in ("a", "b", "c"):
+            await queue.enqueue_task(user_id="u1", symbol=symbol, params={})
+            clock[0] += 1
+        keys, args = await queue._dequeue_keys("worker-1")
+
+        first = await queue.dequeue_task("worker-2")
+        # 快照只包含子队列头部两个任务；第一个已被取走，出队第二个时需要的第三个任务未在 KEYS 中声明
+        assert await queue._dequeue_script(keys=keys, args=args) == DEQUEUE_STALE
+
+        second = await queue.dequeue_task("worker-1")
+        assert second["symbol"] == "b"
+        assert second["id"] != first["id"]
+
+    _run(run())
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from app.models.analysis import AnalysisStatus
+from app.services.analysis import status_update_utils
+from app.services.queue.queue_service import QueueService
+
+
+class _FakeRedisService:
+    def __init__(self):
+        self.progress = {}
+
+    async def set_json(self, key, value, ttl=None):
+        self.progress[key] = value
+
+
+@pytest.fixture
+def env(monkeypatch):
+    db = mongomock_motor.AsyncMongoMockClient()["tradingagents"]
+    monkeypatch.setattr(status_update_utils, "get_mongo_db", lambda: db)
+    monkeypatch.setattr(status_update_utils, "get_redis_service", lambda: _FakeRedisService())
+    queue = QueueService(fakeredis.aioredis.FakeRedis(decode_responses=True))
+    return db, queue
+
+
+def test_batch_task_is_claimed_and_completed_with_its_lease(env):
+    db, queue = env
+
+    async def run():
+        await db.analysis_tasks.insert_one({"task_id": "mongo-task-1", "status": AnalysisStatus.PENDING.value})
+        queue_id = await queue.enqueue_task(
+            user_id="u1", symbol="000001", params={"task_id": "mongo-task-1"}, batch_id="b1", task_id="mongo-task-1"
+        )
+        assert queue_id == "mongo-task-1"
+
+        task = await queue.dequeue_task("worker-1")
+        assert task["id"] == "mongo-task-1"
+        token = task["lease_token"]
+
+        update = status_update_utils.perform_update_task_status
+        assert await update(task["id"], AnalysisStatus.PROCESSING, 10, lease_token=token)
+        assert await update(task["id"], AnalysisStatus.COMPLETED, 100, lease_token=token)
+        doc = await db.analysis_tasks.find_one({"task_id": "mongo-task-1"})
+        assert doc["status"] == AnalysisStatus.COMPLETED
+        assert doc["lease_token"] == int(token)
+
+    asyncio.run(run())
+
+
+def test_stale_lease_cannot_write_result(env):
+    db, queue = env
+
+    async def run():
+        await db.analysis_tasks.insert_one({"task_id": "mongo-task-2", "status": AnalysisStatus.PENDING.value})
+        await queue.enqueue_task(user_id="u1", symbol="000001", params={}, task_id="mongo-task-2")
+        stale = (await queue.dequeue_task("worker-1"))["lease_token"]
+
+        update = status_update_utils.perform_update_task_status
+        assert await update("mongo-task-2", AnalysisStatus.PROCESSING, 10, lease_token=stale)
+        # 任务被释放回队列，另一个 Worker 以新令牌接手
+        await queue.release_task("mongo-task-2", stale)
+        fresh = (await queue.dequeue_task("worker-2"))["lease_token"]
+        assert int(fresh) > int(stale)
+        assert await update("mongo-task-2", AnalysisStatus.PROCESSING, 10, lease_token=fresh)
+
+        assert not await update("mongo-task-2", AnalysisStatus.COMPLETED, 100, lease_token=stale)
+        assert not await update("mongo-task-2", AnalysisStatus.PROCESSING, 10, lease_token=stale)
+        assert await update("mongo-task-2", AnalysisStatus.COMPLETED, 100, lease_token=fresh)
+
+    asyncio.run(run())
+
+
+def test_task_without_mongo_record_is_not_fenced(env):
+    db, queue = env
+
+    async def run():
+        task_id = await queue.enqueue_task(user_id="u1", symbol="000001", params={})
+        token = (await queue.dequeue_task("worker-1"))["lease_token"]
+        update = status_update_utils.perform_update_task_status
+        assert await update(task_id, AnalysisStatus.PROCESSING, 10, lease_token=token)
+        assert await update(task_id, AnalysisStatus.COMPLETED, 100, lease_token=token)
+
+    asyncio.run(run())
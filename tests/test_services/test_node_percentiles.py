@@ -0,0 +1,38 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from app.services.analysis import performance_statistics_service as stats_module
+
+
+def test_legacy_tool_time_of_agent_nodes_counts_as_other_time(monkeypatch):
+    db = mongomock_motor.AsyncMongoMockClient()["test"]
+    monkeypatch.setattr(stats_module, "get_mongo_db", lambda: db)
+
+    async def run():
+        await db.analysis_reports.insert_many([
+            {
+                "created_at": datetime.utcnow(),
+                "performance_metrics": {"total_time": 10, "node_timings": {}, "node_metrics": {
+                    # 旧格式：非工具节点的非 LLM 时间记在 tool_time
+                    "Market Analyst": {"wall_time": 5.0, "llm_time": 3.0, "tool_time": 2.0},
+                    "tools_market": {"wall_time": 1.0, "llm_time": 0.0, "tool_time": 1.0},
+                }},
+            },
+            {
+                "created_at": datetime.utcnow(),
+                "performance_metrics": {"total_time": 10, "node_timings": {}, "node_metrics": {
+                    "Market Analyst": {"wall_time": 5.0, "llm_time": 3.0, "tool_time": 0.0, "other_time": 2.0},
+                }},
+            },
+        ])
+        return await stats_module.PerformanceStatisticsService().get_node_percentiles(days=1)
+
+    nodes = asyncio.run(run())["nodes"]
+    assert nodes["Market Analyst"]["other_time"]["p95"] == 2.0
+    assert nodes["Market Analyst"]["tool_time"]["p95"] == 0.0
+    assert nodes["tools_market"]["tool_time"]["p50"] == 1.0
+    assert "other_time" not in nodes["tools_market"]
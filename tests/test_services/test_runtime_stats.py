@@ -0,0 +1,38 @@
+import threading
+
+from app.services.analysis.performance_statistics_service import performance_statistics_service
+from tradingagents.llm_adapters.client_pool import get_llm_client_registry
+
+
+def test_runtime_stats_include_llm_client_pool():
+    registry = get_llm_client_registry()
+    registry.get_or_create("test", "model-a", None, "sk-test", 30, lambda http_client: object())
+    registry.get_or_create("test", "model-a", None, "sk-test", 30, lambda http_client: object())
+
+    pool = performance_statistics_service.get_runtime_stats()["llm_client_pool"]
+    assert pool["client_hits"] >= 1
+    assert pool["clients"] >= 1
+    assert "connection_reuse_rate" in pool
+
+
+def test_runtime_stats_include_llm_concurrency_limiters():
+    from tradingagents.llm_adapters.concurrency import get_llm_concurrency_controller
+
+    controller = get_llm_concurrency_controller()
+    with controller.slot("test", "model-a"):
+        pass
+
+    concurrency = performance_statistics_service.get_runtime_stats()["llm_concurrency"]
+    assert "test/model-a" in concurrency["limiters"]
+    assert "wait_exceeded" in concurrency["limiters"]["test/model-a"]
+
+
+def test_runtime_stats_include_chromadb_lock_waits():
+    from tradingagents.agents.utils.memory import ChromaDBManager
+
+    manager = ChromaDBManager()
+    with manager._timed_lock(threading.Lock(), "write:test"):
+        pass
+
+    locks = performance_statistics_service.get_runtime_stats()["chromadb_locks"]
+    assert locks["write:test"]["count"] >= 1
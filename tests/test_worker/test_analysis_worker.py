@@ -0,0 +1,126 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("langgraph")
+pytest.importorskip("langchain_openai")
+
+from bson import ObjectId
+
+from app.worker import analysis_worker
+from app.worker.analysis_worker import AnalysisWorker
+from tradingagents.graph.trading_graph import GraphRunCancelled
+
+
+class _FakeQueue:
+    def __init__(self, events):
+        self.events = events
+        self.global_concurrent_limit = 3
+        self.visibility_timeout = 300
+
+    async def release_task(self, task_id, lease_token=None):
+        self.events.append(("release", task_id, lease_token))
+        return True
+
+    async def ack_task(self, task_id, success=True, lease_token=None):
+        self.events.append(("ack", task_id, success))
+        return True
+
+    async def retry_task(self, task_id, max_retries, lease_token=None):
+        self.events.append(("retry", task_id))
+        return True
+
+    async def renew_lease(self, task_id, lease_token):
+        return True
+
+
+class _FakeAnalysisService:
+    """分析在线程中执行：cooperative=True 时在节点间响应取消信号，否则卡住直到 unblock"""
+
+    def __init__(self, cooperative):
+        self.cooperative = cooperative
+        self.started = threading.Event()
+        self.unblock = threading.Event()
+        self.cancel_events = []
+
+    def _convert_user_id(self, user_id):
+        return ObjectId()
+
+    def _run(self, cancel_event):
+        self.started.set()
+        if self.cooperative:
+            cancel_event.wait(5)
+            raise GraphRunCancelled("stopped between nodes")
+        self.unblock.wait(5)
+
+    async def execute_analysis_task(self, task, cancel_event=None, **kwargs):
+        self.cancel_events.append(cancel_event)
+        await asyncio.get_running_loop().run_in_executor(None, self._run, cancel_event)
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    events = []
+    monkeypatch.setattr(analysis_worker, "_CANCEL_GRACE_SECONDS", 0.2)
+    monkeypatch.setattr(analysis_worker, "get_graph_checkpointer", lambda: None)
+    w = AnalysisWorker(worker_id="worker-test")
+    w.queue_service = _FakeQueue(events)
+    w.shutdown_timeout = 0.1
+    w._slots = asyncio.Semaphore(1)
+    return w, events
+
+
+async def _shutdown_with_inflight_task(w):
+    await w._slots.acquire()
+    w._start_task({"id": "t1", "symbol": "000001", "user": "admin", "lease_token": "7", "parameters": {}})
+    await asyncio.sleep(0.05)
+    w.running = False
+    await w._drain()
+
+
+def test_module_imports_queue_and_analysis_services():
+    from app.services.analysis import analysis_service
+    from app.services.queue import queue_service
+
+    assert analysis_worker.get_queue_service is queue_service.get_queue_service
+    assert analysis_worker.get_analysis_service is analysis_service.get_analysis_service
+
+
+def test_drain_cancels_inflight_task_and_releases_lease(worker, monkeypatch):
+    w, events = worker
+    service = _FakeAnalysisService(cooperative=True)
+    monkeypatch.setattr(analysis_worker, "get_analysis_service", lambda: service)
+
+    asyncio.run(_shutdown_with_inflight_task(w))
+
+    assert service.cancel_events[0].is_set()
+    assert events == [("release", "t1", "7")]
+    assert w.abandoned_tasks == 0
+    assert not w.active_tasks
+
+
+def test_stuck_task_lease_is_released_before_forced_exit(monkeypatch):
+    events = []
+    service = _FakeAnalysisService(cooperative=False)
+    monkeypatch.setattr(analysis_worker, "_CANCEL_GRACE_SECONDS", 0.2)
+    monkeypatch.setattr(analysis_worker, "get_graph_checkpointer", lambda: None)
+    monkeypatch.setattr(analysis_worker, "get_analysis_service", lambda: service)
+
+    async def fake_start(self):
+        self.queue_service = _FakeQueue(events)
+        self.shutdown_timeout = 0.1
+        self._slots = asyncio.Semaphore(1)
+        await _shutdown_with_inflight_task(self)
+
+    def fake_exit(code):
+        events.append(("exit", code))
+        service.unblock.set()
+
+    monkeypatch.setattr(AnalysisWorker, "start", fake_start)
+    monkeypatch.setattr(analysis_worker.os, "_exit", fake_exit)
+
+    asyncio.run(analysis_worker.main())
+
+    assert service.cancel_events[0].is_set()
+    assert events[:2] == [("release", "t1", "7"), ("exit", 0)]
@@ -6,6 +6,7 @@
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import AIMessage, ToolMessage
 
+from tradingagents.agents.utils.token_budget import fit_prompt_to_budget
 from tradingagents.db.document import get_company_name, get_stock_daily_basic
 from tradingagents.utils.stock_utils import unified_code
 # 导入分析模块日志装饰器
@@ -128,9 +129,10 @@ def create_fundamentals_analyst(llm_model, toolkit):
             language = "英文"
 
         # 生成基于真实数据的分析报告
-        analysis_prompt = f"""基于以下真实数据，对{company_name}（股票代码：{ticker}）进行详细的基本面分析：
+        def build_prompt(fundamentals_data):
+            return f"""基于以下真实数据，对{company_name}（股票代码：{ticker}）进行详细的基本面分析：
         
-        {combined_data}
+        {fundamentals_data}
         
         请提供：
         1. 公司基本信息分析（{company_name}，股票代码：{ticker}）
@@ -147,6 +149,15 @@ def create_fundamentals_analyst(llm_model, toolkit):
         - 使用{language}撰写
         - 分析要详细且专业"""
 
+        # ✂️ 预检 token 数，超出节点预算时只截断基本面数据
+        analysis_prompt, prompt_tokens = fit_prompt_to_budget(
+            "Fundamentals Analyst",
+            build_prompt,
+            sections={"fundamentals_data": str(combined_data)},
+            trim_order=["fundamentals_data"],
+        )
+        logger.debug(f"📊 [DEBUG] 基本面分析 prompt token 数: {prompt_tokens}")
+
         try:
             # 创建简单的分析链
             analysis_prompt_template = ChatPromptTemplate.from_messages([
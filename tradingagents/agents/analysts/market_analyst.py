@@ -4,6 +4,7 @@ import time
 import json
 import traceback
 
+from tradingagents.agents.utils.token_budget import fit_prompt_to_budget
 from tradingagents.db.document import get_company_name, get_stock_daily_technical
 from tradingagents.utils.stock_utils import unified_code
 # 导入分析模块日志装饰器
@@ -18,14 +19,13 @@ from tradingagents.agents.utils.google_tool_handler import GoogleToolCallHandler
 
 
 
-def create_market_analyst(llm_model, toolkit):
+def create_market_analyst(llm_model, toolkit, max_tool_calls=3):
 
     def market_analyst_node(state):
         logger.debug(f"📈 [DEBUG] ===== 市场分析师节点开始 =====")
         llm = llm_model.get_llm()
         # 🔧 工具调用计数器 - 防止无限循环
         tool_call_count = state.get("market_tool_call_count", 0)
-        max_tool_calls = 3  # 最大工具调用次数
         logger.info(f"🔧 [死循环修复] 当前工具调用次数: {tool_call_count}/{max_tool_calls}")
 
         current_date = state["trade_date"]
@@ -175,8 +175,17 @@ def create_market_analyst(llm_model, toolkit):
 
 
         # 构建完整的消息序列
-        messages = state["messages"] + [HumanMessage(content=result_str[:5000])] + [HumanMessage(content=analysis_prompt)]
-
+        def build_messages(technical_data):
+            return state["messages"] + [HumanMessage(content=technical_data)] + [HumanMessage(content=analysis_prompt)]
+
+        # ✂️ 预检 token 数，超出节点预算时只截断技术指标数据
+        messages, prompt_tokens = fit_prompt_to_budget(
+            "Market Analyst",
+            build_messages,
+            sections={"technical_data": result_str},
+            trim_order=["technical_data"],
+        )
+        logger.debug(f"📈 [DEBUG] 市场分析 prompt token 数: {prompt_tokens}")
 
         # 生成最终分析报告
         final_result = llm.invoke(messages)
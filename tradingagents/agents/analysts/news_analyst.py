@@ -16,15 +16,15 @@ logger = get_logger("default")
 
 # 导入股票代码统一处理函数
 from tradingagents.utils.stock_utils import unified_code
+from tradingagents.agents.utils.token_budget import fit_prompt_to_budget
 
 
-def create_news_analyst(llm_model, toolkit):
+def create_news_analyst(llm_model, toolkit, max_tool_calls=3):
     def news_analyst_node(state):
         logger.debug(f"📈 [DEBUG] ===== 新闻分析师节点开始 =====")
         llm = llm_model.get_llm()
         # 🔧 工具调用计数器 - 防止无限循环
         tool_call_count = state.get("news_tool_call_count", 0)
-        max_tool_calls = 3
         logger.info(f"🔧 [死循环修复] 当前工具调用次数: {tool_call_count}/{max_tool_calls}")
 
         current_date = state["trade_date"]
@@ -76,10 +76,11 @@ def create_news_analyst(llm_model, toolkit):
         logger.debug(f"📈 [DEBUG] 新闻数据字符串长度: {len(news_str)}")
 
         # 构建分析提示词
-        analysis_prompt = f"""请基于以下获取的新闻数据，对 {company_name}（{ticker}）进行详细的新闻分析：
+        def build_messages(news_data):
+            analysis_prompt = f"""请基于以下获取的新闻数据，对 {company_name}（{ticker}）进行详细的新闻分析：
 
 === 新闻数据 ===
-{news_str[:4000]}
+{news_data}
 
 === 分析要求 ===
 
@@ -130,9 +131,17 @@ def create_news_analyst(llm_model, toolkit):
 5. 使用标准的Markdown标题格式（#、##、###）
 6. 全部使用{language}撰写报告
 """
-
-        # 构建完整的消息序列
-        messages = state["messages"] + [HumanMessage(content=analysis_prompt[:8000])]
+            # 构建完整的消息序列
+            return state["messages"] + [HumanMessage(content=analysis_prompt)]
+
+        # ✂️ 预检 token 数，超出节点预算时只截断新闻数据（保留分析要求与输出格式）
+        messages, prompt_tokens = fit_prompt_to_budget(
+            "News Analyst",
+            build_messages,
+            sections={"news_data": news_str},
+            trim_order=["news_data"],
+        )
+        logger.debug(f"📈 [DEBUG] 新闻分析 prompt token 数: {prompt_tokens}")
 
         # 生成最终分析报告
         logger.debug(f"📈 [DEBUG] 开始调用LLM生成新闻分析")
@@ -9,6 +9,7 @@ logger = get_logger("analysts.social_media")
 
 # 导入Google工具调用处理器
 from tradingagents.agents.utils.google_tool_handler import GoogleToolCallHandler
+from tradingagents.agents.utils.token_budget import fit_prompt_to_budget
 
 
 def _get_company_name_for_social_media(ticker: str, market_info: dict) -> str:
@@ -89,12 +90,50 @@ def _get_company_name_for_social_media(ticker: str, market_info: dict) -> str:
         return f"股票{ticker}"
 
 
-def create_social_media_analyst(llm, toolkit):
+def _analyze_sentiment_from_local_data(llm_model, state, ticker: str, company_name: str) -> str:
+    """仅使用本地数据库中的个股新闻/事件评估投资者情绪（快速模式，不调用在线工具）"""
+    from datetime import datetime, timedelta
+    from tradingagents.db.document import get_stock_news
+    from tradingagents.utils.stock_utils import unified_code
+
+    current_date = state["trade_date"]
+    end_date = datetime.strptime(current_date, "%Y-%m-%d")
+    start_date = (end_date - timedelta(days=30)).strftime("%Y-%m-%d")
+    symbol = 'code.' + unified_code(ticker).split('.')[0]
+    news_data = get_stock_news(symbol, start_date, current_date)
+
+    news_lines = []
+    for i, news in enumerate(news_data[:10], 1):
+        news_lines.append(f"{i}. {news.get('event_type', '无标题')} ({news.get('trade_date', '')}): "
+                          f"{str(news.get('event_detail', ''))[:150]}")
+    news_str = "\n".join(news_lines) or "本地数据库中暂无近期相关新闻/事件。"
+
+    def build_prompt(news_data):
+        return f"""您是一位专业的中国市场投资情绪分析师。请仅基于以下本地数据，评估投资者对 {company_name}（{ticker}）的情绪，
+当前日期是{current_date}。
+
+=== 近30天个股新闻/事件 ===
+{news_data}
+
+要求：
+- 给出情绪指数评分（1-10分）和情绪变化趋势
+- 评估情绪对短期（1-5天）股价的影响和预期波动幅度
+- 给出基于情绪的交易时机建议
+- 报告简明扼要（不超过500字），末尾附Markdown表格总结关键发现
+- 请用中文撰写"""
+
+    # ✂️ 预检 token 数，超出节点预算时只截断新闻/事件数据
+    prompt, _ = fit_prompt_to_budget(
+        "Social Analyst", build_prompt, sections={"news_data": news_str}, trim_order=["news_data"]
+    )
+    return llm_model.get_llm().invoke(prompt).content
+
+
+def create_social_media_analyst(llm, toolkit, max_tool_calls=3, local_data_only=False):
     @log_analyst_module("social_media")
     def social_media_analyst_node(state):
         # 🔧 工具调用计数器 - 防止无限循环
         tool_call_count = state.get("sentiment_tool_call_count", 0)
-        max_tool_calls = 3  # 最大工具调用次数
         logger.info(f"🔧 [死循环修复] 当前工具调用次数: {tool_call_count}/{max_tool_calls}")
 
         current_date = state["trade_date"]
@@ -108,6 +147,15 @@ def create_social_media_analyst(llm, toolkit):
         company_name = _get_company_name_for_social_media(ticker, market_info)
         logger.info(f"[社交媒体分析师] 公司名称: {company_name}")
 
+        if local_data_only:
+            # ⚡ 快速模式：只使用本地数据，单次 LLM 调用生成情绪报告
+            logger.info(f"⚡ [社交媒体分析师] 快速模式，仅使用本地数据")
+            report = _analyze_sentiment_from_local_data(llm, state, ticker, company_name)
+            return {
+                "sentiment_report": report,
+                "sentiment_tool_call_count": tool_call_count + 1
+            }
+
         # 统一使用 get_stock_sentiment_unified 工具
         # 该工具内部会自动识别股票类型并调用相应的情绪数据源
         logger.info(f"[社交媒体分析师] 使用统一情绪分析工具，自动识别股票类型")
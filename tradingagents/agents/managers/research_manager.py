@@ -1,6 +1,9 @@
 import time
 import json
 
+from tradingagents.agents.utils.memory_recall import get_past_memories
+from tradingagents.agents.utils.token_budget import fit_prompt_to_budget
+
 # 导入统一日志系统
 from tradingagents.utils.logging_init import get_logger
 logger = get_logger("default")
@@ -24,18 +27,15 @@ def create_research_manager(llm_model, memory):
 
         curr_situation = f"{market_research_report}\n\n{sentiment_report}\n\n{news_report}\n\n{fundamentals_report}"
 
-        # 安全检查：确保memory不为None
-        if memory is not None:
-            past_memories = memory.get_memories(curr_situation, n_matches=2)
-        else:
-            logger.warning(f"⚠️ [DEBUG] memory为None，跳过历史记忆检索")
-            past_memories = []
+        # 优先使用 Memory Recall 节点的检索结果
+        past_memories = get_past_memories(state, "invest_judge", memory, curr_situation, n_matches=2)
 
         past_memory_str = ""
         for i, rec in enumerate(past_memories, 1):
             past_memory_str += rec["recommendation"] + "\n\n"
 
-        prompt = f"""作为投资组合经理和辩论主持人，您的职责是批判性地评估这轮辩论并做出明确决策：支持看跌分析师、看涨分析师，或者仅在基于所提出论点有强有力理由时选择持有。
+        def build_prompt(history, past_memory_str, news_report, sentiment_report, market_research_report, fundamentals_report):
+            return f"""作为投资组合经理和辩论主持人，您的职责是批判性地评估这轮辩论并做出明确决策：支持看跌分析师、看涨分析师，或者仅在基于所提出论点有强有力理由时选择持有。
 
 简洁地总结双方的关键观点，重点关注最有说服力的证据或推理。您的建议——买入、卖出或持有——必须明确且可操作。避免仅仅因为双方都有有效观点就默认选择持有；要基于辩论中最强有力的论点做出承诺。
 
@@ -73,14 +73,29 @@ def create_research_manager(llm_model, memory):
 
 请用{language}撰写所有分析内容和建议。"""
 
+        # ✂️ 预检 token 数，超出节点预算时从最旧的辩论历史开始裁剪
+        prompt, prompt_tokens = fit_prompt_to_budget(
+            "Research Manager",
+            build_prompt,
+            sections={
+                "history": history,
+                "past_memory_str": past_memory_str,
+                "news_report": news_report,
+                "sentiment_report": sentiment_report,
+                "market_research_report": market_research_report,
+                "fundamentals_report": fundamentals_report,
+            },
+            trim_order=["history", "past_memory_str", "news_report", "sentiment_report", "market_research_report", "fundamentals_report"],
+        )
+
         # 📊 统计 prompt 大小
         prompt_length = len(prompt)
-        estimated_tokens = int(prompt_length / 1.8)
+        estimated_tokens = prompt_tokens
 
         logger.info(f"📊 [Research Manager] Prompt 统计:")
         logger.info(f"   - 辩论历史长度: {len(history)} 字符")
         logger.info(f"   - 总 Prompt 长度: {prompt_length} 字符")
-        logger.info(f"   - 估算输入 Token: ~{estimated_tokens} tokens")
+        logger.info(f"   - 输入 Token: {estimated_tokens} tokens")
 
         # ⏱️ 记录开始时间
         start_time = time.time()
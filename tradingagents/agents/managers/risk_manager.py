@@ -1,6 +1,9 @@
 import time
 import json
 
+from tradingagents.agents.utils.memory_recall import get_past_memories
+from tradingagents.agents.utils.token_budget import fit_prompt_to_budget
+
 # 导入统一日志系统
 from tradingagents.utils.logging_init import get_logger
 logger = get_logger("default")
@@ -28,18 +31,19 @@ def create_risk_manager(llm_model, memory):
 
         curr_situation = f"{market_research_report}\n\n{sentiment_report}\n\n{news_report}\n\n{fundamentals_report}"
 
-        # 安全检查：确保memory不为None
-        if memory is not None:
-            past_memories = memory.get_memories(curr_situation, n_matches=2)
-        else:
-            logger.warning(f"⚠️ [DEBUG] memory为None，跳过历史记忆检索")
-            past_memories = []
+        # ⚡ 快速模式没有研究经理的投资计划，直接基于分析师报告决策
+        if not trader_plan:
+            trader_plan = f"（未生成投资计划，以下为各分析师报告）\n{curr_situation}"
+
+        # 优先使用 Memory Recall 节点的检索结果
+        past_memories = get_past_memories(state, "risk_manager", memory, curr_situation, n_matches=2)
 
         past_memory_str = ""
         for i, rec in enumerate(past_memories, 1):
             past_memory_str += rec["recommendation"] + "\n\n"
 
-        prompt = f"""作为风险管理委员会主席和辩论主持人，您的目标是评估三位风险分析师——激进、中性和安全/保守——之间的辩论，并确定交易员的最佳行动方案。您的决策必须产生明确的建议：买入、卖出或持有。只有在有具体论据强烈支持时才选择持有，而不是在所有方面都似乎有效时作为后备选择。力求清晰和果断。
+        def build_prompt(history, past_memory_str, trader_plan):
+            return f"""作为风险管理委员会主席和辩论主持人，您的目标是评估三位风险分析师——激进、中性和安全/保守——之间的辩论，并确定交易员的最佳行动方案。您的决策必须产生明确的建议：买入、卖出或持有。只有在有具体论据强烈支持时才选择持有，而不是在所有方面都似乎有效时作为后备选择。力求清晰和果断。
 
 决策指导原则：
 1. **总结关键论点**：提取每位分析师的最强观点，重点关注与背景的相关性。
@@ -60,17 +64,28 @@ def create_risk_manager(llm_model, memory):
 
 专注于可操作的见解和持续改进。建立在过去经验教训的基础上，批判性地评估所有观点，确保每个决策都能带来更好的结果。请用中文撰写所有分析内容和建议。"""
 
+        # ✂️ 预检 token 数，超出节点预算时从最旧的辩论历史开始裁剪
+        prompt, prompt_tokens = fit_prompt_to_budget(
+            "Risk Judge",
+            build_prompt,
+            sections={
+                "history": history,
+                "past_memory_str": past_memory_str,
+                "trader_plan": trader_plan,
+            },
+            trim_order=["history", "past_memory_str", "trader_plan"],
+        )
+
         # 📊 统计 prompt 大小
         prompt_length = len(prompt)
-        # 粗略估算 token 数量（中文约 1.5-2 字符/token，英文约 4 字符/token）
-        estimated_tokens = int(prompt_length / 1.8)  # 保守估计
+        estimated_tokens = prompt_tokens
 
         logger.info(f"📊 [Risk Manager] Prompt 统计:")
         logger.info(f"   - 辩论历史长度: {len(history)} 字符")
         logger.info(f"   - 交易员计划长度: {len(trader_plan)} 字符")
         logger.info(f"   - 历史记忆长度: {len(past_memory_str)} 字符")
         logger.info(f"   - 总 Prompt 长度: {prompt_length} 字符")
-        logger.info(f"   - 估算输入 Token: ~{estimated_tokens} tokens")
+        logger.info(f"   - 输入 Token: {estimated_tokens} tokens")
 
         # 增强的LLM调用，包含错误处理和重试机制
         max_retries = 3
@@ -3,6 +3,9 @@ import time
 import json
 
 from tradingagents.db.document import get_company_name
+from tradingagents.agents.utils.memory_recall import get_past_memories
+from tradingagents.agents.utils.token_budget import fit_prompt_to_budget
+
 # 导入统一日志系统
 from tradingagents.utils.logging_init import get_logger
 logger = get_logger("default")
@@ -34,18 +37,15 @@ def create_bear_researcher(llm_model, memory):
 
         curr_situation = f"{market_research_report}\n\n{sentiment_report}\n\n{news_report}\n\n{fundamentals_report}"
 
-        # 安全检查：确保memory不为None
-        if memory is not None:
-            past_memories = memory.get_memories(curr_situation, n_matches=2)
-        else:
-            logger.warning(f"⚠️ [DEBUG] memory为None，跳过历史记忆检索")
-            past_memories = []
+        # 优先使用 Memory Recall 节点的检索结果
+        past_memories = get_past_memories(state, "bear", memory, curr_situation, n_matches=2)
 
         past_memory_str = ""
         for i, rec in enumerate(past_memories, 1):
             past_memory_str += rec["recommendation"] + "\n\n"
 
-        prompt = f"""你是一位看跌分析师，负责论证不投资股票 {company_name}（股票代码：{ticker}）的理由。
+        def build_prompt(history, past_memory_str, news_report, sentiment_report, market_research_report, fundamentals_report):
+            return f"""你是一位看跌分析师，负责论证不投资股票 {company_name}（股票代码：{ticker}）的理由。
 
 ⚠️ 重要提醒：当前分析的是股票市场。
 ⚠️ 在你的分析中，请始终使用公司名称"{company_name}"而不是股票代码"{ticker}"来称呼这家公司。
@@ -75,6 +75,21 @@ def create_bear_researcher(llm_model, memory):
 请确保所有回答都使用{language}。
 """
 
+        # ✂️ 预检 token 数，超出节点预算时从最旧的辩论历史开始裁剪
+        prompt, prompt_tokens = fit_prompt_to_budget(
+            "Bear Researcher",
+            build_prompt,
+            sections={
+                "history": history,
+                "past_memory_str": past_memory_str,
+                "news_report": news_report,
+                "sentiment_report": sentiment_report,
+                "market_research_report": market_research_report,
+                "fundamentals_report": fundamentals_report,
+            },
+            trim_order=["history", "past_memory_str", "news_report", "sentiment_report", "market_research_report", "fundamentals_report"],
+        )
+
         response = llm.invoke(prompt)
 
         argument = f"Bear Analyst: {response.content}"
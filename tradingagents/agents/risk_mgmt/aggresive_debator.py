@@ -1,6 +1,8 @@
 import time
 import json
 
+from tradingagents.agents.utils.token_budget import fit_prompt_to_budget
+
 # 导入统一日志系统
 from tradingagents.utils.logging_init import get_logger
 logger = get_logger("default")
@@ -41,7 +43,8 @@ def create_risky_debator(llm_model):
                        len(current_safe_response) + len(current_neutral_response))
         logger.info(f"  - 总Prompt长度: {total_length:,} 字符 (~{total_length//4:,} tokens)")
 
-        prompt = f"""作为激进风险分析师，您的职责是积极倡导高回报、高风险的投资机会，强调大胆策略和竞争优势。在评估交易员的决策或计划时，请重点关注潜在的上涨空间、增长潜力和创新收益——即使这些伴随着较高的风险。使用提供的市场数据和情绪分析来加强您的论点，并挑战对立观点。具体来说，请直接回应保守和中性分析师提出的每个观点，用数据驱动的反驳和有说服力的推理进行反击。突出他们的谨慎态度可能错过的关键机会，或者他们的假设可能过于保守的地方。以下是交易员的决策：
+        def build_prompt(history, news_report, sentiment_report, market_research_report, fundamentals_report):
+            return f"""作为激进风险分析师，您的职责是积极倡导高回报、高风险的投资机会，强调大胆策略和竞争优势。在评估交易员的决策或计划时，请重点关注潜在的上涨空间、增长潜力和创新收益——即使这些伴随着较高的风险。使用提供的市场数据和情绪分析来加强您的论点，并挑战对立观点。具体来说，请直接回应保守和中性分析师提出的每个观点，用数据驱动的反驳和有说服力的推理进行反击。突出他们的谨慎态度可能错过的关键机会，或者他们的假设可能过于保守的地方。以下是交易员的决策：
 
 {trader_decision}
 
@@ -55,6 +58,20 @@ def create_risky_debator(llm_model):
 
 积极参与，解决提出的任何具体担忧，反驳他们逻辑中的弱点，并断言承担风险的好处以超越市场常规。专注于辩论和说服，而不仅仅是呈现数据。挑战每个反驳点，强调为什么高风险方法是最优的。请用中文以对话方式输出，就像您在说话一样，不使用任何特殊格式。"""
 
+        # ✂️ 预检 token 数，超出节点预算时从最旧的辩论历史开始裁剪
+        prompt, prompt_tokens = fit_prompt_to_budget(
+            "Risky Analyst",
+            build_prompt,
+            sections={
+                "history": history,
+                "news_report": news_report,
+                "sentiment_report": sentiment_report,
+                "market_research_report": market_research_report,
+                "fundamentals_report": fundamentals_report,
+            },
+            trim_order=["history", "news_report", "sentiment_report", "market_research_report", "fundamentals_report"],
+        )
+
         logger.info(f"⏱️ [Risky Analyst] 开始调用LLM...")
         import time
         llm_start_time = time.time()
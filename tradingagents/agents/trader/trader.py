@@ -2,6 +2,9 @@ import functools
 import time
 import json
 
+from tradingagents.agents.utils.memory_recall import get_past_memories
+from tradingagents.agents.utils.token_budget import fit_prompt_to_budget
+
 # 导入统一日志系统
 from tradingagents.utils.logging_init import get_logger
 logger = get_logger("default")
@@ -41,10 +44,10 @@ def create_trader(llm_model, memory):
 
         curr_situation = f"{market_research_report}\n\n{sentiment_report}\n\n{news_report}\n\n{fundamentals_report}"
 
-        # 检查memory是否可用
+        # 检查memory是否可用（优先使用 Memory Recall 节点的检索结果）
         if memory is not None:
             logger.warning(f"⚠️ [DEBUG] memory可用，获取历史记忆")
-            past_memories = memory.get_memories(curr_situation, n_matches=2)
+            past_memories = get_past_memories(state, "trader", memory, curr_situation, n_matches=2)
             past_memory_str = ""
             for i, rec in enumerate(past_memories, 1):
                 past_memory_str += rec["recommendation"] + "\n\n"
@@ -53,15 +56,16 @@ def create_trader(llm_model, memory):
             past_memories = []
             past_memory_str = "暂无历史记忆数据可参考。"
 
-        context = {
-            "role": "user",
-            "content": f"Based on a comprehensive analysis by a team of analysts, here is an investment plan tailored for {company_name}. This plan incorporates insights from current technical market trends, macroeconomic indicators, and social media sentiment. Use this plan as a foundation for evaluating your next trading decision.\n\nProposed Investment Plan: {investment_plan}\n\nLeverage these insights to make an informed and strategic decision.",
-        }
+        def build_messages(investment_plan, past_memory_str):
+            context = {
+                "role": "user",
+                "content": f"Based on a comprehensive analysis by a team of analysts, here is an investment plan tailored for {company_name}. This plan incorporates insights from current technical market trends, macroeconomic indicators, and social media sentiment. Use this plan as a foundation for evaluating your next trading decision.\n\nProposed Investment Plan: {investment_plan}\n\nLeverage these insights to make an informed and strategic decision.",
+            }
 
-        messages = [
-            {
-                "role": "system",
-                "content": f"""您是一位专业的交易员，负责分析市场数据并做出投资决策。基于您的分析，请提供具体的买入、卖出或持有建议。
+            return [
+                {
+                    "role": "system",
+                    "content": f"""您是一位专业的交易员，负责分析市场数据并做出投资决策。基于您的分析，请提供具体的买入、卖出或持有建议。
 
 ⚠️ 重要提醒：当前分析的股票代码是 {company_name}，请使用正确的货币单位：{currency}（{currency_symbol}）
 
@@ -98,9 +102,20 @@ def create_trader(llm_model, memory):
 请用{language}撰写分析内容，并始终以'最终交易建议: **买入/持有/卖出**'结束您的回应以确认您的建议。
 
 请不要忘记利用过去决策的经验教训来避免重复错误。以下是类似情况下的交易反思和经验教训: {past_memory_str}""",
+                },
+                context,
+            ]
+
+        # ✂️ 预检 token 数，超出节点预算时先裁剪历史记忆，再裁剪投资计划
+        messages, prompt_tokens = fit_prompt_to_budget(
+            "Trader",
+            build_messages,
+            sections={
+                "investment_plan": investment_plan,
+                "past_memory_str": past_memory_str,
             },
-            context,
-        ]
+            trim_order=["past_memory_str", "investment_plan"],
+        )
 
         logger.debug(f"💰 [DEBUG] 准备调用LLM，系统提示包含货币: {currency}")
         logger.debug(f"💰 [DEBUG] 系统提示中的关键部分: 目标价格({currency})")
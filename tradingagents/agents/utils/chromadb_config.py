@@ -1,12 +1,35 @@
 """
 ChromaDB 统一配置模块
 支持 Windows 10/11 和其他操作系统的自动适配
+
+存储模式（环境变量 TA_CHROMA_MODE）：
+- memory: 进程内内存存储（默认），重启后记忆丢失
+- persistent: 本地目录持久化（TA_CHROMA_PERSIST_DIR），仅支持单个进程使用；
+  PersistentClient 不支持多进程共享同一目录，启动时以独占文件锁检测，目录已被其他进程占用时拒绝
+- http: 连接独立的 Chroma 服务（TA_CHROMA_HOST / TA_CHROMA_PORT），多个 Worker 进程共享同一份记忆
 """
 import os
 import platform
 import chromadb
 from chromadb.config import Settings
 
+from tradingagents.utils.logging_init import get_logger
+
+logger = get_logger("agents.utils.memory")
+
+try:
+    from filelock import FileLock, Timeout
+    _HAS_FILELOCK = True
+except ImportError:
+    _HAS_FILELOCK = False
+
+# 持久化目录的独占锁，进程存活期间一直持有
+_persist_owner_lock = None
+
+
+class ChromaDBDirectoryInUse(RuntimeError):
+    """持久化目录已被其他进程独占"""
+
 
 def is_windows_11() -> bool:
     """
@@ -121,8 +144,72 @@ def get_optimal_chromadb_client():
         return chromadb.Client(settings)
 
 
+def get_chromadb_mode() -> str:
+    """当前配置的存储模式：memory / persistent / http"""
+    mode = (os.getenv("TA_CHROMA_MODE") or "memory").strip().lower()
+    if mode not in ("memory", "persistent", "http"):
+        return "memory"
+    return mode
+
+
+def get_chromadb_persist_dir() -> str:
+    """持久化模式的数据目录"""
+    persist_dir = os.getenv("TA_CHROMA_PERSIST_DIR")
+    if not persist_dir:
+        from tradingagents.default_config import DEFAULT_CONFIG
+        persist_dir = os.path.join(DEFAULT_CONFIG["data_cache_dir"], "chromadb")
+    return persist_dir
+
+
+def _acquire_persist_dir(persist_dir: str):
+    """独占持久化目录；目录已被其他进程使用时抛出 ChromaDBDirectoryInUse"""
+    global _persist_owner_lock
+    if _persist_owner_lock is not None:
+        return
+    if not _HAS_FILELOCK:
+        logger.warning("⚠️ [ChromaDB] 未安装 filelock，无法检测多进程共享持久化目录；多 Worker 部署请使用 TA_CHROMA_MODE=http")
+        return
+    lock = FileLock(os.path.join(persist_dir, ".owner.lock"))
+    try:
+        lock.acquire(timeout=0)
+    except Timeout:
+        raise ChromaDBDirectoryInUse(
+            f"持久化目录 {persist_dir} 已被其他进程使用，PersistentClient 不支持多进程共享同一目录；"
+            f"多个 Worker / API 进程共享记忆请使用 TA_CHROMA_MODE=http"
+        )
+    _persist_owner_lock = lock
+
+
+def get_configured_chromadb_client():
+    """
+    按 TA_CHROMA_MODE 创建 ChromaDB 客户端
+
+    Returns:
+        chromadb.Client: ChromaDB 客户端实例
+    """
+    mode = get_chromadb_mode()
+    settings = Settings(allow_reset=True, anonymized_telemetry=False)
+
+    if mode == "persistent":
+        persist_dir = get_chromadb_persist_dir()
+        os.makedirs(persist_dir, exist_ok=True)
+        _acquire_persist_dir(persist_dir)
+        return chromadb.PersistentClient(path=persist_dir, settings=settings)
+    if mode == "http":
+        return chromadb.HttpClient(
+            host=os.getenv("TA_CHROMA_HOST", "localhost"),
+            port=int(os.getenv("TA_CHROMA_PORT", "8000")),
+            settings=settings,
+        )
+    return get_optimal_chromadb_client()
+
+
 # 导出配置
 __all__ = [
+    'ChromaDBDirectoryInUse',
+    'get_chromadb_mode',
+    'get_chromadb_persist_dir',
+    'get_configured_chromadb_client',
     'get_optimal_chromadb_client',
     'get_win10_chromadb_client',
     'get_win11_chromadb_client',
@@ -0,0 +1,282 @@
+"""
+Embedding 缓存（所有 FinancialSituationMemory 实例共享）
+
+同一次分析中，同一段市场情况文本会被多个记忆库分别向量化；相同文本在多次分析之间也会重复出现。
+- 缓存键：xxhash(模型 + 文本)，内容寻址
+- 进程内 LRU：命中时无需访问磁盘
+- 本地持久层：SQLite，向量以 float32 二进制存储
+- 并发去重：同一文本同时被多个线程请求时只计算一次（等待方计为 waiter_hits）
+- 容量：持久层超过 TTL 的条目不再命中，并按写入次数定期清理过期条目、只保留最新的 max_disk_entries 条
+- 指标：内存/磁盘命中、等待命中、未命中与命中率
+
+配置（环境变量）：
+- TA_EMBEDDING_CACHE_ENABLED: 是否启用（默认 true）
+- TA_EMBEDDING_CACHE_DIR: SQLite 文件目录（默认 data_cache_dir/embedding_cache）
+- TA_EMBEDDING_CACHE_MAX_ENTRIES: 进程内 LRU 容量（默认 2048）
+- TA_EMBEDDING_CACHE_TTL: 持久层条目有效期秒数（默认 2592000，即 30 天）
+- TA_EMBEDDING_CACHE_MAX_DISK_ENTRIES: 持久层最大条目数（默认 100000）
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tradingagents.config.runtime_settings import get_bool, get_int
+from tradingagents.default_config import DEFAULT_CONFIG
+from tradingagents.utils.logging_init import get_logger
+
+logger = get_logger("agents.utils.memory")
+
+try:
+    import xxhash
+    _HAS_XXHASH = True
+except ImportError:  # pragma: no cover - 依赖缺失时回退
+    import hashlib
+    _HAS_XXHASH = False
+
+
+def embedding_cache_key(model: str, text: str) -> str:
+    """计算 (模型, 文本) 的内容寻址键"""
+    payload = f"{model}\x00{text}".encode("utf-8")
+    if _HAS_XXHASH:
+        return xxhash.xxh3_128_hexdigest(payload)
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def _pack(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+# 每写入多少条检查一次持久层容量
+_PRUNE_EVERY_WRITES = 500
+
+
+class EmbeddingCache:
+    """两级 embedding 缓存：进程内 LRU + SQLite"""
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_entries: int = 2048,
+        ttl: int = 2592000,
+        max_disk_entries: int = 100000,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, threading.Event] = {}
+        self._writes_since_prune = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "waiter_hits": 0, "misses": 0, "writes": 0, "pruned": 0}
+
+        self._db_path = None
+        self._local = threading.local()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._db_path = os.path.join(cache_dir, "embeddings.sqlite3")
+            conn = self._get_conn()
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    dim INTEGER,
+                    vector BLOB NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_created ON embeddings(created_at)")
+            conn.commit()
+            self.prune()
+            logger.info(f"🧮 [Embedding缓存] 本地存储: {self._db_path}")
+
+    def _get_conn(self) -> sqlite3.Connection:
+        # SQLite 连接不跨线程共享
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, key: str, vector: List[float]):
+        with self._lock:
+            self._lru[key] = vector
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _lookup(self, key: str) -> Tuple[Optional[List[float]], Optional[str]]:
+        """按键查找，返回 (向量, 命中层级 memory_hits/disk_hits)，不更新统计"""
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                return vector, "memory_hits"
+
+        if self._db_path:
+            try:
+                row = self._get_conn().execute(
+                    "SELECT vector FROM embeddings WHERE key = ? AND created_at > ?",
+                    (key, time.time() - self.ttl),
+                ).fetchone()
+            except Exception as e:
+                logger.warning(f"⚠️ [Embedding缓存] 读取失败: {e}")
+                row = None
+            if row:
+                vector = _unpack(row[0])
+                self._remember(key, vector)
+                return vector, "disk_hits"
+        return None, None
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        vector, source = self._lookup(embedding_cache_key(model, text))
+        with self._lock:
+            self.stats[source or "misses"] += 1
+        return vector
+
+    def set(self, model: str, text: str, vector: List[float]):
+        key = embedding_cache_key(model, text)
+        self._remember(key, list(vector))
+        if self._db_path:
+            try:
+                conn = self._get_conn()
+                conn.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, model, dim, vector, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, model, len(vector), _pack(vector), time.time()),
+                )
+                conn.commit()
+            except Exception as e:
+                logger.warning(f"⚠️ [Embedding缓存] 写入失败: {e}")
+        with self._lock:
+            self.stats["writes"] += 1
+            self._writes_since_prune += 1
+            should_prune = self._writes_since_prune >= _PRUNE_EVERY_WRITES
+            if should_prune:
+                self._writes_since_prune = 0
+        if should_prune:
+            self.prune()
+
+    def prune(self) -> int:
+        """清理持久层过期条目，并只保留最新的 max_disk_entries 条，返回删除数量"""
+        if not self._db_path:
+            return 0
+        try:
+            conn = self._get_conn()
+            deleted = conn.execute(
+                "DELETE FROM embeddings WHERE created_at <= ?", (time.time() - self.ttl,)
+            ).rowcount
+            deleted += conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                "SELECT key FROM embeddings ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,),
+            ).rowcount
+            conn.commit()
+        except Exception as e:
+            logger.warning(f"⚠️ [Embedding缓存] 清理失败: {e}")
+            return 0
+        if deleted:
+            with self._lock:
+                self.stats["pruned"] += deleted
+            logger.info(f"🧹 [Embedding缓存] 已清理 {deleted} 条过期或超出容量的条目")
+        return deleted
+
+    def get_or_compute(
+        self,
+        model: str,
+        text: str,
+        compute: Callable[[str], List[float]],
+        should_store: Callable[[List[float]], bool] = lambda vector: True,
+    ) -> List[float]:
+        """读取缓存，未命中时计算；同一文本的并发请求只计算一次"""
+        key = embedding_cache_key(model, text)
+        waited = False
+        while True:
+            vector, source = self._lookup(key)
+            if vector is not None:
+                with self._lock:
+                    # 等待其他线程计算完成后命中，单独计数
+                    self.stats["waiter_hits" if waited else source] += 1
+                return vector
+            with self._lock:
+                event = self._inflight.get(key)
+                if event is None:
+                    event = self._inflight[key] = threading.Event()
+                    self.stats["misses"] += 1
+                    break
+            # 其他线程正在计算（计算失败或结果不缓存时重新竞争计算）
+            event.wait()
+            waited = True
+
+        try:
+            vector = compute(text)
+            if vector and should_store(vector):
+                self.set(model, text, vector)
+            return vector
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._lru)
+        hits = stats["memory_hits"] + stats["disk_hits"] + stats["waiter_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
+
+
+_cache_instance: Optional[EmbeddingCache] = None
+_cache_checked = False
+_cache_init_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """获取全局 embedding 缓存；未启用或初始化失败时返回 None"""
+    global _cache_instance, _cache_checked
+    if _cache_checked:
+        return _cache_instance
+
+    with _cache_init_lock:
+        if _cache_checked:
+            return _cache_instance
+        try:
+            if get_bool("TA_EMBEDDING_CACHE_ENABLED", "ta_embedding_cache_enabled", True):
+                cache_dir = os.getenv("TA_EMBEDDING_CACHE_DIR") or os.path.join(
+                    DEFAULT_CONFIG["data_cache_dir"], "embedding_cache"
+                )
+                _cache_instance = EmbeddingCache(
+                    cache_dir=cache_dir,
+                    max_entries=get_int("TA_EMBEDDING_CACHE_MAX_ENTRIES", "ta_embedding_cache_max_entries", 2048),
+                    ttl=get_int("TA_EMBEDDING_CACHE_TTL", "ta_embedding_cache_ttl", 2592000),
+                    max_disk_entries=get_int(
+                        "TA_EMBEDDING_CACHE_MAX_DISK_ENTRIES", "ta_embedding_cache_max_disk_entries", 100000
+                    ),
+                )
+        except Exception as e:
+            logger.error(f"❌ [Embedding缓存] 初始化失败，缓存将被禁用: {e}")
+            _cache_instance = None
+        _cache_checked = True
+    return _cache_instance
+
+
+def get_embedding_cache_stats() -> Dict[str, float]:
+    """获取 embedding 缓存统计，未启用时返回 {"enabled": False}"""
+    cache = get_embedding_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.get_stats()}
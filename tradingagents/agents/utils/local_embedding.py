@@ -0,0 +1,101 @@
+"""
+本地离线 embedding（字符 n-gram 哈希向量化）
+
+无需网络与模型文件：对文本的字符 n-gram 做带符号的特征哈希，词频取 log 平滑后 L2 归一化。
+中文按字符切分即可覆盖词语片段，不依赖 jieba 分词；n-gram 哈希与批量聚合均使用 NumPy 向量化
+（按码点做 64 位 FNV-1a + splitmix64 混合，不逐个构造 n-gram 字符串）。
+用于离线/内网部署与测试，检索质量低于语义模型；单条数千字符的文本耗时约 1 毫秒量级。
+
+配置（环境变量）：
+- TA_EMBEDDING_BACKEND: api（默认，使用 DashScope/OpenAI 等服务）/ local
+- TA_LOCAL_EMBEDDING_DIM: 向量维度（默认 1024）
+- TA_LOCAL_EMBEDDING_NGRAM: 最大 n-gram 长度（默认 3）
+"""
+
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+from tradingagents.config.runtime_settings import get_int
+
+
+_FNV_OFFSET = np.uint64(0xCBF29CE484222325)
+_FNV_PRIME = np.uint64(0x100000001B3)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+class HashingNgramEmbedder:
+    """字符 n-gram 特征哈希向量化器"""
+
+    def __init__(self, dim: int = 1024, max_ngram: int = 3):
+        self.dim = dim
+        self.max_ngram = max_ngram
+        # 哈希方案变化时递增版本号，避免与旧向量共用 embedding 缓存
+        self.model_name = f"local-char-ngram-v2-{max_ngram}-{dim}"
+
+    def _hash_ngrams(self, text: str) -> np.ndarray:
+        text = " ".join(text.lower().split())
+        codepoints = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        hashes = []
+        for n in range(1, min(self.max_ngram, len(codepoints)) + 1):
+            count = len(codepoints) - n + 1
+            # FNV-1a：逐位置吸收 n 个码点，所有起始位置一次性计算；以 n 作为种子区分不同长度
+            h = np.full(count, _FNV_OFFSET ^ np.uint64(n), dtype=np.uint64)
+            for k in range(n):
+                h ^= codepoints[k:k + count]
+                h *= _FNV_PRIME
+            # splitmix64 收尾混合，保证低位（维度）与最高位（符号）分布均匀
+            h ^= h >> np.uint64(30)
+            h *= _MIX_1
+            h ^= h >> np.uint64(27)
+            h *= _MIX_2
+            h ^= h >> np.uint64(31)
+            hashes.append((h >> np.uint64(32)).astype(np.uint32))
+        if not hashes:
+            return np.zeros(0, dtype=np.uint32)
+        return np.concatenate(hashes)
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """批量向量化，返回 (len(texts), dim) 的 float32 矩阵"""
+        hashes = [self._hash_ngrams(text or "") for text in texts]
+        lengths = np.fromiter((len(h) for h in hashes), dtype=np.int64, count=len(hashes))
+        if not lengths.sum():
+            return np.zeros((len(texts), self.dim), dtype=np.float32)
+
+        all_hashes = np.concatenate(hashes)
+        rows = np.repeat(np.arange(len(texts)), lengths)
+        # 低位决定维度，最高位决定符号，减少哈希碰撞带来的偏差
+        cols = (all_hashes % self.dim).astype(np.int64)
+        signs = np.where(all_hashes >> 31, -1.0, 1.0)
+
+        counts = np.zeros(len(texts) * self.dim, dtype=np.float64)
+        np.add.at(counts, rows * self.dim + cols, signs)
+        matrix = counts.reshape(len(texts), self.dim)
+
+        # 次线性词频：保留符号，削弱高频字符的权重
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix.astype(np.float32)
+
+    def embed(self, text: str) -> List[float]:
+        return self.embed_batch([text])[0].tolist()
+
+
+_embedder: Optional[HashingNgramEmbedder] = None
+_embedder_lock = threading.Lock()
+
+
+def get_local_embedder() -> HashingNgramEmbedder:
+    """获取全局本地向量化器"""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                _embedder = HashingNgramEmbedder(
+                    dim=get_int("TA_LOCAL_EMBEDDING_DIM", "ta_local_embedding_dim", 1024),
+                    max_ngram=get_int("TA_LOCAL_EMBEDDING_NGRAM", "ta_local_embedding_ngram", 3),
+                )
+    return _embedder
@@ -4,21 +4,78 @@ from openai import OpenAI
 import dashscope
 from dashscope import TextEmbedding
 import os
+import atexit
 import threading
 import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from typing import Dict, Optional
 
 # 导入统一日志系统
 from tradingagents.utils.logging_init import get_logger
+from tradingagents.agents.utils.embedding_cache import get_embedding_cache, get_embedding_cache_stats
+from tradingagents.agents.utils.local_embedding import get_local_embedder
+from tradingagents.agents.utils.chromadb_config import ChromaDBDirectoryInUse
+from tradingagents.config.runtime_settings import get_int
 logger = get_logger("agents.utils.memory")
 
+# 各嵌入服务单次请求上限的默认值：(最大条数, 最大总字符数)，字符数按保守的 token 估算
+# DashScope text-embedding-v3 每次最多 10 条；OpenAI 每次最多 2048 条、总计约 30 万 token
+# 可通过 TA_EMBEDDING_{DASHSCOPE|OPENAI}_BATCH_SIZE / _BATCH_CHARS 覆盖（模型或服务商上限不同时）
+_DEFAULT_EMBEDDING_BATCH_LIMITS = {
+    "dashscope": (10, 60000),
+    "openai": (2048, 240000),
+}
+
+_LENGTH_ERROR_KEYWORDS = ['length', 'token', 'limit', 'exceed', 'too long', 'too large', 'maximum']
+
+
+def _embedding_batch_limits(provider: str):
+    """读取嵌入服务单次请求的 (最大条数, 最大总字符数)"""
+    max_items, max_chars = _DEFAULT_EMBEDDING_BATCH_LIMITS[provider]
+    return (
+        max(1, get_int(f"TA_EMBEDDING_{provider.upper()}_BATCH_SIZE", f"ta_embedding_{provider}_batch_size", max_items)),
+        max(1, get_int(f"TA_EMBEDDING_{provider.upper()}_BATCH_CHARS", f"ta_embedding_{provider}_batch_chars", max_chars)),
+    )
+
+
+class _EmbeddingUnavailable(RuntimeError):
+    """嵌入服务未配置（缺少密钥或客户端），重试无意义"""
+
+
+def _valid_vector(vector):
+    """降级路径返回的零向量视为未能向量化"""
+    return vector if vector is not None and any(vector) else None
+
+
+def _is_length_error(message: str) -> bool:
+    message = message.lower()
+    if 'rate' in message or 'throttl' in message:
+        # 限流属于临时错误，应退避重试
+        return False
+    return any(keyword in message for keyword in _LENGTH_ERROR_KEYWORDS)
+
 
 class ChromaDBManager:
-    """单例ChromaDB管理器，避免并发创建集合的冲突"""
+    """单例ChromaDB管理器，避免并发创建集合的冲突
+
+    客户端在首次获取集合时才创建；存储模式见 chromadb_config（memory / persistent / http）。
+    - 读路径无锁：集合句柄创建一次后缓存，之后直接从字典读取
+    - 集合创建与写入按集合加锁，不同集合互不阻塞；持久化目录由单个进程独占（见 chromadb_config），无需跨进程写锁
+    - 各把锁的等待时间可通过 get_lock_stats() 查看
+    - 检索命中次数先在内存中累加，达到条数或时间间隔后批量写回，检索路径不加写锁
+    """
 
     _instance = None
-    _lock = threading.Lock()
+    _lock = threading.Lock()  # 仅保护单例创建与锁表
+    _client_lock = threading.Lock()
     _collections: Dict[str, any] = {}
+    _create_locks: Dict[str, threading.Lock] = {}
+    _write_locks: Dict[str, threading.Lock] = {}
+    _hits_lock = threading.Lock()
+    _pending_hits: Dict[str, Dict[str, int]] = {}  # 集合名 -> {记忆ID: 未写回的命中次数}
+    _last_hits_flush: Dict[str, float] = {}
     _client = None
 
     def __new__(cls):
@@ -31,14 +88,77 @@ class ChromaDBManager:
 
     def __init__(self):
         if not self._initialized:
-            try:
-                # 使用统一的配置模块
-                from .chromadb_config import get_optimal_chromadb_client, is_windows_11
-                import platform
+            from .chromadb_config import get_chromadb_mode
+            self.mode = get_chromadb_mode()
+            self._stats_lock = threading.Lock()
+            self._lock_stats: Dict[str, Dict[str, float]] = {}
+            self.hit_flush_interval = get_int("TA_MEMORY_HIT_FLUSH_INTERVAL", "ta_memory_hit_flush_interval", 60)
+            self.hit_flush_size = get_int("TA_MEMORY_HIT_FLUSH_SIZE", "ta_memory_hit_flush_size", 100)
+            atexit.register(self.flush_all_hits)
+            self._initialized = True
+
+    def _get_client(self):
+        """获取客户端，首次调用时创建"""
+        if self._client is None:
+            with self._timed_lock(self._client_lock, "client"):
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    def is_client_open(self) -> bool:
+        """本进程是否已创建客户端（持久化模式下即持有数据目录）"""
+        return self._client is not None
+
+    def _get_named_lock(self, locks: Dict[str, threading.Lock], name: str) -> threading.Lock:
+        lock = locks.get(name)
+        if lock is None:
+            with self._lock:
+                lock = locks.setdefault(name, threading.Lock())
+        return lock
 
-                self._client = get_optimal_chromadb_client()
+    def _record_lock_wait(self, key: str, wait_seconds: float):
+        with self._stats_lock:
+            stats = self._lock_stats.setdefault(key, {"count": 0, "total_wait_ms": 0.0, "max_wait_ms": 0.0})
+            wait_ms = wait_seconds * 1000
+            stats["count"] += 1
+            stats["total_wait_ms"] += wait_ms
+            stats["max_wait_ms"] = max(stats["max_wait_ms"], wait_ms)
+
+    @contextmanager
+    def _timed_lock(self, lock, key: str):
+        start = time.perf_counter()
+        with lock:
+            self._record_lock_wait(key, time.perf_counter() - start)
+            yield
+
+    def get_lock_stats(self) -> Dict[str, Dict[str, float]]:
+        """各把锁的获取次数与等待时间（毫秒）"""
+        with self._stats_lock:
+            return {
+                key: {
+                    **stats,
+                    "total_wait_ms": round(stats["total_wait_ms"], 3),
+                    "max_wait_ms": round(stats["max_wait_ms"], 3),
+                    "avg_wait_ms": round(stats["total_wait_ms"] / stats["count"], 3) if stats["count"] else 0.0,
+                }
+                for key, stats in self._lock_stats.items()
+            }
+
+    def _create_client(self):
+        try:
+            # 使用统一的配置模块
+            from .chromadb_config import get_configured_chromadb_client, get_chromadb_persist_dir, is_windows_11
+            import platform
 
-                # 记录初始化信息
+            client = get_configured_chromadb_client()
+
+            # 记录初始化信息
+            if self.mode == "persistent":
+                persist_dir = get_chromadb_persist_dir()
+                logger.info(f"📚 [ChromaDB] 持久化模式初始化完成: {persist_dir}")
+            elif self.mode == "http":
+                logger.info(f"📚 [ChromaDB] 服务模式初始化完成: {os.getenv('TA_CHROMA_HOST', 'localhost')}:{os.getenv('TA_CHROMA_PORT', '8000')}")
+            else:
                 system = platform.system()
                 if system == "Windows":
                     if is_windows_11():
@@ -47,45 +167,116 @@ class ChromaDBManager:
                         logger.info(f"📚 [ChromaDB] Windows 10兼容配置初始化完成")
                 else:
                     logger.info(f"📚 [ChromaDB] {system}标准配置初始化完成")
+            return client
+        except ChromaDBDirectoryInUse as e:
+            # 目录被其他进程占用时不回退到内存存储：静默回退会让每个进程各自丢失记忆，必须由运维改用 http 模式
+            logger.error(f"❌ [ChromaDB] {e}")
+            raise
+        except Exception as e:
+            logger.error(f"❌ [ChromaDB] 初始化失败（{self.mode}模式），记忆将只保存在内存中: {e}")
+            self.mode = "memory"
+            # 使用最简单的配置作为备用
+            try:
+                settings = Settings(
+                    allow_reset=True,
+                    anonymized_telemetry=False,  # 关键：禁用遥测
+                    is_persistent=False
+                )
+                client = chromadb.Client(settings)
+                logger.info(f"📚 [ChromaDB] 使用备用配置初始化完成")
+            except Exception as backup_error:
+                # 最后的备用方案
+                client = chromadb.Client()
+                logger.warning(f"⚠️ [ChromaDB] 使用最简配置初始化: {backup_error}")
+            return client
 
-                self._initialized = True
-            except Exception as e:
-                logger.error(f"❌ [ChromaDB] 初始化失败: {e}")
-                # 使用最简单的配置作为备用
-                try:
-                    settings = Settings(
-                        allow_reset=True,
-                        anonymized_telemetry=False,  # 关键：禁用遥测
-                        is_persistent=False
-                    )
-                    self._client = chromadb.Client(settings)
-                    logger.info(f"📚 [ChromaDB] 使用备用配置初始化完成")
-                except Exception as backup_error:
-                    # 最后的备用方案
-                    self._client = chromadb.Client()
-                    logger.warning(f"⚠️ [ChromaDB] 使用最简配置初始化: {backup_error}")
-                self._initialized = True
+    @contextmanager
+    def write_lock(self, name: str):
+        """集合写入锁：同一集合的写入在进程内串行化（持久化目录由单个进程独占，无需文件锁）"""
+        with self._timed_lock(self._get_named_lock(self._write_locks, name), f"write:{name}"):
+            yield
+
+    def record_hits(self, name: str, ids):
+        """累加检索命中次数，只写内存；积累到 hit_flush_size 次或距上次写回超过 hit_flush_interval 秒时写回"""
+        now = time.time()
+        with self._hits_lock:
+            pending = self._pending_hits.setdefault(name, {})
+            for id_ in ids:
+                pending[id_] = pending.get(id_, 0) + 1
+            last_flush = self._last_hits_flush.setdefault(name, now)
+            due = sum(pending.values()) >= self.hit_flush_size or now - last_flush >= self.hit_flush_interval
+        if due:
+            self.flush_hits(name)
+
+    def flush_hits(self, name: str):
+        """把集合未写回的命中次数写入元数据；在写锁内读取最新元数据再累加，不覆盖并发写入"""
+        with self._hits_lock:
+            pending = self._pending_hits.pop(name, None)
+            self._last_hits_flush[name] = time.time()
+        if not pending:
+            return
+        try:
+            collection = self.get_or_create_collection(name)
+            with self.write_lock(name):
+                current = collection.get(ids=list(pending), include=["metadatas"])
+                ids = current.get("ids") or []
+                if not ids:
+                    return
+                now = time.time()
+                metadatas = [
+                    {**(metadata or {}), "hits": int((metadata or {}).get("hits", 0)) + pending[id_], "last_hit_at": now}
+                    for id_, metadata in zip(ids, current.get("metadatas") or [{}] * len(ids))
+                ]
+                collection.update(ids=list(ids), metadatas=metadatas)
+        except Exception as e:
+            logger.debug(f"⚠️ 写回记忆命中次数失败，下次重试: {e}")
+            with self._hits_lock:
+                merged = self._pending_hits.setdefault(name, {})
+                for id_, count in pending.items():
+                    merged[id_] = merged.get(id_, 0) + count
+
+    def flush_all_hits(self):
+        """写回全部集合未写回的命中次数（进程退出与记忆压缩前调用）"""
+        with self._hits_lock:
+            names = list(self._pending_hits)
+        for name in names:
+            self.flush_hits(name)
+
+    def list_collection_names(self):
+        """列出存储中的全部集合名称"""
+        collections = self._get_client().list_collections()
+        # 不同版本的 chromadb 返回集合对象或集合名称
+        return [c if isinstance(c, str) else c.name for c in collections]
 
     def get_or_create_collection(self, name: str):
         """线程安全地获取或创建集合"""
-        with self._lock:
+        # 无锁读路径：集合句柄创建后只读
+        collection = self._collections.get(name)
+        if collection is not None:
+            return collection
+
+        with self._timed_lock(self._get_named_lock(self._create_locks, name), f"create:{name}"):
             if name in self._collections:
                 logger.info(f"📚 [ChromaDB] 使用缓存集合: {name}")
                 return self._collections[name]
 
+            client = self._get_client()
             try:
                 # 尝试获取现有集合
-                collection = self._client.get_collection(name=name)
-                logger.info(f"📚 [ChromaDB] 获取现有集合: {name}")
+                collection = client.get_collection(name=name)
+                if self.mode == "memory":
+                    logger.info(f"📚 [ChromaDB] 获取现有集合: {name}")
+                else:
+                    logger.info(f"📚 [ChromaDB] 加载已有集合: {name}，记忆条数: {collection.count()}")
             except Exception:
                 try:
-                    # 创建新集合
-                    collection = self._client.create_collection(name=name)
+                    # 创建新集合（get_or_create 避免多进程同时创建时报错）
+                    collection = client.get_or_create_collection(name=name)
                     logger.info(f"📚 [ChromaDB] 创建新集合: {name}")
                 except Exception as e:
                     # 可能是并发创建，再次尝试获取
                     try:
-                        collection = self._client.get_collection(name=name)
+                        collection = client.get_collection(name=name)
                         logger.info(f"📚 [ChromaDB] 并发创建后获取集合: {name}")
                     except Exception as final_error:
                         logger.error(f"❌ [ChromaDB] 集合操作失败: {name}, 错误: {final_error}")
@@ -96,6 +287,12 @@ class ChromaDBManager:
             return collection
 
 
+def get_chromadb_lock_stats() -> Dict[str, Dict[str, float]]:
+    """本进程 ChromaDB 各把锁的等待统计；管理器尚未创建时返回空字典，不会因此创建客户端"""
+    manager = ChromaDBManager._instance
+    return manager.get_lock_stats() if manager is not None else {}
+
+
 class FinancialSituationMemory:
     def __init__(self, name, config):
         self.config = config
@@ -109,7 +306,17 @@ class FinancialSituationMemory:
         # 初始化降级选项标志
         self.fallback_available = False
         
-        if self.llm_provider == "dashscope" or self.llm_provider == "alibaba":
+        # 嵌入后端：api（远程服务）/ local（本地离线向量化，无需网络）
+        self.embedding_backend = (os.getenv("TA_EMBEDDING_BACKEND") or "api").strip().lower()
+
+        if self.embedding_backend == "local":
+            self.local_embedder = get_local_embedder()
+            self.embedding = self.local_embedder.model_name
+            self.client = None
+            # 本地向量与远程模型的向量空间不同，使用独立集合避免混用
+            name = f"{name}_local"
+            logger.info(f"💡 记忆功能使用本地离线嵌入: {self.embedding}")
+        elif self.llm_provider == "dashscope" or self.llm_provider == "alibaba":
             self.embedding = "text-embedding-v3"
             self.client = None  # DashScope不需要OpenAI客户端
 
@@ -306,9 +513,16 @@ class FinancialSituationMemory:
                 self.client = "DISABLED"
                 logger.warning(f"⚠️ 未找到OPENAI_API_KEY，记忆功能已禁用")
 
-        # 使用单例ChromaDB管理器
+        # 使用单例ChromaDB管理器，集合在首次读写时才加载
+        self.name = name
         self.chroma_manager = ChromaDBManager()
-        self.situation_collection = self.chroma_manager.get_or_create_collection(name)
+        self._situation_collection = None
+
+    @property
+    def situation_collection(self):
+        if self._situation_collection is None:
+            self._situation_collection = self.chroma_manager.get_or_create_collection(self.name)
+        return self._situation_collection
 
     def _smart_text_truncation(self, text, max_length=8192):
         """智能文本截断，保持语义完整性和缓存兼容性"""
@@ -396,12 +610,28 @@ class FinancialSituationMemory:
             'strategy': 'no_truncation_with_fallback'  # 标记策略
         }
 
-        if (self.llm_provider == "dashscope" or
-            self.llm_provider == "alibaba" or
-            self.llm_provider == "qianfan" or
-            (self.llm_provider == "google" and self.client is None) or
-            (self.llm_provider == "deepseek" and self.client is None) or
-            (self.llm_provider == "openrouter" and self.client is None)):
+        if self.embedding_backend == "local":
+            # 本地计算比查缓存更快，不经过缓存
+            return self.local_embedder.embed(text)
+
+        # 内容寻址缓存：相同 (模型, 文本) 只向量化一次，零向量（降级结果）不缓存
+        cache = get_embedding_cache()
+        if cache is None:
+            return self._request_embedding(text)
+        return cache.get_or_compute(self.embedding, text, self._request_embedding, should_store=any)
+
+    def _uses_dashscope(self):
+        """当前配置是否使用阿里百炼嵌入服务"""
+        return (self.llm_provider == "dashscope" or
+                self.llm_provider == "alibaba" or
+                self.llm_provider == "qianfan" or
+                (self.llm_provider == "google" and self.client is None) or
+                (self.llm_provider == "deepseek" and self.client is None) or
+                (self.llm_provider == "openrouter" and self.client is None))
+
+    def _request_embedding(self, text):
+        """调用配置的提供商获取向量（不经过缓存）"""
+        if self._uses_dashscope():
             # 使用阿里百炼的嵌入模型
             try:
                 # 导入DashScope模块
@@ -542,6 +772,119 @@ class FinancialSituationMemory:
                 logger.warning(f"⚠️ 记忆功能降级，返回空向量")
                 return [0.0] * 1024
 
+    def get_embeddings(self, texts):
+        """批量获取向量：缓存命中的直接返回，其余按提供商上限分批、并发请求
+
+        返回值与 texts 一一对应；未能向量化的文本（记忆禁用、超长、请求失败）为 None，
+        调用方应跳过这些文本，不能把零向量写入记忆库
+        """
+        if self.embedding_backend == "local":
+            return [vector.tolist() for vector in self.local_embedder.embed_batch([text or "" for text in texts])]
+
+        results = [None] * len(texts)
+        cache = get_embedding_cache()
+        pending = {}  # 文本 -> 在 texts 中的位置，相同文本只请求一次
+
+        for i, text in enumerate(texts):
+            if (self.client == "DISABLED" or not text or not isinstance(text, str) or
+                    (self.enable_embedding_length_check and len(text) > self.max_embedding_length)):
+                # 禁用/无效/超长文本沿用单条路径的降级处理
+                results[i] = self.get_embedding(text)
+                continue
+            cached = cache.get(self.embedding, text) if cache is not None else None
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.setdefault(text, []).append(i)
+
+        if not pending:
+            return results
+
+        start_time = time.time()
+        batches = self._split_embedding_batches(list(pending))
+        concurrency = max(1, min(len(batches), get_int(
+            "TA_EMBEDDING_BATCH_CONCURRENCY", "ta_embedding_batch_concurrency", 4)))
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for batch, vectors in zip(batches, executor.map(self._embed_batch_with_retry, batches)):
+                for text, vector in zip(batch, vectors):
+                    if cache is not None and vector is not None:
+                        cache.set(self.embedding, text, vector)
+                    for i in pending[text]:
+                        results[i] = vector
+
+        logger.info(
+            f"🧮 [批量Embedding] {len(texts)}条文本, 请求{len(pending)}条, "
+            f"{len(batches)}批, 并发{concurrency}, 耗时 {time.time() - start_time:.2f}秒"
+        )
+        return [_valid_vector(vector) for vector in results]
+
+    def _split_embedding_batches(self, texts):
+        """按提供商单次请求的条数与总长度上限切分批次"""
+        provider = "dashscope" if self._uses_dashscope() else "openai"
+        max_items, max_chars = _embedding_batch_limits(provider)
+
+        batches, current, current_chars = [], [], 0
+        for text in texts:
+            if current and (len(current) >= max_items or current_chars + len(text) > max_chars):
+                batches.append(current)
+                current, current_chars = [], 0
+            current.append(text)
+            current_chars += len(text)
+        if current:
+            batches.append(current)
+        return batches
+
+    def _embed_batch_with_retry(self, batch):
+        """请求一个批次；临时错误退避重试，长度类错误拆分批次以隔离超限文本"""
+        max_retries = get_int("TA_EMBEDDING_BATCH_MAX_RETRIES", "ta_embedding_batch_max_retries", 2)
+        last_error = None
+        for attempt in range(max_retries + 1):
+            try:
+                return self._request_embedding_batch(batch)
+            except Exception as e:
+                last_error = e
+                if isinstance(e, _EmbeddingUnavailable) or _is_length_error(str(e)):
+                    break
+                if attempt < max_retries:
+                    time.sleep(0.5 * (2 ** attempt))
+
+        if _is_length_error(str(last_error)):
+            if len(batch) > 1:
+                mid = len(batch) // 2
+                logger.warning(f"⚠️ [批量Embedding] 批次({len(batch)}条)超出长度限制，拆分重试")
+                return self._embed_batch_with_retry(batch[:mid]) + self._embed_batch_with_retry(batch[mid:])
+            # 单条超限：走单条路径（含 OpenAI 降级），降级结果为零向量时视为失败
+            return [_valid_vector(self._request_embedding(batch[0]))]
+
+        logger.error(f"❌ [批量Embedding] 批次({len(batch)}条)请求失败，这些文本将不写入记忆: {last_error}")
+        return [None] * len(batch)
+
+    def _request_embedding_batch(self, batch):
+        """单次请求一个批次的向量，失败时抛出异常"""
+        vectors = [None] * len(batch)
+        if self._uses_dashscope():
+            import dashscope
+            from dashscope import TextEmbedding
+
+            if not getattr(dashscope, 'api_key', None):
+                raise _EmbeddingUnavailable("DashScope API密钥未设置")
+            response = TextEmbedding.call(model=self.embedding, input=batch)
+            if response.status_code != 200:
+                raise RuntimeError(f"{response.code} - {response.message}")
+            for item in response.output['embeddings']:
+                vectors[item['text_index']] = item['embedding']
+        else:
+            if self.client is None:
+                raise _EmbeddingUnavailable("嵌入客户端未初始化")
+            response = self.client.embeddings.create(model=self.embedding, input=batch)
+            for item in response.data:
+                vectors[item.index] = item.embedding
+
+        if any(vector is None for vector in vectors):
+            raise RuntimeError("响应缺少部分文本的向量")
+        return vectors
+
     def get_embedding_config_status(self):
         """获取向量缓存配置状态"""
         return {
@@ -556,35 +899,69 @@ class FinancialSituationMemory:
         """获取最后处理的文本信息"""
         return getattr(self, '_last_text_info', None)
 
-    def add_situations(self, situations_and_advice):
-        """Add financial situations and their corresponding advice. Parameter is a list of tuples (situation, rec)"""
+    def add_situations(self, situations_and_advice, embeddings=None):
+        """Add financial situations and their corresponding advice. Parameter is a list of tuples (situation, rec)
+
+        embeddings: 可选，预先计算好的 embedding（与 situations_and_advice 一一对应），避免重复计算
+        """
 
         situations = []
         advice = []
         ids = []
-        embeddings = []
 
-        offset = self.situation_collection.count()
-
-        for i, (situation, recommendation) in enumerate(situations_and_advice):
+        for situation, recommendation in situations_and_advice:
             situations.append(situation)
             advice.append(recommendation)
-            ids.append(str(offset + i))
-            embeddings.append(self.get_embedding(situation))
-
-        self.situation_collection.add(
-            documents=situations,
-            metadatas=[{"recommendation": rec} for rec in advice],
-            embeddings=embeddings,
-            ids=ids,
-        )
+            # 按内容生成ID：多进程共享同一存储时不会冲突，重复写入相同经验也只保留一条
+            ids.append(hashlib.blake2b(
+                f"{situation}\x00{recommendation}".encode("utf-8"), digest_size=16
+            ).hexdigest())
+
+        if embeddings is None:
+            embeddings = self.get_embeddings(situations)
+
+        # 未能向量化的条目（None 或降级返回的零向量）不写入，否则会污染相似度检索
+        keep = [i for i, vector in enumerate(embeddings) if _valid_vector(vector) is not None]
+        if len(keep) < len(ids):
+            logger.warning(f"⚠️ [记忆] {self.name}: {len(ids) - len(keep)}/{len(ids)} 条记忆未能向量化，跳过写入")
+            if not keep:
+                return
+            situations = [situations[i] for i in keep]
+            advice = [advice[i] for i in keep]
+            ids = [ids[i] for i in keep]
+            embeddings = [embeddings[i] for i in keep]
+
+        collection = self.situation_collection
+        with self.chroma_manager.write_lock(self.name):
+            # 记录写入时间与命中次数，供记忆压缩按时间/检索频率淘汰；重复写入保留原有统计
+            existing = collection.get(ids=ids, include=["metadatas"])
+            previous = dict(zip(existing.get("ids") or [], existing.get("metadatas") or []))
+            now = time.time()
+            metadatas = []
+            for id_, rec in zip(ids, advice):
+                metadata = dict(previous.get(id_) or {})
+                metadata.setdefault("created_at", now)
+                metadata.setdefault("hits", 0)
+                metadata["recommendation"] = rec
+                metadatas.append(metadata)
+
+            collection.upsert(
+                documents=situations,
+                metadatas=metadatas,
+                embeddings=list(embeddings),
+                ids=ids,
+            )
 
     def get_memories(self, current_situation, n_matches=1):
         """Find matching recommendations using embeddings with smart truncation handling"""
         
         # 获取当前情况的embedding
         query_embedding = self.get_embedding(current_situation)
-        
+        return self.query_memories(query_embedding, n_matches)
+
+    def query_memories(self, query_embedding, n_matches=1):
+        """用已计算好的 embedding 检索相似记忆（多个记忆库共用同一 embedding 时避免重复计算）"""
+
         # 检查是否为空向量（记忆功能被禁用或出错）
         if all(x == 0.0 for x in query_embedding):
             logger.debug(f"⚠️ 查询embedding为空向量，返回空结果")
@@ -624,6 +1001,11 @@ class FinancialSituationMemory:
                         'distance': distance
                     }
                     memories.append(memory_item)
+
+                # 命中次数供记忆压缩按检索频率淘汰；批量写回，失败不影响检索
+                hit_ids = results.get('ids', [[]])[0]
+                if hit_ids:
+                    self.chroma_manager.record_hits(self.name, hit_ids)
                 
                 # 记录查询信息
                 if hasattr(self, '_last_text_info') and self._last_text_info.get('was_truncated'):
@@ -645,7 +1027,9 @@ class FinancialSituationMemory:
             'collection_count': self.situation_collection.count(),
             'client_status': 'enabled' if self.client != "DISABLED" else 'disabled',
             'embedding_model': self.embedding,
-            'provider': self.llm_provider
+            'provider': self.llm_provider,
+            'embedding_cache': get_embedding_cache_stats(),
+            'lock_wait': self.chroma_manager.get_lock_stats().get(f"write:{self.name}")
         }
         
         # 添加最后一次文本处理信息
@@ -0,0 +1,162 @@
+"""
+记忆库压缩与淘汰
+
+反思不断写入新的经验，记忆集合只增不减：检索延迟与内存占用随之增长，相似的经验也会挤占检索结果。
+定期对每个集合执行：
+1. 删除零向量（embedding 降级时写入，无法参与相似度检索）
+2. 合并近似重复：余弦相似度不低于阈值的经验只保留价值最高的一条，命中次数累加到保留项
+3. 过期淘汰：超过最大保留天数且从未被检索到的经验
+4. 容量上限：超出每个集合的最大条数时，按保留价值从低到高淘汰
+
+保留价值 = (命中次数 + 1) × 0.5 ^ (存在天数 / 半衰期)，命中次数与写入时间记录在元数据 hits / created_at 中。
+
+只压缩跨重启保留的存储：memory 模式的记忆随进程重启清空，不压缩；persistent 模式的目录由单个进程独占，
+只在已打开该目录的进程中压缩；http 模式连接共享的 Chroma 服务，任意进程均可压缩。
+"""
+
+import time
+from contextlib import nullcontext
+from typing import Any, Dict
+
+import numpy as np
+
+from tradingagents.utils.logging_init import get_logger
+
+logger = get_logger("agents.utils.memory")
+
+_DELETE_CHUNK_SIZE = 500
+
+
+def compact_collection(
+    collection,
+    max_items: int = 2000,
+    dedup_similarity: float = 0.95,
+    max_age_days: float = 180,
+    half_life_days: float = 90,
+    write_lock=None,
+) -> Dict[str, int]:
+    """压缩单个记忆集合，返回各类删除数量
+
+    读取、计算与写回都在写锁内完成，期间写回的命中次数与新增记忆不会被覆盖或漏掉
+    """
+    with write_lock if write_lock is not None else nullcontext():
+        return _compact(collection, max_items, dedup_similarity, max_age_days, half_life_days)
+
+
+def _compact(collection, max_items, dedup_similarity, max_age_days, half_life_days) -> Dict[str, int]:
+    data = collection.get(include=["embeddings", "metadatas"])
+    ids = list(data.get("ids") or [])
+    stats = {"before": len(ids), "invalid": 0, "merged": 0, "expired": 0, "evicted": 0, "after": len(ids)}
+    if not ids:
+        return stats
+
+    embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+    metadatas = [dict(metadata or {}) for metadata in (data.get("metadatas") or [{}] * len(ids))]
+
+    now = time.time()
+    hits = np.array([int(metadata.get("hits", 0)) for metadata in metadatas], dtype=np.int64)
+    created_at = np.array([float(metadata.get("created_at", now)) for metadata in metadatas])
+    age_days = np.maximum(now - created_at, 0) / 86400
+
+    def retention(indices):
+        return (hits[indices] + 1) * np.power(0.5, age_days[indices] / half_life_days)
+
+    norms = np.linalg.norm(embeddings, axis=1)
+    unit = embeddings / np.where(norms > 0, norms, 1)[:, None]
+
+    to_delete = []
+    merged_survivors = set()
+    kept = []
+    kept_matrix = np.empty_like(unit)
+
+    # 价值高的先保留，后续的近似重复合并到已保留项
+    for idx in np.argsort(-retention(np.arange(len(ids))), kind="stable"):
+        if norms[idx] == 0:
+            to_delete.append(idx)
+            stats["invalid"] += 1
+            continue
+        if kept:
+            similarities = kept_matrix[:len(kept)] @ unit[idx]
+            best = int(np.argmax(similarities))
+            if similarities[best] >= dedup_similarity:
+                survivor = kept[best]
+                hits[survivor] += hits[idx]
+                merged_survivors.add(survivor)
+                to_delete.append(idx)
+                stats["merged"] += 1
+                continue
+        kept_matrix[len(kept)] = unit[idx]
+        kept.append(idx)
+
+    if max_age_days > 0:
+        expired = {idx for idx in kept if age_days[idx] > max_age_days and hits[idx] == 0}
+        stats["expired"] = len(expired)
+        to_delete.extend(expired)
+        kept = [idx for idx in kept if idx not in expired]
+
+    if max_items > 0 and len(kept) > max_items:
+        kept = np.asarray(kept)
+        order = np.argsort(-retention(kept), kind="stable")
+        evicted = kept[order[max_items:]]
+        stats["evicted"] = len(evicted)
+        to_delete.extend(evicted.tolist())
+        kept = kept[order[:max_items]].tolist()
+
+    merged_survivors &= set(kept)
+    if merged_survivors:
+        survivors = sorted(merged_survivors)
+        collection.update(
+            ids=[ids[idx] for idx in survivors],
+            metadatas=[{**metadatas[idx], "hits": int(hits[idx])} for idx in survivors],
+        )
+    delete_ids = [ids[idx] for idx in to_delete]
+    for start in range(0, len(delete_ids), _DELETE_CHUNK_SIZE):
+        collection.delete(ids=delete_ids[start:start + _DELETE_CHUNK_SIZE])
+
+    stats["after"] = len(kept)
+    return stats
+
+
+def compact_memory_collections(
+    max_items: int = 2000,
+    dedup_similarity: float = 0.95,
+    max_age_days: float = 180,
+    half_life_days: float = 90,
+) -> Dict[str, Any]:
+    """压缩存储中的全部记忆集合"""
+    from tradingagents.agents.utils.memory import ChromaDBManager
+
+    manager = ChromaDBManager()
+    if manager.mode == "memory":
+        logger.info("🧹 [记忆压缩] 内存模式的记忆随进程重启清空，跳过压缩")
+        return {}
+    if manager.mode == "persistent" and not manager.is_client_open():
+        # 不为压缩打开持久化目录：目录由单个进程独占，抢占会使真正使用它的进程无法启动
+        logger.info("🧹 [记忆压缩] 本进程未打开持久化目录，由使用该目录的进程压缩")
+        return {}
+
+    results = {}
+    for name in manager.list_collection_names():
+        start_time = time.time()
+        try:
+            # 先写回内存中累积的命中次数，压缩按最新的检索频率淘汰
+            manager.flush_hits(name)
+            stats = compact_collection(
+                manager.get_or_create_collection(name),
+                max_items=max_items,
+                dedup_similarity=dedup_similarity,
+                max_age_days=max_age_days,
+                half_life_days=half_life_days,
+                write_lock=manager.write_lock(name),
+            )
+        except Exception as e:
+            logger.error(f"❌ [记忆压缩] 集合 {name} 压缩失败: {e}")
+            results[name] = {"error": str(e)}
+            continue
+        results[name] = stats
+        logger.info(
+            f"🧹 [记忆压缩] {name}: {stats['before']} -> {stats['after']} 条 "
+            f"(零向量 {stats['invalid']}, 合并 {stats['merged']}, 过期 {stats['expired']}, "
+            f"超限 {stats['evicted']}), 耗时 {time.time() - start_time:.2f}秒"
+        )
+    return results
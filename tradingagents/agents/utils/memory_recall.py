@@ -0,0 +1,73 @@
+"""
+历史记忆统一检索
+
+多空研究员、交易员、研究经理、风险经理都以同一段"当前情况"（四份分析师报告）检索各自的记忆库。
+分析师全部完成后由 Memory Recall 节点只做一次 embedding，并发查询本次图中用到的所有记忆库，
+结果按角色写入 state["past_memories"]；各节点优先读取 state，缺失时（如旧检查点恢复）回退为单独检索。
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from tradingagents.utils.logging_init import get_logger
+
+logger = get_logger("default")
+
+
+def build_current_situation(state) -> str:
+    """各节点检索记忆时使用的当前情况文本"""
+    return (
+        f"{state.get('market_report', '')}\n\n{state.get('sentiment_report', '')}\n\n"
+        f"{state.get('news_report', '')}\n\n{state.get('fundamentals_report', '')}"
+    )
+
+
+def recall_memories(memories: Dict[str, Any], situation: str, n_matches: int = 2) -> Dict[str, List[dict]]:
+    """对同一情况只计算一次 embedding，并发检索多个记忆库
+
+    memories: 角色 -> FinancialSituationMemory（为 None 的角色返回空列表）
+    """
+    available = {role: memory for role, memory in memories.items() if memory is not None}
+    recalled = {role: [] for role in memories}
+    if not available:
+        return recalled
+
+    # 所有记忆库使用同一配置，embedding 通用
+    query_embedding = next(iter(available.values())).get_embedding(situation)
+    if not any(query_embedding):
+        logger.debug(f"⚠️ [记忆检索] 查询embedding为空向量，返回空结果")
+        return recalled
+
+    with ThreadPoolExecutor(max_workers=len(available)) as executor:
+        futures = {
+            role: executor.submit(memory.query_memories, query_embedding, n_matches)
+            for role, memory in available.items()
+        }
+        for role, future in futures.items():
+            recalled[role] = future.result()
+    return recalled
+
+
+def create_memory_recall(memories: Dict[str, Any], n_matches: int = 2):
+    def memory_recall_node(state) -> dict:
+        start_time = time.time()
+        recalled = recall_memories(memories, build_current_situation(state), n_matches)
+        logger.info(
+            f"🧠 [记忆检索] 检索 {len(recalled)} 个记忆库，"
+            f"命中 {sum(len(items) for items in recalled.values())} 条，耗时 {time.time() - start_time:.2f}秒"
+        )
+        return {"past_memories": recalled}
+
+    return memory_recall_node
+
+
+def get_past_memories(state, role: str, memory, situation: str, n_matches: int = 2) -> List[dict]:
+    """读取 Memory Recall 节点的检索结果，缺失时单独检索"""
+    recalled = (state.get("past_memories") or {}).get(role)
+    if recalled is not None:
+        return recalled
+    if memory is None:
+        logger.warning(f"⚠️ [DEBUG] memory为None，跳过历史记忆检索")
+        return []
+    return memory.get_memories(situation, n_matches=n_matches)
@@ -0,0 +1,182 @@
+"""
+节点 Token 预算与预检
+
+- 使用 tiktoken 在调用 LLM 前统计 prompt token 数（未安装时按字符数估算）
+- 每个节点有独立的输入 token 预算，超出时按顺序确定性地裁剪最旧的内容：
+  辩论历史（*_history）丢弃最早的发言，其他段落（报告、历史记忆、分析师的原始数据）保留开头截断结尾
+- 分析师节点只裁剪数据段落，提示词中的分析要求与输出格式保持完整
+
+配置（环境变量）：
+- TA_TOKEN_BUDGET_ENABLED: 是否启用预算裁剪（默认 true）
+- TA_NODE_TOKEN_BUDGETS: 节点预算覆盖，JSON 格式，例如 {"Research Manager": 20000}
+"""
+
+import json
+import os
+import re
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from tradingagents.config.runtime_settings import get_bool
+from tradingagents.llm_adapters.run_metrics import llm_run_metrics
+from tradingagents.utils.logging_init import get_logger
+
+logger = get_logger("default")
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # pragma: no cover - 未安装或编码文件不可用时回退到字符估算
+    _ENCODING = None
+
+# 中文约 1.5-2 字符/token，与各节点原有的估算方式保持一致
+_CHARS_PER_TOKEN = 1.8
+
+# 分析师节点的输入是单只股票的原始数据，预算与原先按字符截断的规模相当
+DEFAULT_NODE_BUDGETS: Dict[str, int] = {
+    "Market Analyst": 6000,
+    "Fundamentals Analyst": 6000,
+    "News Analyst": 6000,
+    "Social Analyst": 6000,
+    "Bull Researcher": 16000,
+    "Bear Researcher": 16000,
+    "Research Manager": 24000,
+    "Trader": 16000,
+    "Risky Analyst": 16000,
+    "Safe Analyst": 16000,
+    "Neutral Analyst": 16000,
+    "Risk Judge": 24000,
+}
+DEFAULT_BUDGET = 32000
+
+_TRUNCATED_MARK = "\n...[内容过长，已截断]"
+_HISTORY_OMITTED_MARK = "[较早的辩论内容已省略]"
+# 辩论历史中每轮发言以 "Xxx Analyst:" 开头
+_TURN_SPLIT_RE = re.compile(r"\n(?=(?:Bull|Bear|Risky|Safe|Neutral) Analyst:)")
+
+
+def count_tokens(text: str) -> int:
+    """统计文本 token 数"""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return int(len(text) / _CHARS_PER_TOKEN)
+
+
+def count_prompt_tokens(prompt: Any) -> int:
+    """统计 prompt token 数，支持字符串、消息列表（dict 或 BaseMessage）"""
+    if isinstance(prompt, str):
+        return count_tokens(prompt)
+    total = 0
+    for message in prompt or []:
+        content = message.get("content") if isinstance(message, dict) else getattr(message, "content", "")
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False, default=str)
+        # 每条消息额外约 4 个 token 的格式开销
+        total += count_tokens(content) + 4
+    return total
+
+
+def _load_budget_overrides() -> Dict[str, int]:
+    raw = os.getenv("TA_NODE_TOKEN_BUDGETS")
+    if not raw:
+        return {}
+    try:
+        return {str(k): int(v) for k, v in json.loads(raw).items()}
+    except Exception as e:
+        logger.warning(f"⚠️ [Token预算] TA_NODE_TOKEN_BUDGETS 解析失败，忽略: {e}")
+        return {}
+
+
+_BUDGETS = {**DEFAULT_NODE_BUDGETS, **_load_budget_overrides()}
+
+
+def get_node_budget(node_name: Optional[str]) -> int:
+    """获取节点输入 token 预算"""
+    return _BUDGETS.get(node_name or "", DEFAULT_BUDGET)
+
+
+def _truncate_text(text: str, max_tokens: int) -> str:
+    """保留开头 max_tokens 个 token，截断结尾"""
+    if max_tokens <= 0:
+        return ""
+    if _ENCODING is not None:
+        tokens = _ENCODING.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return _ENCODING.decode(tokens[:max_tokens]) + _TRUNCATED_MARK
+    max_chars = int(max_tokens * _CHARS_PER_TOKEN)
+    return text if len(text) <= max_chars else text[:max_chars] + _TRUNCATED_MARK
+
+
+def _trim_history(history: str, max_tokens: int) -> str:
+    """丢弃最早的发言，保留最近的辩论内容"""
+    turns = [t for t in _TURN_SPLIT_RE.split(history) if t.strip()]
+    kept = []
+    used = count_tokens(_HISTORY_OMITTED_MARK)
+    for turn in reversed(turns):
+        turn_tokens = count_tokens(turn)
+        if used + turn_tokens > max_tokens:
+            break
+        kept.append(turn)
+        used += turn_tokens
+    if not kept and turns:
+        # 最近一轮发言本身超出预算时，保留其结尾部分
+        latest = turns[-1]
+        if _ENCODING is not None:
+            tokens = _ENCODING.encode(latest, disallowed_special=())
+            kept = [_ENCODING.decode(tokens[-max(0, max_tokens - used):])] if max_tokens > used else []
+        else:
+            max_chars = int(max(0, max_tokens - used) * _CHARS_PER_TOKEN)
+            kept = [latest[-max_chars:]] if max_chars else []
+    if kept == list(reversed(turns)):
+        return history
+    return "\n".join([_HISTORY_OMITTED_MARK] + list(reversed(kept)))
+
+
+def fit_prompt_to_budget(
+    node_name: str,
+    build_prompt: Callable[..., Any],
+    sections: Dict[str, str],
+    trim_order: Sequence[str],
+) -> Tuple[Any, int]:
+    """预检 prompt token 数，超出节点预算时按 trim_order 依次裁剪段落
+
+    Args:
+        node_name: 节点名称（用于查找预算与日志）
+        build_prompt: 以 sections 为关键字参数构建 prompt（字符串或消息列表）
+        sections: 可裁剪的段落
+        trim_order: 裁剪顺序，排在前面的最先裁剪
+
+    Returns:
+        (prompt, token 数)；token 数同时计入当前节点的运行指标（estimated_prompt_tokens）
+    """
+    prompt = build_prompt(**sections)
+    tokens = count_prompt_tokens(prompt)
+    budget = get_node_budget(node_name)
+    if tokens <= budget or not get_bool("TA_TOKEN_BUDGET_ENABLED", "ta_token_budget_enabled", True):
+        llm_run_metrics.record_prompt_estimate(tokens)
+        return prompt, tokens
+
+    original_tokens = tokens
+    sections = dict(sections)
+    for name in trim_order:
+        excess = tokens - budget
+        if excess <= 0:
+            break
+        text = sections.get(name) or ""
+        if not text:
+            continue
+        keep = max(0, count_tokens(text) - excess)
+        if name.endswith("history"):
+            sections[name] = _trim_history(text, keep)
+        else:
+            sections[name] = _truncate_text(text, keep)
+        prompt = build_prompt(**sections)
+        tokens = count_prompt_tokens(prompt)
+
+    logger.warning(
+        f"✂️ [Token预算] {node_name} prompt 超出预算 {budget}: {original_tokens} → {tokens} tokens"
+    )
+    llm_run_metrics.record_prompt_estimate(tokens, trimmed=True)
+    return prompt, tokens
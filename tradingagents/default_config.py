@@ -17,6 +17,10 @@ DEFAULT_CONFIG = {
     "max_debate_rounds": 1,
     "max_risk_discuss_rounds": 1,
     "max_recur_limit": 100,
+    # 分析配置档：standard 为完整流程；fast 跳过研究经理，分析师直接交给风险经理
+    "analysis_profile": "standard",
+    # 每个分析师的最大工具调用次数
+    "max_tool_calls": 3,
     # Tool settings - 从环境变量读取，提供默认值
     "online_tools": os.getenv("ONLINE_TOOLS_ENABLED", "false").lower() == "true",
     "online_news": os.getenv("ONLINE_NEWS_ENABLED", "true").lower() == "true", 
@@ -0,0 +1,117 @@
+"""
+图执行检查点（LangGraph Checkpointer）
+
+以任务ID作为 thread_id 保存每个节点完成后的状态，失败重试或 Worker 重启后
+从最后完成的节点继续执行，而不是从第一个分析师重新开始。
+
+配置（环境变量）：
+- TA_CHECKPOINT_ENABLED: 是否启用（默认 false）
+- TA_CHECKPOINT_BACKEND: sqlite / redis / memory（默认 sqlite）
+- TA_CHECKPOINT_PATH: SQLite 文件路径（默认 data_cache_dir/checkpoints/graph_checkpoints.sqlite3）
+- TA_CHECKPOINT_REDIS_URL: Redis 连接串（backend=redis 时使用，默认读取 REDIS_URL）
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Any, Optional
+
+from tradingagents.config.runtime_settings import get_bool
+from tradingagents.default_config import DEFAULT_CONFIG
+from tradingagents.utils.logging_init import get_logger
+
+logger = get_logger("default")
+
+_checkpointer: Any = None
+_checkpointer_checked = False
+_checkpointer_lock = threading.Lock()
+
+# 各后端对应的 pip 包，用于依赖缺失时提示
+_BACKEND_PACKAGES = {
+    "sqlite": "langgraph-checkpoint-sqlite",
+    "redis": "langgraph-checkpoint-redis",
+    "memory": "langgraph-checkpoint",
+}
+
+
+def _create_sqlite_checkpointer():
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    path = os.getenv("TA_CHECKPOINT_PATH") or os.path.join(
+        DEFAULT_CONFIG["data_cache_dir"], "checkpoints", "graph_checkpoints.sqlite3"
+    )
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    saver = SqliteSaver(conn)
+    saver.setup()
+    logger.info(f"💾 [Checkpoint] 使用 SQLite 检查点存储: {path}")
+    return saver
+
+
+def _create_redis_checkpointer():
+    from langgraph.checkpoint.redis import RedisSaver
+
+    redis_url = os.getenv("TA_CHECKPOINT_REDIS_URL") or os.getenv("REDIS_URL") or "redis://localhost:6379/0"
+    saver = RedisSaver(redis_url=redis_url)
+    saver.setup()
+    logger.info(f"💾 [Checkpoint] 使用 Redis 检查点存储")
+    return saver
+
+
+def _create_memory_checkpointer():
+    from langgraph.checkpoint.memory import MemorySaver
+
+    logger.info(f"💾 [Checkpoint] 使用内存检查点存储（仅当前进程内可恢复）")
+    return MemorySaver()
+
+
+def get_graph_checkpointer() -> Optional[Any]:
+    """获取进程级共享的检查点存储；未启用或依赖缺失时返回 None"""
+    global _checkpointer, _checkpointer_checked
+    if _checkpointer_checked:
+        return _checkpointer
+
+    with _checkpointer_lock:
+        if _checkpointer_checked:
+            return _checkpointer
+        if get_bool("TA_CHECKPOINT_ENABLED", "ta_checkpoint_enabled", False):
+            backend = (os.getenv("TA_CHECKPOINT_BACKEND") or "sqlite").strip().lower()
+            factories = {
+                "sqlite": _create_sqlite_checkpointer,
+                "redis": _create_redis_checkpointer,
+                "memory": _create_memory_checkpointer,
+            }
+            factory = factories.get(backend)
+            try:
+                if factory is None:
+                    logger.error(
+                        f"❌ [Checkpoint] 未知的检查点后端 TA_CHECKPOINT_BACKEND={backend}，"
+                        f"可选值: {'/'.join(factories)}，检查点已禁用"
+                    )
+                    _checkpointer = None
+                else:
+                    _checkpointer = factory()
+            except ImportError as e:
+                # 不回退到 MemorySaver：内存检查点无法跨进程/重启恢复，静默回退会让运维误以为断点续跑可用
+                logger.error(
+                    f"❌ [Checkpoint] {backend} 检查点依赖未安装，检查点已禁用"
+                    f"（请安装 {_BACKEND_PACKAGES.get(backend, 'langgraph')}）: {e}"
+                )
+                _checkpointer = None
+            except Exception as e:
+                logger.error(f"❌ [Checkpoint] 初始化失败，检查点已禁用: {e}")
+                _checkpointer = None
+        _checkpointer_checked = True
+    return _checkpointer
+
+
+def delete_checkpoint(checkpointer: Any, thread_id: str):
+    """删除任务的检查点（任务成功完成后调用）"""
+    if checkpointer is None or not thread_id:
+        return
+    try:
+        checkpointer.delete_thread(thread_id)
+        logger.debug(f"🧹 [Checkpoint] 已删除检查点: {thread_id}")
+    except Exception as e:
+        logger.warning(f"⚠️ [Checkpoint] 删除检查点失败: {thread_id} - {e}")
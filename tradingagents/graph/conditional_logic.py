@@ -10,10 +10,15 @@ logger = get_logger("default")
 class ConditionalLogic:
     """Handles conditional logic for determining graph flow."""
 
-    def __init__(self, max_debate_rounds=1, max_risk_discuss_rounds=1):
+    # 基本面使用统一工具，一次调用即返回全部数据，因此上限固定为 1；
+    # 全局 max_tool_calls（快速配置档为 1）只能进一步降低它，不会放大到其他分析师的 3 次
+    FUNDAMENTALS_MAX_TOOL_CALLS = 1
+
+    def __init__(self, max_debate_rounds=1, max_risk_discuss_rounds=1, max_tool_calls=3):
         """Initialize with configuration parameters."""
         self.max_debate_rounds = max_debate_rounds
         self.max_risk_discuss_rounds = max_risk_discuss_rounds
+        self.max_tool_calls = max_tool_calls
 
     def should_continue_market(self, state: AgentState):
         """Determine if market analysis should continue."""
@@ -25,7 +30,7 @@ class ConditionalLogic:
 
         # 死循环修复: 添加工具调用次数检查
         tool_call_count = state.get("market_tool_call_count", 0)
-        max_tool_calls = 3
+        max_tool_calls = self.max_tool_calls
 
         # 检查是否已经有市场分析报告
         market_report = state.get("market_report", "")
@@ -70,7 +75,7 @@ class ConditionalLogic:
 
         # 死循环修复: 添加工具调用次数检查
         tool_call_count = state.get("sentiment_tool_call_count", 0)
-        max_tool_calls = 3
+        max_tool_calls = self.max_tool_calls
 
         # 检查是否已经有情绪分析报告
         sentiment_report = state.get("sentiment_report", "")
@@ -108,7 +113,7 @@ class ConditionalLogic:
 
         # 死循环修复: 添加工具调用次数检查
         tool_call_count = state.get("news_tool_call_count", 0)
-        max_tool_calls = 3
+        max_tool_calls = self.max_tool_calls
 
         # 检查是否已经有新闻分析报告
         news_report = state.get("news_report", "")
@@ -146,7 +151,7 @@ class ConditionalLogic:
 
         # 死循环修复: 添加工具调用次数检查
         tool_call_count = state.get("fundamentals_tool_call_count", 0)
-        max_tool_calls = 1  # 一次工具调用就能获取所有数据
+        max_tool_calls = min(self.FUNDAMENTALS_MAX_TOOL_CALLS, self.max_tool_calls)
 
         # 检查是否已经有基本面报告
         fundamentals_report = state.get("fundamentals_report", "")
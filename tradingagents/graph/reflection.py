@@ -1,6 +1,9 @@
 # TradingAgents/graph/reflection.py
 
-from typing import Dict, Any
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
 from langchain_openai import ChatOpenAI
 
 # 导入统一日志系统
@@ -71,9 +74,78 @@ Adhere strictly to these instructions, and ensure your output is detailed, accur
             ),
         ]
 
-        result = self.quick_thinking_llm.invoke(messages).content
+        result = self.quick_thinking_llm.get_llm().invoke(messages).content
         return result
 
+    @staticmethod
+    def _get_component_report(component_type: str, current_state: Dict[str, Any]) -> str:
+        """取出各角色需要复盘的分析/决策内容"""
+        investment_debate_state = current_state.get("investment_debate_state") or {}
+        risk_debate_state = current_state.get("risk_debate_state") or {}
+        return {
+            "BULL": investment_debate_state.get("bull_history", ""),
+            "BEAR": investment_debate_state.get("bear_history", ""),
+            "TRADER": current_state.get("trader_investment_plan", ""),
+            "INVEST JUDGE": investment_debate_state.get("judge_decision", "") or current_state.get("investment_plan", ""),
+            "RISK JUDGE": risk_debate_state.get("judge_decision", "") or current_state.get("final_trade_decision", ""),
+        }.get(component_type, "")
+
+    def reflect_all(self, current_state, returns_losses, memories: Dict[str, Any]) -> Dict[str, str]:
+        """并发复盘所有角色，并批量写入记忆
+
+        所有角色共享同一份市场情况，只计算一次 embedding；各角色的 LLM 复盘并发执行，
+        仍受 LLM 适配器的并发控制约束。
+
+        Args:
+            current_state: 本次分析的最终状态
+            returns_losses: 收益/亏损
+            memories: {角色类型: 记忆对象}，如 {"BULL": bull_memory}；记忆为 None 的角色跳过
+
+        Returns:
+            {角色类型: 复盘内容}
+        """
+        start_time = time.time()
+        situation = self._extract_current_situation(current_state)
+        components = {
+            component_type: self._get_component_report(component_type, current_state)
+            for component_type, memory in memories.items()
+            if memory is not None
+        }
+        # 本次运行中未执行的节点没有内容可复盘
+        skipped = [name for name, report in components.items() if not report]
+        components = {name: report for name, report in components.items() if report}
+        if skipped:
+            logger.info(f"🪞 [反思] 跳过无内容的角色: {skipped}")
+        if not components:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=len(components), thread_name_prefix="reflection") as executor:
+            futures = {
+                name: executor.submit(
+                    contextvars.copy_context().run,
+                    self._reflect_on_component, name, report, situation, returns_losses
+                )
+                for name, report in components.items()
+            }
+            results = {}
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    logger.error(f"❌ [反思] {name} 复盘失败: {e}")
+
+        if results:
+            # 所有角色的情况文本相同，只计算一次 embedding
+            embedding = memories[next(iter(results))].get_embedding(situation)
+            for name, reflection in results.items():
+                try:
+                    memories[name].add_situations([(situation, reflection)], embeddings=[embedding])
+                except Exception as e:
+                    logger.error(f"❌ [反思] {name} 写入记忆失败: {e}")
+
+        logger.info(f"🪞 [反思] 完成 {len(results)}/{len(components)} 个角色复盘，耗时 {time.time() - start_time:.2f}秒")
+        return results
+
     def reflect_bull_researcher(self, current_state, returns_losses, bull_memory):
         """Reflect on bull researcher's analysis and update memory."""
         situation = self._extract_current_situation(current_state)
@@ -8,6 +8,9 @@ from langgraph.prebuilt import ToolNode
 from tradingagents.agents import *
 from tradingagents.agents.utils.agent_states import AgentState
 from tradingagents.agents.utils.agent_utils import Toolkit
+from tradingagents.agents.utils.memory_recall import create_memory_recall
+
+from tradingagents.llm_adapters.call_context import bind_node_context
 
 from .conditional_logic import ConditionalLogic
 
@@ -49,7 +52,7 @@ class GraphSetup:
         self.react_llm = react_llm
 
     def setup_graph(
-        self, selected_analysts=["market", "social", "news", "fundamentals"]
+        self, selected_analysts=["market", "social", "news", "fundamentals"], checkpointer=None
     ):
         """Set up and compile the agent workflow graph.
 
@@ -59,12 +62,16 @@ class GraphSetup:
                 - "social": Social media analyst
                 - "news": News analyst
                 - "fundamentals": Fundamentals analyst
+            checkpointer: Optional LangGraph checkpointer used to resume interrupted runs
         """
         if len(selected_analysts) == 0:
             raise ValueError("Trading Agents Graph Setup Error: no analysts selected!")
 
         # 去重，避免无法
         selected_analysts = list(dict.fromkeys(selected_analysts))
+        # ⚡ 快速配置档：分析师直接交给风险经理，仅使用本地数据
+        fast_profile = self.config.get("analysis_profile") == "fast"
+        max_tool_calls = self.config.get("max_tool_calls", 3)
         # Create analyst nodes
         analyst_nodes = {}
         delete_nodes = {}
@@ -92,21 +99,22 @@ class GraphSetup:
 
             # 所有LLM都使用标准分析师
             analyst_nodes["market"] = create_market_analyst(
-                self.quick_thinking_llm, self.toolkit
+                self.quick_thinking_llm, self.toolkit, max_tool_calls=max_tool_calls
             )
             delete_nodes["market"] = create_msg_delete()
             tool_nodes["market"] = self.tool_nodes["market"]
 
         if "social" in selected_analysts:
             analyst_nodes["social"] = create_social_media_analyst(
-                self.quick_thinking_llm, self.toolkit
+                self.quick_thinking_llm, self.toolkit,
+                max_tool_calls=max_tool_calls, local_data_only=fast_profile
             )
             delete_nodes["social"] = create_msg_delete()
             tool_nodes["social"] = self.tool_nodes["social"]
 
         if "news" in selected_analysts:
             analyst_nodes["news"] = create_news_analyst(
-                self.quick_thinking_llm, self.toolkit
+                self.quick_thinking_llm, self.toolkit, max_tool_calls=max_tool_calls
             )
             delete_nodes["news"] = create_msg_delete()
             tool_nodes["news"] = self.tool_nodes["news"]
@@ -162,22 +170,40 @@ class GraphSetup:
         workflow = StateGraph(AgentState)
 
         # Add analyst nodes to the graph
+        # Agent 节点绑定节点上下文，便于 LLM 适配器按节点做缓存/统计
         for analyst_type, node in analyst_nodes.items():
-            workflow.add_node(f"{analyst_type.capitalize()} Analyst", node)
+            analyst_name = f"{analyst_type.capitalize()} Analyst"
+            workflow.add_node(analyst_name, bind_node_context(analyst_name, node))
             workflow.add_node(
                 f"Msg Clear {analyst_type.capitalize()}", delete_nodes[analyst_type]
             )
             workflow.add_node(f"tools_{analyst_type}", tool_nodes[analyst_type])
 
         # Add other nodes
-        workflow.add_node("Bull Researcher", bull_researcher_node)
-        workflow.add_node("Bear Researcher", bear_researcher_node)
-        workflow.add_node("Research Manager", research_manager_node)
-        workflow.add_node("Trader", trader_node)
-        workflow.add_node("Risky Analyst", risky_analyst)
-        workflow.add_node("Neutral Analyst", neutral_analyst)
-        workflow.add_node("Safe Analyst", safe_analyst)
-        workflow.add_node("Risk Judge", risk_manager_node)
+        other_nodes = {
+            "Bull Researcher": bull_researcher_node,
+            "Bear Researcher": bear_researcher_node,
+            "Research Manager": research_manager_node,
+            "Trader": trader_node,
+            "Risky Analyst": risky_analyst,
+            "Neutral Analyst": neutral_analyst,
+            "Safe Analyst": safe_analyst,
+            "Risk Judge": risk_manager_node,
+        }
+        if fast_profile:
+            other_nodes.pop("Research Manager")
+
+        # 🧠 分析师完成后统一检索一次历史记忆，只检索图中实际执行的节点所用的记忆库
+        after_analysts = "Risk Judge" if fast_profile else "Research Manager"
+        recall_targets = {"risk_manager": self.risk_manager_memory}
+        if not fast_profile:
+            recall_targets["invest_judge"] = self.invest_judge_memory
+        use_memory_recall = any(memory is not None for memory in recall_targets.values())
+        if use_memory_recall:
+            other_nodes["Memory Recall"] = create_memory_recall(recall_targets, n_matches=2)
+
+        for node_name, node in other_nodes.items():
+            workflow.add_node(node_name, bind_node_context(node_name, node))
 
         # Define edges
         # Start with the first analyst
@@ -202,8 +228,11 @@ class GraphSetup:
             if i < len(selected_analysts) - 1:
                 next_analyst = f"{selected_analysts[i+1].capitalize()} Analyst"
                 workflow.add_edge(current_clear, next_analyst)
+            elif use_memory_recall:
+                workflow.add_edge(current_clear, "Memory Recall")
+                workflow.add_edge("Memory Recall", after_analysts)
             else:
-                workflow.add_edge(current_clear, "Research Manager")
+                workflow.add_edge(current_clear, after_analysts)
                 # workflow.add_edge(current_clear, 'Risky Analyst')
 
         # Add remaining edges
@@ -249,8 +278,9 @@ class GraphSetup:
         #         "Risk Judge": "Risk Judge",
         #     },
         # )
-        workflow.add_edge("Research Manager", "Risk Judge")
+        if not fast_profile:
+            workflow.add_edge("Research Manager", "Risk Judge")
         workflow.add_edge("Risk Judge", END)
 
         # Compile and return
-        return workflow.compile()
+        return workflow.compile(checkpointer=checkpointer)
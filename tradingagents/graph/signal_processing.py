@@ -1,12 +1,170 @@
 # TradingAgents/graph/signal_processing.py
 
+import re
+import threading
+from typing import Any, Dict, Optional, Tuple
+
 from langchain_openai import ChatOpenAI
 
+from tradingagents.config.runtime_settings import get_bool
+
 # 导入统一日志系统和图处理模块日志装饰器
 from tradingagents.utils.logging_init import get_logger
 from tradingagents.utils.tool_logging import log_graph_module
 logger = get_logger("graph.signal_processing")
 
+# ==================== 规则解析（优先于 LLM 提取） ====================
+# 报告中的标签与取值之间可能夹杂 Markdown 加粗符号，如 **最终决策**：**买入**
+_SEP = r"\s*\**\s*[:：]\s*\**\s*"
+# 支持千分位分组，如 1,650.00
+_NUMBER = r"(\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)"
+
+_ACTION_RE = re.compile(
+    r"(?:最终交易提案|最终决策|最终建议|投资建议|操作建议|交易建议|建议操作|决策|建议|"
+    r"final transaction proposal|final decision|recommendation|decision|action)"
+    + _SEP + r"(买入|增持|卖出|减持|持有|观望|buy|sell|hold)",
+    re.IGNORECASE,
+)
+_TARGET_PRICE_RE = re.compile(
+    r"(?:目标价[位格]?|target price)" + _SEP + r"[¥￥$]?\s*" + _NUMBER
+    + r"(?:\s*(?:-|~|～|至|到)\s*[¥￥$]?\s*" + _NUMBER + r")?",
+    re.IGNORECASE,
+)
+_CONFIDENCE_RE = re.compile(r"(?:置信度|信心度|信心水平|confidence)" + _SEP + _NUMBER + r"\s*(%)?", re.IGNORECASE)
+_RISK_SCORE_RE = re.compile(r"(?:风险评分|风险分数|风险系数|risk score)" + _SEP + _NUMBER + r"\s*(%)?", re.IGNORECASE)
+_CURRENT_PRICE_RE = re.compile(r"(?:当前价[格位]?|现价|最新价|current price)" + _SEP + r"[¥￥$]?\s*" + _NUMBER, re.IGNORECASE)
+_REASONING_RE = re.compile(r"(?:决策理由|主要理由|理由|reasoning|rationale)" + _SEP + r"([^\n]{10,300})", re.IGNORECASE)
+
+_ACTION_NORMALIZE = {
+    "买入": "BUY", "增持": "BUY", "buy": "BUY",
+    "卖出": "SELL", "减持": "SELL", "sell": "SELL",
+    "持有": "HOLD", "观望": "HOLD", "hold": "HOLD",
+}
+# 目标价相对当前价的合理范围；超出时多为解析错误（如千分位被截断），交给 LLM 提取
+_TARGET_PRICE_RATIO_RANGE = (0.5, 1.5)
+# 置信度低于该值的决策不合常理（如 "0.2%" 实为 0.2），交给 LLM 提取
+_MIN_CONFIDENCE = 0.1
+
+_ACTION_LABELS = {
+    "中文": {"BUY": "买入", "SELL": "卖出", "HOLD": "持有"},
+    "英文": {"BUY": "BUY", "SELL": "SELL", "HOLD": "HOLD"},
+}
+
+
+def _to_number(value: str) -> float:
+    """解析数字，去掉千分位分隔符"""
+    return float(value.replace(",", ""))
+
+
+def _to_ratio(value: str, percent: Optional[str]) -> Optional[float]:
+    """置信度/风险评分统一为 0-1（支持 85% / 0.85 / 8.5(十分制) 三种写法）"""
+    number = _to_number(value)
+    if percent and number < 1:
+        # "0.8%" 多为把 0.8 误写成百分比，无法确定本意
+        return None
+    if percent or number > 10:
+        number /= 100
+    elif number > 1:
+        number /= 10
+    return number if 0 <= number <= 1 else None
+
+
+def parse_signal_report(
+    full_signal: str, language: str = "中文", current_price: Optional[float] = None
+) -> Tuple[Optional[Dict[str, Any]], str]:
+    """用规则从最终报告中提取结构化决策
+
+    Args:
+        current_price: 当前股价，用于校验目标价；未提供时尝试从报告中读取
+
+    Returns:
+        (决策字典, 原因)；报告中信息缺失或相互矛盾时决策为 None，由调用方回退到 LLM
+    """
+    actions = {_ACTION_NORMALIZE[m.group(1).lower()] for m in _ACTION_RE.finditer(full_signal)}
+    if not actions:
+        return None, "未找到明确的交易决策"
+    if len(actions) > 1:
+        return None, f"交易决策存在歧义: {sorted(actions)}"
+
+    prices = set()
+    for m in _TARGET_PRICE_RE.finditer(full_signal):
+        low, high = _to_number(m.group(1)), m.group(2)
+        # 区间取中值
+        prices.add(round((low + _to_number(high)) / 2, 2) if high else low)
+    if not prices:
+        return None, "未找到目标价格"
+    if len(prices) > 1:
+        return None, f"目标价格存在歧义: {sorted(prices)}"
+    target_price = prices.pop()
+    if not 0 < target_price < 1_000_000:
+        return None, f"目标价格超出合理范围: {target_price}"
+    if current_price is None:
+        match = _CURRENT_PRICE_RE.search(full_signal)
+        current_price = _to_number(match.group(1)) if match else None
+    if current_price and current_price > 0:
+        low_ratio, high_ratio = _TARGET_PRICE_RATIO_RANGE
+        if not low_ratio <= target_price / current_price <= high_ratio:
+            return None, f"目标价格与当前价格相差过大: {target_price} / {current_price}"
+
+    confidence = 0.7
+    match = _CONFIDENCE_RE.search(full_signal)
+    if match:
+        confidence = _to_ratio(match.group(1), match.group(2))
+        if confidence is None or confidence < _MIN_CONFIDENCE:
+            return None, "置信度无法识别"
+
+    risk_score = 0.5
+    match = _RISK_SCORE_RE.search(full_signal)
+    if match:
+        risk_score = _to_ratio(match.group(1), match.group(2))
+        if risk_score is None:
+            return None, "风险评分无法识别"
+
+    match = _REASONING_RE.search(full_signal)
+    reasoning = match.group(1).strip(" *") if match else "基于综合分析的投资建议"
+
+    labels = _ACTION_LABELS.get(language, _ACTION_LABELS["中文"])
+    return {
+        "action": labels[actions.pop()],
+        "target_price": target_price,
+        "confidence": round(confidence, 4),
+        "risk_score": round(risk_score, 4),
+        "reasoning": reasoning,
+    }, "ok"
+
+
+class _SignalParserStats:
+    """规则解析命中率统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.parsed = 0
+        self.llm_fallbacks = 0
+
+    def record(self, parsed: bool):
+        with self._lock:
+            if parsed:
+                self.parsed += 1
+            else:
+                self.llm_fallbacks += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.parsed + self.llm_fallbacks
+            return {
+                "parsed": self.parsed,
+                "llm_fallbacks": self.llm_fallbacks,
+                "fallback_rate": round(self.llm_fallbacks / total, 4) if total else 0.0,
+            }
+
+
+_parser_stats = _SignalParserStats()
+
+
+def get_signal_parser_stats() -> Dict[str, Any]:
+    """获取信号规则解析统计（LLM 回退率）"""
+    return _parser_stats.snapshot()
+
 
 class SignalProcessor:
     """Processes trading signals to extract actionable decisions."""
@@ -85,6 +243,18 @@ class SignalProcessor:
         logger.info(f"🔍 [SignalProcessor] 处理信号: 股票={stock_symbol}, 市场={market_info['market_name']}, 货币={currency}",
                    extra={'stock_symbol': stock_symbol, 'market': market_info['market_name'], 'currency': currency})
 
+        # ⚡ 规则解析优先：报告中已明确给出决策与目标价时无需再调用 LLM
+        if get_bool("TA_SIGNAL_PARSER_ENABLED", "ta_signal_parser_enabled", True):
+            parsed, reason = parse_signal_report(full_signal, language)
+            _parser_stats.record(parsed is not None)
+            stats = _parser_stats.snapshot()
+            if parsed is not None:
+                logger.info(f"⚡ [SignalProcessor] 规则解析成功: {parsed} (LLM回退率: {stats['fallback_rate']:.1%})",
+                            extra={'action': parsed['action'], 'target_price': parsed['target_price'],
+                                   'confidence': parsed['confidence'], 'stock_symbol': stock_symbol})
+                return parsed
+            logger.info(f"🔁 [SignalProcessor] 规则解析失败（{reason}），回退到LLM提取 (LLM回退率: {stats['fallback_rate']:.1%})")
+
         messages = [
             (
                 "system",
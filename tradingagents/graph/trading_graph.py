@@ -6,6 +6,7 @@ import json
 from datetime import date
 from typing import Dict, Any, Tuple, List, Optional
 import time
+import uuid
 
 from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
@@ -24,6 +25,8 @@ from tradingagents.utils.logging_init import get_logger
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger
 from ..llm_adapters.internal_adapter import InternalLLM
+from ..llm_adapters.call_context import llm_call_context
+from ..llm_adapters.run_metrics import llm_run_metrics
 
 logger = get_logger('agents')
 from tradingagents.agents.utils.agent_states import (
@@ -38,6 +41,11 @@ from .setup import GraphSetup
 from .propagation import Propagator
 from .reflection import Reflector
 from .signal_processing import SignalProcessor
+from .checkpointing import delete_checkpoint, get_graph_checkpointer
+
+
+class GraphRunCancelled(Exception):
+    """运行被调用方通过 cancel_event 取消（在节点之间检查，不中断执行中的 LLM 调用）"""
 
 
 class TradingAgentsGraph:
@@ -90,6 +98,7 @@ class TradingAgentsGraph:
         deep_backend_url = self.config.get("deep_backend_url")
 
         # 使用统一的函数创建 LLM 实例
+        # 注意：InternalLLM 固定使用 qwen-plus，quick_think_llm / deep_think_llm 配置不影响实际调用的模型
         self.quick_thinking_llm = InternalLLM()
 
         self.deep_thinking_llm = InternalLLM()
@@ -120,11 +129,13 @@ class TradingAgentsGraph:
         # 🔥 [修复] 从配置中读取辩论轮次参数
         self.conditional_logic = ConditionalLogic(
             max_debate_rounds=self.config.get("max_debate_rounds", 1),
-            max_risk_discuss_rounds=self.config.get("max_risk_discuss_rounds", 1)
+            max_risk_discuss_rounds=self.config.get("max_risk_discuss_rounds", 1),
+            max_tool_calls=self.config.get("max_tool_calls", 3)
         )
         logger.info(f"🔧 [ConditionalLogic] 初始化完成:")
         logger.info(f"   - max_debate_rounds: {self.conditional_logic.max_debate_rounds}")
         logger.info(f"   - max_risk_discuss_rounds: {self.conditional_logic.max_risk_discuss_rounds}")
+        logger.info(f"   - max_tool_calls: {self.conditional_logic.max_tool_calls}")
 
         self.graph_setup = GraphSetup(
             self.quick_thinking_llm,
@@ -151,7 +162,9 @@ class TradingAgentsGraph:
         self.log_states_dict = {}  # date to full state dict
 
         # Set up the graph
-        self.graph = self.graph_setup.setup_graph(selected_analysts)
+        # 检查点存储（启用后按任务ID保存节点状态，失败重试时从断点继续）
+        self.checkpointer = get_graph_checkpointer()
+        self.graph = self.graph_setup.setup_graph(selected_analysts, checkpointer=self.checkpointer)
 
     def _create_tool_nodes(self) -> Dict[str, ToolNode]:
         """Create tool nodes for different data sources.
@@ -188,7 +201,8 @@ class TradingAgentsGraph:
             ),
         }
 
-    def propagate(self, company_name, trade_date, language="zh-CN", progress_callback=None, task_id=None):
+    def propagate(self, company_name, trade_date, language="zh-CN", progress_callback=None, task_id=None,
+                  keep_checkpoint_on_failure=False, cancel_event=None):
         """Run the trading agents graph for a company on a specific date.
 
         Args:
@@ -197,6 +211,10 @@ class TradingAgentsGraph:
             progress_callback: Optional callback function for progress updates
             language: Optional callback function for progress updates
             task_id: Optional task ID for tracking performance data
+            keep_checkpoint_on_failure: Keep the task's checkpoint when the run fails, so a retry
+                with the same task_id resumes from it; otherwise the checkpoint is deleted
+            cancel_event: Optional threading.Event; once set, the run raises GraphRunCancelled
+                before starting the next node
         """
 
         # 添加详细的接收日志
@@ -212,119 +230,102 @@ class TradingAgentsGraph:
         logger.debug(f"🔍 [GRAPH DEBUG] 初始状态中的trade_date: '{init_agent_state.get('trade_date', 'NOT_FOUND')}'")
 
         # 初始化计时器
-        node_timings = {}  # 记录每个节点的执行时间
+        node_timings = {}  # 记录每个节点的执行时间（同一节点多次执行时累加）
         total_start_time = time.time()  # 总体开始时间
-        current_node_start = None  # 当前节点开始时间
-        current_node_name = None  # 当前节点名称
+        last_chunk_time = total_start_time
 
-        # 保存task_id用于后续保存性能数据
+        # 保存task_id用于后续保存性能数据；未指定时生成运行ID，用于归集本次运行的 LLM 调用指标
         self._current_task_id = task_id
+        run_id = task_id or f"run_{uuid.uuid4().hex}"
+
+        # 统一使用 updates 模式，以便获取节点级别的进度与计时
+        args = self.propagator.get_graph_args(use_progress_callback=True)
+        if not progress_callback:
+            logger.info("⏱️ 执行分析（无进度回调）")
+
+        graph_input = init_agent_state
+        final_state = init_agent_state.copy()
+        graph_completed = False
+        if self.checkpointer is not None:
+            # 检查点以任务ID为 thread_id，重试同一任务时从最后完成的节点继续
+            args["config"]["configurable"] = {"thread_id": run_id}
+            graph_input, final_state, graph_completed = self._restore_from_checkpoint(
+                args["config"], init_agent_state
+            )
 
-        # 根据是否有进度回调选择不同的stream_mode
-        args = self.propagator.get_graph_args(use_progress_callback=bool(progress_callback))
-
-
-        # Standard mode without tracing but with progress updates
-        if progress_callback:
-            # 使用 updates 模式以便获取节点级别的进度
-            trace = []
-            final_state = None
-            for chunk in self.graph.stream(init_agent_state, **args):
-                # 记录节点计时
-                for node_name in chunk.keys():
-                    if not node_name.startswith('__'):
-                        # 如果有上一个节点，记录其结束时间
-                        if current_node_name and current_node_start:
-                            elapsed = time.time() - current_node_start
-                            node_timings[current_node_name] = elapsed
-                            logger.info(f"⏱️ [{current_node_name}] 耗时: {elapsed:.2f}秒")
-                            logger.info(f"🔍 [TIMING] 节点切换: {current_node_name} → {node_name}")
-
-                        # 开始新节点计时
-                        current_node_name = node_name
-                        current_node_start = time.time()
-                        logger.info(f"🔍 [TIMING] 开始计时: {node_name}")
-                        break
-
-                self._send_progress_update(chunk, progress_callback)
-                # 累积状态更新
-                if final_state is None:
-                    final_state = init_agent_state.copy()
-                for node_name, node_update in chunk.items():
-                    if not node_name.startswith('__'):
-                        final_state.update(node_update)
-        else:
-            # 原有的invoke模式（也需要计时）
-            logger.info("⏱️ 使用 invoke 模式执行分析（无进度回调）")
-            # 使用stream模式以便计时，但不发送进度更新
-            trace = []
-            final_state = None
-            for chunk in self.graph.stream(init_agent_state, **args):
-                # 记录节点计时
-                for node_name in chunk.keys():
-                    if not node_name.startswith('__'):
-                        # 如果有上一个节点，记录其结束时间
-                        if current_node_name and current_node_start:
-                            elapsed = time.time() - current_node_start
-                            node_timings[current_node_name] = elapsed
-                            logger.info(f"⏱️ [{current_node_name}] 耗时: {elapsed:.2f}秒")
-
-                        # 开始新节点计时
-                        current_node_name = node_name
-                        current_node_start = time.time()
-                        break
-
-                # 累积状态更新
-                if final_state is None:
-                    final_state = init_agent_state.copy()
-                for node_name, node_update in chunk.items():
-                    if not node_name.startswith('__'):
-                        final_state.update({node_name: node_update})
-
-        # 记录最后一个节点的时间
-        if current_node_name and current_node_start:
-            elapsed = time.time() - current_node_start
-            node_timings[current_node_name] = elapsed
-            logger.info(f"⏱️ [{current_node_name}] 耗时: {elapsed:.2f}秒")
+        try:
+            graph_stream = [] if graph_completed else self.graph.stream(graph_input, **args)
+            with llm_call_context(task_id=run_id):
+                for chunk in graph_stream:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise GraphRunCancelled(f"分析运行已取消: {run_id}")
+
+                    # 记录节点计时：chunk 在节点执行完成时产出，距上一个 chunk 的间隔即该节点耗时
+                    now = time.time()
+                    for node_name in chunk.keys():
+                        if not node_name.startswith('__'):
+                            elapsed = now - last_chunk_time
+                            node_timings[node_name] = node_timings.get(node_name, 0.0) + elapsed
+                            logger.info(f"⏱️ [{node_name}] 耗时: {elapsed:.2f}秒")
+                            break
+                    last_chunk_time = now
+
+                    if progress_callback:
+                        self._send_progress_update(chunk, progress_callback)
+
+                    # 累积状态更新
+                    for node_name, node_update in chunk.items():
+                        if not node_name.startswith('__') and isinstance(node_update, dict):
+                            final_state.update(node_update)
+
+                if cancel_event is not None and cancel_event.is_set():
+                    raise GraphRunCancelled(f"分析运行已取消: {run_id}")
+
+                # 处理决策（信号处理也计入节点耗时与 LLM 指标）
+                signal_start = time.time()
+                with llm_call_context(node="Signal Processing"):
+                    decision = self.process_signal(final_state["final_trade_decision"], company_name, language)
+                node_timings["Signal Processing"] = time.time() - signal_start
+        except BaseException:
+            # 检查点只为同一任务ID的重试保留；不会重试的运行（含无任务ID的 run_ 线程）立即清理
+            if not (task_id and keep_checkpoint_on_failure):
+                delete_checkpoint(self.checkpointer, run_id)
+            llm_run_metrics.pop(run_id)
+            raise
 
         # 计算总时间
-        # total_elapsed = time.time() - total_start_time
-        #
-        # # 调试日志
-        # logger.info(f"🔍 [TIMING DEBUG] 节点计时数量: {len(node_timings)}")
-        # logger.info(f"🔍 [TIMING DEBUG] 总耗时: {total_elapsed:.2f}秒")
-        # logger.info(f"🔍 [TIMING DEBUG] 节点列表: {list(node_timings.keys())}")
-        #
-        # # 打印详细的时间统计
-        # logger.info("🔍 [TIMING DEBUG] 准备调用 _print_timing_summary")
-        # self._print_timing_summary(node_timings, total_elapsed)
-        # logger.info("🔍 [TIMING DEBUG] _print_timing_summary 调用完成")
-        #
-        # # 构建性能数据
-        # performance_data = self._build_performance_data(node_timings, total_elapsed)
-        #
-        # # 将性能数据添加到状态中
-        # final_state['performance_metrics'] = performance_data
-        #
-        # # Store current state for reflection
-        # self.curr_state = final_state
-        #
-        # # Log state
-        # # self._log_state(trade_date, final_state)
-        #
-        # # 获取模型信息
-        # model_info = ""
-        # try:
-        #     if hasattr(self.deep_thinking_llm, 'model_name'):
-        #         model_info = f"{self.deep_thinking_llm.__class__.__name__}:{self.deep_thinking_llm.model_name}"
-        #     else:
-        #         model_info = self.deep_thinking_llm.__class__.__name__
-        # except Exception:
-        #     model_info = "Unknown"
-        #
-        # # 处理决策并添加模型信息
-        decision = self.process_signal(final_state["final_trade_decision"], company_name, language)
-        # decision['model_info'] = model_info
+        total_elapsed = time.time() - total_start_time
+
+        # 打印详细的时间统计
+        self._print_timing_summary(node_timings, total_elapsed)
+
+        # 构建性能数据（节点耗时 + LLM 调用指标），随分析结果一起保存
+        performance_data = self._build_performance_data(node_timings, total_elapsed)
+        performance_data.update(self._build_node_metrics(node_timings, llm_run_metrics.pop(run_id)))
+
+        # 将性能数据添加到状态中
+        final_state['performance_metrics'] = performance_data
+
+        # Store current state for reflection
+        self.curr_state = final_state
+
+        # 获取模型信息
+        model_info = ""
+        try:
+            if hasattr(self.deep_thinking_llm, 'model_name'):
+                model_info = f"{self.deep_thinking_llm.__class__.__name__}:{self.deep_thinking_llm.model_name}"
+            else:
+                model_info = self.deep_thinking_llm.__class__.__name__
+        except Exception:
+            model_info = "Unknown"
+
+        # 添加模型信息
+        if isinstance(decision, dict):
+            decision['model_info'] = model_info
+            decision.setdefault('tokens_used', performance_data.get("total_tokens", 0))
+
+        # 运行成功后清理检查点
+        delete_checkpoint(self.checkpointer, run_id)
 
         # Return decision and processed signal
         # return final_state, decision
@@ -335,6 +336,32 @@ class TradingAgentsGraph:
                 del final_state['risk_debate_state']
         return final_state, decision
 
+    def _restore_from_checkpoint(self, graph_config: Dict[str, Any], init_agent_state: Dict[str, Any]):
+        """读取任务检查点，决定从头执行还是断点续跑
+
+        Returns:
+            (graph_input, final_state, graph_completed)
+            - 无检查点：从初始状态开始执行
+            - 有未完成节点：输入为 None，由 LangGraph 从断点继续
+            - 图已执行完成（如信号处理阶段失败）：直接复用检查点状态
+        """
+        try:
+            snapshot = self.graph.get_state(graph_config)
+        except Exception as e:
+            logger.warning(f"⚠️ [Checkpoint] 读取检查点失败，从头执行: {e}")
+            return init_agent_state, init_agent_state.copy(), False
+
+        if not snapshot or not snapshot.values:
+            return init_agent_state, init_agent_state.copy(), False
+
+        final_state = dict(snapshot.values)
+        if snapshot.next:
+            logger.info(f"♻️ [Checkpoint] 从检查点恢复执行，待执行节点: {list(snapshot.next)}")
+            return None, final_state, False
+
+        logger.info(f"♻️ [Checkpoint] 图已在上次执行中完成，直接复用检查点状态")
+        return None, final_state, True
+
     def _send_progress_update(self, chunk, progress_callback):
         """发送进度更新到回调函数
 
@@ -387,6 +414,8 @@ class TradingAgentsGraph:
                 'Msg Clear Fundamentals': None,
                 'Msg Clear News': None,
                 'Msg Clear Social': None,
+                # 历史记忆检索节点（耗时很短，不发送进度更新）
+                'Memory Recall': None,
                 # 研究员节点
                 'Bull Researcher': "🐂 看涨研究员",
                 'Bear Researcher': "🐻 看跌研究员",
@@ -525,6 +554,55 @@ class TradingAgentsGraph:
             }
         }
 
+    def _build_node_metrics(self, node_timings: Dict[str, float],
+                            llm_metrics: Dict[str, Dict[str, float]]) -> Dict[str, Any]:
+        """合并节点耗时与 LLM 调用指标，生成逐节点明细
+
+        Args:
+            node_timings: 每个节点的执行时间字典
+            llm_metrics: 本次运行按节点汇总的 LLM 调用指标
+
+        Returns:
+            包含 node_metrics 与汇总字段的字典
+        """
+        node_metrics = {}
+        for node_name in list(node_timings.keys()) + [n for n in llm_metrics if n not in node_timings]:
+            wall_time = node_timings.get(node_name, 0.0)
+            llm = llm_metrics.get(node_name, {})
+            llm_time = llm.get("llm_time", 0.0)
+            # 工具节点全部计为工具时间；其他节点中非 LLM 的部分（状态处理、记忆检索等）单独计为 other_time
+            is_tool_node = node_name.startswith('tools_')
+            tool_time = wall_time if is_tool_node else 0.0
+            other_time = 0.0 if is_tool_node else max(0.0, wall_time - llm_time)
+            node_metrics[node_name] = {
+                "wall_time": round(wall_time, 3),
+                "llm_time": round(llm_time, 3),
+                "tool_time": round(tool_time, 3),
+                "other_time": round(other_time, 3),
+                "llm_calls": int(llm.get("llm_calls", 0)),
+                "prompt_tokens": int(llm.get("prompt_tokens", 0)),
+                "completion_tokens": int(llm.get("completion_tokens", 0)),
+                "estimated_prompt_tokens": int(llm.get("estimated_prompt_tokens", 0)),
+                "budget_trims": int(llm.get("budget_trims", 0)),
+                "cache_hits": int(llm.get("cache_hits", 0)),
+                "retries": int(llm.get("errors", 0)),
+            }
+
+        total_prompt = sum(m["prompt_tokens"] for m in node_metrics.values())
+        total_completion = sum(m["completion_tokens"] for m in node_metrics.values())
+        return {
+            "node_metrics": node_metrics,
+            "total_llm_time": round(sum(m["llm_time"] for m in node_metrics.values()), 2),
+            "total_tool_time": round(sum(m["tool_time"] for m in node_metrics.values()), 2),
+            "total_other_time": round(sum(m["other_time"] for m in node_metrics.values()), 2),
+            "total_prompt_tokens": total_prompt,
+            "total_completion_tokens": total_completion,
+            "total_tokens": total_prompt + total_completion,
+            "cache_hits": sum(m["cache_hits"] for m in node_metrics.values()),
+            "retries": sum(m["retries"] for m in node_metrics.values()),
+            "budget_trims": sum(m["budget_trims"] for m in node_metrics.values()),
+        }
+
     def _print_timing_summary(self, node_timings: Dict[str, float], total_elapsed: float):
         """打印详细的时间统计报告
 
@@ -655,20 +733,17 @@ class TradingAgentsGraph:
 
     def reflect_and_remember(self, returns_losses):
         """Reflect on decisions and update memory based on returns."""
-        self.reflector.reflect_bull_researcher(
-            self.curr_state, returns_losses, self.bull_memory
-        )
-        self.reflector.reflect_bear_researcher(
-            self.curr_state, returns_losses, self.bear_memory
-        )
-        self.reflector.reflect_trader(
-            self.curr_state, returns_losses, self.trader_memory
-        )
-        self.reflector.reflect_invest_judge(
-            self.curr_state, returns_losses, self.invest_judge_memory
-        )
-        self.reflector.reflect_risk_manager(
-            self.curr_state, returns_losses, self.risk_manager_memory
+        # 五个角色的复盘相互独立，并发执行并批量写入记忆
+        self.reflector.reflect_all(
+            self.curr_state,
+            returns_losses,
+            {
+                "BULL": self.bull_memory,
+                "BEAR": self.bear_memory,
+                "TRADER": self.trader_memory,
+                "INVEST JUDGE": self.invest_judge_memory,
+                "RISK JUDGE": self.risk_manager_memory,
+            },
         )
 
     def process_signal(self, full_signal, stock_symbol=None, language='en-US'):
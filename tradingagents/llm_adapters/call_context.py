@@ -0,0 +1,53 @@
+"""
+LLM 调用上下文
+通过 ContextVar 记录当前正在执行的图节点与任务ID，
+供 LLM 适配器（响应缓存、指标统计等）在不修改各 Agent 签名的情况下获取调用来源
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Optional
+
+_current_node: ContextVar[Optional[str]] = ContextVar("ta_llm_current_node", default=None)
+_current_task_id: ContextVar[Optional[str]] = ContextVar("ta_llm_current_task_id", default=None)
+
+
+def get_current_node() -> Optional[str]:
+    """获取当前执行的图节点名称（如 "Market Analyst"），不在图中执行时返回 None"""
+    return _current_node.get()
+
+
+def get_current_task_id() -> Optional[str]:
+    """获取当前分析任务ID，未设置时返回 None"""
+    return _current_task_id.get()
+
+
+@contextmanager
+def llm_call_context(node: Optional[str] = None, task_id: Optional[str] = None):
+    """在上下文内设置节点名称/任务ID，退出时自动恢复
+
+    Args:
+        node: 节点名称，None 表示沿用外层设置
+        task_id: 任务ID，None 表示沿用外层设置
+    """
+    node_token = _current_node.set(node) if node is not None else None
+    task_token = _current_task_id.set(task_id) if task_id is not None else None
+    try:
+        yield
+    finally:
+        if task_token is not None:
+            _current_task_id.reset(task_token)
+        if node_token is not None:
+            _current_node.reset(node_token)
+
+
+def bind_node_context(node_name: str, node_func: Callable) -> Callable:
+    """包装图节点函数，使节点内部的 LLM 调用能够感知所属节点"""
+
+    @wraps(node_func)
+    def _node_with_context(state):
+        with llm_call_context(node=node_name):
+            return node_func(state)
+
+    return _node_with_context
@@ -0,0 +1,171 @@
+"""
+LLM 客户端注册表与共享连接池
+
+按 (provider, model, base_url, api_key, timeout) 复用 LLM 客户端实例，
+所有实例共享同一个调优过的 httpx 连接池，保留 keep-alive 连接与 TLS 会话。
+
+配置（环境变量）：
+- TA_LLM_POOL_MAX_CONNECTIONS: 连接池最大连接数（默认 20）
+- TA_LLM_POOL_MAX_KEEPALIVE: 最大保活连接数（默认 10）
+- TA_LLM_POOL_KEEPALIVE_EXPIRY: 保活连接空闲过期秒数（默认 60）
+"""
+
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from tradingagents.config.runtime_settings import get_float, get_int
+from tradingagents.utils.logging_manager import get_logger
+
+logger = get_logger('agents')
+
+ClientKey = Tuple[str, str, str, str, float]
+
+
+def _key_fingerprint(api_key: Optional[str]) -> str:
+    """API Key 只以摘要形式参与注册表键，避免明文常驻在统计信息中"""
+    if not api_key:
+        return ""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class LLMClientRegistry:
+    """线程安全的 LLM 客户端注册表"""
+
+    def __init__(
+        self,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 60.0,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+
+        self._lock = threading.Lock()
+        self._clients: Dict[ClientKey, Any] = {}
+        self._http_clients: Dict[float, httpx.Client] = {}
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "client_hits": 0,
+            "client_creates": 0,
+            "requests": 0,
+            "new_connections": 0,
+        }
+        self._seen_streams = set()
+
+        logger.info(
+            f"🔌 [LLM连接池] 初始化: max_connections={max_connections}, "
+            f"max_keepalive={max_keepalive_connections}, keepalive_expiry={keepalive_expiry}s"
+        )
+
+    def _on_response(self, response: httpx.Response):
+        """统计请求数与新建连接数（同一连接上的响应共享 network_stream 对象）"""
+        stream_id = id(response.extensions.get("network_stream"))
+        with self._stats_lock:
+            self._stats["requests"] += 1
+            if stream_id not in self._seen_streams:
+                self._seen_streams.add(stream_id)
+                self._stats["new_connections"] += 1
+                if len(self._seen_streams) > 10000:
+                    self._seen_streams.clear()
+
+    def get_http_client(self, timeout: float) -> httpx.Client:
+        """获取共享的 httpx 客户端（按超时配置区分，连接池参数一致）"""
+        with self._lock:
+            client = self._http_clients.get(timeout)
+            if client is None:
+                client = httpx.Client(
+                    timeout=httpx.Timeout(timeout, connect=10.0),
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_keepalive_connections,
+                        keepalive_expiry=self.keepalive_expiry,
+                    ),
+                    event_hooks={"response": [self._on_response]},
+                )
+                self._http_clients[timeout] = client
+            return client
+
+    def get_or_create(
+        self,
+        provider: str,
+        model: str,
+        base_url: str,
+        api_key: Optional[str],
+        timeout: float,
+        factory: Callable[[httpx.Client], Any],
+    ):
+        """获取共享客户端实例，不存在时通过 factory(http_client) 创建"""
+        key: ClientKey = (provider, model, base_url or "", _key_fingerprint(api_key), float(timeout))
+        client = self._clients.get(key)
+        if client is not None:
+            with self._stats_lock:
+                self._stats["client_hits"] += 1
+            return client
+
+        http_client = self.get_http_client(float(timeout))
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = factory(http_client)
+                self._clients[key] = client
+                with self._stats_lock:
+                    self._stats["client_creates"] += 1
+                logger.info(f"🔌 [LLM连接池] 创建客户端: provider={provider}, model={model}, timeout={timeout}s")
+            else:
+                with self._stats_lock:
+                    self._stats["client_hits"] += 1
+        return client
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取客户端复用与连接复用统计"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        requests = stats["requests"]
+        lookups = stats["client_hits"] + stats["client_creates"]
+        stats.update({
+            "clients": len(self._clients),
+            "client_reuse_rate": round(stats["client_hits"] / lookups, 4) if lookups else 0.0,
+            "connection_reuse_rate": (
+                round(1 - stats["new_connections"] / requests, 4) if requests else 0.0
+            ),
+            "pool": {
+                "max_connections": self.max_connections,
+                "max_keepalive_connections": self.max_keepalive_connections,
+                "keepalive_expiry": self.keepalive_expiry,
+            },
+        })
+        return stats
+
+    def close(self):
+        """关闭共享连接池并清空注册表"""
+        with self._lock:
+            for client in self._http_clients.values():
+                try:
+                    client.close()
+                except Exception as e:
+                    logger.warning(f"⚠️ [LLM连接池] 关闭 httpx 客户端失败: {e}")
+            self._http_clients.clear()
+            self._clients.clear()
+
+
+_registry: Optional[LLMClientRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_llm_client_registry() -> LLMClientRegistry:
+    """获取全局 LLM 客户端注册表"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = LLMClientRegistry(
+                    max_connections=get_int("TA_LLM_POOL_MAX_CONNECTIONS", "ta_llm_pool_max_connections", 20),
+                    max_keepalive_connections=get_int("TA_LLM_POOL_MAX_KEEPALIVE", "ta_llm_pool_max_keepalive", 10),
+                    keepalive_expiry=get_float("TA_LLM_POOL_KEEPALIVE_EXPIRY", "ta_llm_pool_keepalive_expiry", 60.0),
+                )
+    return _registry
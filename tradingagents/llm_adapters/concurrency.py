@@ -0,0 +1,312 @@
+"""
+LLM 自适应并发控制（AIMD）
+
+进程级并发控制器，位于所有 LLM 调用之前，按 provider/model 分别维护在途请求上限：
+- 加性增：延迟与错误率健康时，每完成一个"窗口"的请求，上限 +1
+- 乘性减：遇到 429 限流或超时，上限减半（同一轮拥塞只减一次）
+- 排队等待时间作为指标导出，便于观察实际容量；等待超过上限时抛出 ConcurrencyWaitExceeded
+- 重试：限流/超时/5xx 在槽位外退避后重新排队，每次尝试的结果都反馈给 AIMD
+  （池化客户端关闭 SDK 自带重试，SDK 在槽位内重试 429 时 AIMD 看不到这些限流）
+
+配置（环境变量）：
+- TA_LLM_CONCURRENCY_ENABLED: 是否启用（默认 true）
+- TA_LLM_CONCURRENCY_INITIAL: 初始上限（默认 4）
+- TA_LLM_CONCURRENCY_MIN / TA_LLM_CONCURRENCY_MAX: 上限范围（默认 1 / 32）
+- TA_LLM_CONCURRENCY_LATENCY_TARGET: 健康延迟阈值秒数（默认 60）
+- TA_LLM_CONCURRENCY_ACQUIRE_TIMEOUT: 等待并发槽位的最长秒数（默认 300，<=0 表示不限制）
+- TA_LLM_MAX_RETRIES: 服务端故障的最大重试次数（默认 2，与 OpenAI SDK 默认一致）
+"""
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from tradingagents.config.runtime_settings import get_bool, get_float, get_int
+from tradingagents.llm_adapters.resilience import is_service_failure
+from tradingagents.utils.logging_manager import get_logger
+
+logger = get_logger('agents')
+
+OUTCOME_OK = "ok"
+OUTCOME_THROTTLED = "throttled"
+OUTCOME_TIMEOUT = "timeout"
+OUTCOME_ERROR = "error"
+OUTCOME_ABANDONED = "abandoned"
+
+# 重试退避（秒）：指数增长并加抖动，与 OpenAI SDK 的默认退避相当
+_RETRY_BASE_DELAY = 0.5
+_RETRY_MAX_DELAY = 8.0
+
+
+class ConcurrencyWaitExceeded(RuntimeError):
+    """等待并发槽位超过上限（provider 持续限流或上限被压到很低）"""
+
+
+def classify_llm_error(error: BaseException) -> str:
+    """将 LLM 调用异常归类为限流/超时/其他错误（不依赖具体 SDK 的异常类型）"""
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        response = getattr(error, "response", None)
+        status_code = getattr(response, "status_code", None)
+    name = type(error).__name__
+    if status_code == 429 or "RateLimit" in name:
+        return OUTCOME_THROTTLED
+    if "Timeout" in name or isinstance(error, TimeoutError):
+        return OUTCOME_TIMEOUT
+    return OUTCOME_ERROR
+
+
+class AIMDLimiter:
+    """单个 provider/model 的 AIMD 并发限制器"""
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        latency_target: float = 60.0,
+        error_rate_threshold: float = 0.2,
+    ):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.error_rate_threshold = error_rate_threshold
+
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._error_rate = 0.0  # 错误率 EWMA
+        self._last_decrease_at = 0.0
+        self._latency_ewma: Optional[float] = None
+
+        self.stats = {
+            "requests": 0,
+            "throttled": 0,
+            "timeouts": 0,
+            "errors": 0,
+            "decreases": 0,
+            "queue_wait_total": 0.0,
+            "queue_wait_max": 0.0,
+            "queued_requests": 0,
+            "abandoned": 0,
+            "wait_exceeded": 0,
+            "retries": 0,
+        }
+
+    def acquire(self, timeout: Optional[float] = None) -> float:
+        """阻塞直到获得并发槽位，返回排队等待秒数
+
+        timeout: 最长等待秒数，None 或 <=0 表示不限制；超时抛出 ConcurrencyWaitExceeded
+        """
+        start = time.monotonic()
+        deadline = start + timeout if timeout and timeout > 0 else None
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self.stats["wait_exceeded"] += 1
+                    raise ConcurrencyWaitExceeded(
+                        f"{self.name} 等待并发槽位超过 {timeout:.0f}秒 "
+                        f"(上限={int(self.limit)}, 在途={self.in_flight})，"
+                        f"请检查提供方限流情况，或调大 TA_LLM_CONCURRENCY_ACQUIRE_TIMEOUT"
+                    )
+                self._cond.wait(remaining)
+            self.in_flight += 1
+            waited = time.monotonic() - start
+            self.stats["queue_wait_total"] += waited
+            self.stats["queue_wait_max"] = max(self.stats["queue_wait_max"], waited)
+            if waited > 0.001:
+                self.stats["queued_requests"] += 1
+        return waited
+
+    def release(self, latency: float, outcome: str):
+        """释放槽位并根据结果调整上限"""
+        with self._cond:
+            self.in_flight -= 1
+            if outcome == OUTCOME_ABANDONED:
+                # 被放弃的请求不计入延迟与错误统计，不调整上限
+                self.stats["abandoned"] += 1
+                self._cond.notify_all()
+                return
+            self.stats["requests"] += 1
+            is_error = outcome != OUTCOME_OK
+            self._error_rate = self._error_rate * 0.9 + (0.1 if is_error else 0.0)
+
+            if outcome in (OUTCOME_THROTTLED, OUTCOME_TIMEOUT):
+                self.stats["throttled" if outcome == OUTCOME_THROTTLED else "timeouts"] += 1
+                now = time.monotonic()
+                # 同一轮拥塞（一个平均延迟周期内）只减半一次，避免连续 429 把上限打到底
+                cooldown = self._latency_ewma or 1.0
+                if now - self._last_decrease_at >= cooldown:
+                    old_limit = self.limit
+                    self.limit = max(float(self.min_limit), self.limit / 2)
+                    self._last_decrease_at = now
+                    self.stats["decreases"] += 1
+                    logger.warning(
+                        f"🚦 [LLM并发] {self.name} 触发{'限流' if outcome == OUTCOME_THROTTLED else '超时'}，"
+                        f"并发上限 {old_limit:.1f} → {self.limit:.1f}"
+                    )
+            elif outcome == OUTCOME_ERROR:
+                self.stats["errors"] += 1
+            else:
+                self._latency_ewma = latency if self._latency_ewma is None else (
+                    self._latency_ewma * 0.8 + latency * 0.2
+                )
+                healthy = latency <= self.latency_target and self._error_rate < self.error_rate_threshold
+                if healthy and self.limit < self.max_limit:
+                    # 每完成约 limit 个请求上限 +1（与 TCP 拥塞避免一致）
+                    self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+            self._cond.notify_all()
+
+    def record_retry(self):
+        with self._cond:
+            self.stats["retries"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self.stats)
+            requests = stats["requests"]
+            stats.update({
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "error_rate": round(self._error_rate, 4),
+                "latency_ewma": round(self._latency_ewma, 3) if self._latency_ewma is not None else None,
+                "queue_wait_avg": round(stats["queue_wait_total"] / requests, 4) if requests else 0.0,
+            })
+            stats["queue_wait_total"] = round(stats["queue_wait_total"], 3)
+            stats["queue_wait_max"] = round(stats["queue_wait_max"], 3)
+            return stats
+
+
+class ConcurrencySlot:
+    """一次调用占用的并发槽位，只释放一次"""
+
+    def __init__(self, limiter: Optional[AIMDLimiter] = None):
+        self._limiter = limiter
+        self._start = time.monotonic()
+        self._released = limiter is None
+        self._lock = threading.Lock()
+
+    def release(self, outcome: str) -> bool:
+        with self._lock:
+            if self._released:
+                return False
+            self._released = True
+        self._limiter.release(time.monotonic() - self._start, outcome)
+        return True
+
+    def abandon(self):
+        """提前归还槽位（如对冲中落后的请求）：请求仍在后台完成，但不再占用上限"""
+        if self.release(OUTCOME_ABANDONED):
+            logger.debug(f"🚦 [LLM并发] {self._limiter.name} 放弃落后的请求，提前归还槽位")
+
+
+class LLMConcurrencyController:
+    """按 provider/model 管理 AIMD 限制器"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        acquire_timeout: Optional[float] = None,
+        max_retries: int = 0,
+        **limiter_kwargs,
+    ):
+        self.enabled = enabled
+        self.acquire_timeout = acquire_timeout
+        self.max_retries = max_retries
+        self._limiter_kwargs = limiter_kwargs
+        self._limiters: Dict[Tuple[str, str], AIMDLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get_limiter(self, provider: str, model: str) -> AIMDLimiter:
+        key = (provider, model)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(key)
+                if limiter is None:
+                    limiter = AIMDLimiter(f"{provider}/{model}", **self._limiter_kwargs)
+                    self._limiters[key] = limiter
+        return limiter
+
+    @contextmanager
+    def slot(self, provider: str, model: str):
+        """获取并发槽位的上下文管理器，异常时按类型反馈给 AIMD
+
+        返回 ConcurrencySlot，调用方可在结果不再需要时 abandon() 提前归还槽位。
+        """
+        if not self.enabled:
+            yield ConcurrencySlot()
+            return
+
+        limiter = self.get_limiter(provider, model)
+        waited = limiter.acquire(self.acquire_timeout)
+        if waited > 1.0:
+            logger.info(f"🚦 [LLM并发] {limiter.name} 排队等待 {waited:.2f}秒 (上限={int(limiter.limit)})")
+        slot = ConcurrencySlot(limiter)
+        outcome = OUTCOME_OK
+        try:
+            yield slot
+        except BaseException as e:
+            outcome = classify_llm_error(e)
+            raise
+        finally:
+            slot.release(outcome)
+
+    def call(self, provider: str, model: str, fn: Callable[[ConcurrencySlot], Any]) -> Any:
+        """在并发槽位中执行 fn(slot)；服务端故障时归还槽位，退避后重新排队，最多重试 max_retries 次"""
+        attempt = 0
+        while True:
+            try:
+                with self.slot(provider, model) as slot:
+                    return fn(slot)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_service_failure(e):
+                    raise
+                attempt += 1
+                delay = min(_RETRY_MAX_DELAY, _RETRY_BASE_DELAY * 2 ** (attempt - 1)) * random.uniform(0.75, 1.0)
+                if self.enabled:
+                    self.get_limiter(provider, model).record_retry()
+                logger.warning(
+                    f"🔁 [LLM并发] {provider}/{model} 调用失败（{type(e).__name__}），"
+                    f"{delay:.1f}秒后重试 ({attempt}/{self.max_retries})"
+                )
+                time.sleep(delay)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取各 provider/model 的并发上限、在途请求数与排队等待指标"""
+        return {
+            "enabled": self.enabled,
+            "limiters": {limiter.name: limiter.snapshot() for limiter in list(self._limiters.values())},
+        }
+
+
+_controller: Optional[LLMConcurrencyController] = None
+_controller_lock = threading.Lock()
+
+
+def get_llm_concurrency_controller() -> LLMConcurrencyController:
+    """获取全局 LLM 并发控制器"""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = LLMConcurrencyController(
+                    enabled=get_bool("TA_LLM_CONCURRENCY_ENABLED", "ta_llm_concurrency_enabled", True),
+                    initial_limit=get_int("TA_LLM_CONCURRENCY_INITIAL", "ta_llm_concurrency_initial", 4),
+                    min_limit=get_int("TA_LLM_CONCURRENCY_MIN", "ta_llm_concurrency_min", 1),
+                    max_limit=get_int("TA_LLM_CONCURRENCY_MAX", "ta_llm_concurrency_max", 32),
+                    latency_target=get_float(
+                        "TA_LLM_CONCURRENCY_LATENCY_TARGET", "ta_llm_concurrency_latency_target", 60.0
+                    ),
+                    acquire_timeout=get_float(
+                        "TA_LLM_CONCURRENCY_ACQUIRE_TIMEOUT", "ta_llm_concurrency_acquire_timeout", 300.0
+                    ),
+                    max_retries=get_int("TA_LLM_MAX_RETRIES", "ta_llm_max_retries", 2),
+                )
+    return _controller
@@ -5,18 +5,33 @@
 """
 
 import os
+import time
 from typing import Any, Dict, List, Optional, Union, Sequence
 from langchain_openai import ChatOpenAI
+from langchain_core.language_models.chat_models import generate_from_stream
 from langchain_core.tools import BaseTool
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
 from pydantic import Field, SecretStr
 from ..config.config_manager import token_tracker
 
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger
 from ..db.cache import cache
+from ..agents.utils.token_budget import count_prompt_tokens
+from ..config.runtime_settings import get_float
+from .call_context import get_current_node, get_current_task_id
+from .client_pool import get_llm_client_registry
+from .concurrency import get_llm_concurrency_controller
+from .resilience import get_llm_resilience_policy, mark_attempt_started
+from .response_cache import compute_fingerprint, get_llm_response_cache
+from .run_metrics import llm_run_metrics
+from .token_stream import TokenStreamCoalescer, get_token_sink
 
 logger = get_logger('agents')
 
+DASHSCOPE_BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+
 
 class ChatDashScopeOpenAI(ChatOpenAI):
     """
@@ -72,7 +87,7 @@ class ChatDashScopeOpenAI(ChatOpenAI):
             logger.info(f"✅ [DashScope初始化] 使用 kwargs 中传入的 API Key（来自数据库配置）")
 
         # 设置 DashScope OpenAI 兼容接口的默认配置
-        kwargs.setdefault("base_url", "https://dashscope.aliyuncs.com/compatible-mode/v1")
+        kwargs.setdefault("base_url", DASHSCOPE_BASE_URL)
         kwargs["api_key"] = api_key_from_kwargs  # 🔥 使用验证后的 API Key
         kwargs.setdefault("model", "qwen-turbo")
         kwargs.setdefault("temperature", 0.1)
@@ -101,13 +116,82 @@ class ChatDashScopeOpenAI(ChatOpenAI):
         api_base = getattr(self, 'base_url', None) or getattr(self, 'openai_api_base', None) or kwargs.get('base_url', 'unknown')
         logger.info(f"   API Base: {api_base}")
 
-    def _generate(self, *args, **kwargs):
-        """重写生成方法，添加 token 使用量追踪"""
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        """重写生成方法，添加响应缓存与 token 使用量追踪"""
+
+        # 🗄️ 响应缓存（TA_LLM_CACHE_ENABLED 开启时生效）
+        response_cache = get_llm_response_cache()
+        cache_key = None
+        node = get_current_node()
+
+        def _fingerprint(model_name: str) -> str:
+            return compute_fingerprint(
+                model=model_name,
+                temperature=self.temperature,
+                messages=messages,
+                tools=kwargs.get("tools"),
+                extra={"stop": stop, "tool_choice": kwargs.get("tool_choice")},
+            )
 
-        # 调用父类的生成方法
-        result = super()._generate(*args, **kwargs)
+        if response_cache is not None:
+            cache_key = _fingerprint(self.model_name)
+            cached = response_cache.get(cache_key, node=node)
+            if cached is not None:
+                logger.info(f"🗄️ [LLM缓存] 命中: node={node}, model={self.model_name}")
+                llm_run_metrics.record(cache_hit=True)
+                return self._chat_result_from_cache(cached)
+
+        # 📡 任务有 WebSocket 订阅时以流式调用，将 token 增量推送给客户端
+        token_sink = get_token_sink(get_current_task_id())
+        # 实际产生结果的模型（熔断时可能切换为备用模型）
+        served_by: List[str] = []
+        # 各次真实请求占用的并发槽位，结果确定后归还落后请求的槽位
+        slots = []
+
+        def _call(model_name: str, is_hedge: bool):
+            # 🚦 每次真实请求（含对冲/备用模型、重试）都经过 AIMD 并发控制
+            call_kwargs = dict(kwargs)
+            if model_name != self.model_name:
+                call_kwargs["model"] = model_name
+
+            def _attempt(slot):
+                slots.append(slot)
+                mark_attempt_started()
+                if token_sink is not None and not is_hedge:
+                    return self._generate_streaming(messages, stop, run_manager, token_sink, node, call_kwargs)
+                return super(ChatDashScopeOpenAI, self)._generate(
+                    messages, stop=stop, run_manager=None if is_hedge else run_manager, **call_kwargs
+                )
+
+            result = get_llm_concurrency_controller().call("dashscope", model_name, _attempt)
+            served_by.append(model_name)
+            return result
+
+        # 🪁 对冲请求 / ⛔ 熔断策略（未启用时直接调用）
+        start_time = time.time()
+        try:
+            result = get_llm_resilience_policy().execute("dashscope", self.model_name, _call)
+        except Exception:
+            # 失败的调用计入节点错误数（节点内部的重试会体现为多次调用）
+            llm_run_metrics.record(latency=time.time() - start_time, error=True)
+            raise
+        finally:
+            for slot in slots:
+                slot.abandon()
+        llm_latency = time.time() - start_time
+
+        if cache_key is not None:
+            # 按实际产生结果的模型写入缓存，备用模型的回答不会以主模型的指纹缓存
+            served_model = served_by[0] if served_by else self.model_name
+            if served_model != self.model_name:
+                cache_key = _fingerprint(served_model)
+            response_cache.set(
+                cache_key, self._chat_result_to_cache(result, served_model), node=node, model=served_model
+            )
 
         # 追踪 token 使用量
+        input_tokens = 0
+        output_tokens = 0
         try:
             # 从结果中提取 token 使用信息
             if hasattr(result, 'llm_output') and result.llm_output:
@@ -115,28 +199,93 @@ class ChatDashScopeOpenAI(ChatOpenAI):
 
                 input_tokens = token_usage.get('prompt_tokens', 0)
                 output_tokens = token_usage.get('completion_tokens', 0)
-
-                if input_tokens > 0 or output_tokens > 0:
-                    # 生成会话ID
-                    session_id = kwargs.get('session_id', f"dashscope_openai_{hash(str(args))%10000}")
-                    analysis_type = kwargs.get('analysis_type', 'stock_analysis')
-
-                    # 使用 TokenTracker 记录使用量
-                    token_tracker.track_usage(
-                        provider="dashscope",
-                        model_name=self.model_name,
-                        input_tokens=input_tokens,
-                        output_tokens=output_tokens,
-                        session_id=session_id,
-                        analysis_type=analysis_type
-                    )
+            elif result.generations:
+                # 流式调用的用量在消息的 usage_metadata 中
+                usage = getattr(result.generations[0].message, 'usage_metadata', None) or {}
+                input_tokens = usage.get('input_tokens', 0)
+                output_tokens = usage.get('output_tokens', 0)
+
+            if input_tokens > 0 or output_tokens > 0:
+                # 生成会话ID
+                session_id = kwargs.get('session_id', f"dashscope_openai_{hash(str(messages))%10000}")
+                analysis_type = kwargs.get('analysis_type', 'stock_analysis')
+
+                # 使用 TokenTracker 记录使用量
+                token_tracker.track_usage(
+                    provider="dashscope",
+                    model_name=self.model_name,
+                    input_tokens=input_tokens,
+                    output_tokens=output_tokens,
+                    session_id=session_id,
+                    analysis_type=analysis_type
+                )
 
         except Exception as track_error:
             # token 追踪失败不应该影响主要功能
             logger.error(f"⚠️ Token 追踪失败: {track_error}")
 
+        # 📊 按节点记录耗时与 token 数，提供方未返回用量时使用预检计数
+        llm_run_metrics.record(
+            latency=llm_latency,
+            prompt_tokens=input_tokens or count_prompt_tokens(messages),
+            completion_tokens=output_tokens,
+        )
+
         return result
 
+    def _generate_streaming(
+        self,
+        messages,
+        stop,
+        run_manager,
+        token_sink: TokenStreamCoalescer,
+        node: Optional[str],
+        call_kwargs: Dict[str, Any],
+    ) -> ChatResult:
+        """流式调用：边接收边推送 token 增量，结束后合并为完整结果"""
+        stream = self._stream(messages, stop=stop, run_manager=run_manager, stream_usage=True, **call_kwargs)
+
+        def _tap():
+            try:
+                for chunk in stream:
+                    content = chunk.message.content
+                    if isinstance(content, str) and content:
+                        token_sink.emit(node or "unknown", content)
+                    yield chunk
+            finally:
+                # 调用结束时强制推送：背压推迟的尾部增量不能等到下一次调用才发出
+                token_sink.flush(final=True)
+
+        return generate_from_stream(_tap())
+
+    def _chat_result_to_cache(self, result: ChatResult, model_name: Optional[str] = None) -> Dict[str, Any]:
+        """将 ChatResult 序列化为可缓存的字典"""
+        return {
+            "model": model_name or self.model_name,
+            "generations": [
+                {
+                    "message": message_to_dict(generation.message),
+                    "generation_info": generation.generation_info,
+                }
+                for generation in result.generations
+            ],
+            "llm_output": result.llm_output,
+        }
+
+    @staticmethod
+    def _chat_result_from_cache(cached: Dict[str, Any]) -> ChatResult:
+        """从缓存字典还原 ChatResult（缓存命中不计入 token 使用量）"""
+        generations = [
+            ChatGeneration(
+                message=messages_from_dict([item["message"]])[0],
+                generation_info=item.get("generation_info"),
+            )
+            for item in cached.get("generations", [])
+        ]
+        llm_output = dict(cached.get("llm_output") or {})
+        llm_output["cache_hit"] = True
+        return ChatResult(generations=generations, llm_output=llm_output)
+
 
 def create_dashscope_openai_llm(
     model: str = "qwen-plus",
@@ -168,5 +317,21 @@ class InternalLLM:
         else:
             jwt = get_jwt()
             cache['jwt'] = jwt
-        llm = create_dashscope_openai_llm()
-        return llm
+
+        # 🔌 从注册表获取共享实例，复用 httpx 连接池（keep-alive / TLS 会话）
+        model = "qwen-plus"
+        timeout = get_float("TA_LLM_TIMEOUT", "ta_llm_timeout", 180.0)
+        return get_llm_client_registry().get_or_create(
+            provider="dashscope",
+            model=model,
+            base_url=DASHSCOPE_BASE_URL,
+            api_key=None,
+            timeout=timeout,
+            factory=lambda http_client: create_dashscope_openai_llm(
+                model=model,
+                timeout=timeout,
+                http_client=http_client,
+                # 限流/5xx 由并发控制器在槽位外重试，AIMD 才能看到每一次 429
+                max_retries=0,
+            ),
+        )
@@ -0,0 +1,364 @@
+"""
+LLM 调用弹性策略：对冲请求 + 熔断器（可选启用）
+
+对冲请求（Hedging）：
+- 按 provider/model 记录最近的调用延迟，超过 P{percentile} 截止时间仍未返回时，
+  发出一个重复请求，取先完成者；各 provider/model 的对冲比例分别受预算限制，避免成本明显上升
+- 落后的请求无法中断，由调用方提前归还其并发槽位（见 concurrency.ConcurrencySlot.abandon）
+- 截止时间从主请求真正发出时计起（调用方获得并发槽位后调用 mark_attempt_started），
+  对冲线程池排队与 AIMD 排队等待不计入，避免并发高峰时误发对冲
+- 当前调用为非流式，"首个 token"以完整响应时间近似
+
+熔断器（Circuit Breaker）：
+- 按 provider/model 统计滑动窗口错误率，超过阈值进入 OPEN 状态；只统计服务端故障
+  （连接/超时、5xx、429），4xx 等请求本身的错误说明服务可用，不计入错误率
+- OPEN 期间快速失败，或切换到配置的备用模型；冷却后进入 HALF_OPEN 放行一个试探请求
+
+配置（环境变量）：
+- TA_LLM_HEDGING_ENABLED: 是否启用对冲（默认 false）
+- TA_LLM_HEDGING_PERCENTILE: 对冲截止分位数（默认 95）
+- TA_LLM_HEDGING_MIN_DELAY: 截止时间下限秒数（默认 5）
+- TA_LLM_HEDGING_BUDGET: 允许对冲的请求比例上限（默认 0.1）
+- TA_LLM_CIRCUIT_BREAKER_ENABLED: 是否启用熔断（默认 false）
+- TA_LLM_CIRCUIT_ERROR_THRESHOLD: 熔断错误率阈值（默认 0.5）
+- TA_LLM_CIRCUIT_COOLDOWN: OPEN 状态持续秒数（默认 30）
+- TA_LLM_FALLBACK_MODEL: 熔断时使用的备用模型（默认空，表示快速失败）
+"""
+
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from tradingagents.config.runtime_settings import get_bool, get_float, get_int
+from tradingagents.utils.logging_manager import get_logger
+
+logger = get_logger('agents')
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+# 当前主请求的"已发出"信号，对冲计时从该信号开始
+_attempt_started: "contextvars.ContextVar[Optional[threading.Event]]" = contextvars.ContextVar(
+    "llm_attempt_started", default=None
+)
+
+
+def mark_attempt_started():
+    """标记当前请求已真正发出（已获得并发槽位）；不在对冲执行中时无操作"""
+    event = _attempt_started.get()
+    if event is not None:
+        event.set()
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器处于 OPEN 状态且未配置备用模型"""
+
+
+def is_service_failure(error: BaseException) -> bool:
+    """是否为服务端故障（连接/超时、5xx、429），只有这类错误计入熔断错误率"""
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        response = getattr(error, "response", None)
+        status_code = getattr(response, "status_code", None)
+    if isinstance(status_code, int):
+        return status_code == 429 or status_code >= 500
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    # openai.APIConnectionError / APITimeoutError、httpx.TransportError 等（不依赖具体 SDK）
+    return any(
+        marker in cls.__name__
+        for cls in type(error).__mro__
+        for marker in ("Timeout", "Connection", "TransportError", "RateLimit")
+    )
+
+
+class LatencyTracker:
+    """滑动窗口延迟统计，用于计算对冲截止时间"""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float):
+        with self._lock:
+            self._samples.append(latency)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class CircuitBreaker:
+    """单个 provider/model 的熔断器"""
+
+    def __init__(self, name: str, error_threshold: float = 0.5, window: int = 20,
+                 min_requests: int = 10, cooldown: float = 30.0):
+        self.name = name
+        self.error_threshold = error_threshold
+        self.min_requests = min_requests
+        self.cooldown = cooldown
+        self.state = CIRCUIT_CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._half_open_in_flight = False
+        self._lock = threading.Lock()
+        self.stats = {"opened": 0, "rejected": 0}
+
+    def allow_request(self) -> bool:
+        """是否允许请求走主模型"""
+        with self._lock:
+            if self.state == CIRCUIT_CLOSED:
+                return True
+            if self.state == CIRCUIT_OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = CIRCUIT_HALF_OPEN
+                self._half_open_in_flight = False
+            if self.state == CIRCUIT_HALF_OPEN and not self._half_open_in_flight:
+                self._half_open_in_flight = True
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def record(self, success: bool):
+        with self._lock:
+            if self.state == CIRCUIT_HALF_OPEN:
+                self._half_open_in_flight = False
+                if success:
+                    self.state = CIRCUIT_CLOSED
+                    self._outcomes.clear()
+                    logger.info(f"✅ [LLM熔断] {self.name} 试探成功，熔断器关闭")
+                else:
+                    self._open()
+                return
+
+            self._outcomes.append(success)
+            if len(self._outcomes) >= self.min_requests:
+                error_rate = self._outcomes.count(False) / len(self._outcomes)
+                if error_rate >= self.error_threshold:
+                    self._open()
+
+    def _open(self):
+        self.state = CIRCUIT_OPEN
+        self._opened_at = time.monotonic()
+        self.stats["opened"] += 1
+        logger.warning(f"⛔ [LLM熔断] {self.name} 错误率过高，熔断 {self.cooldown:.0f}秒")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            outcomes = list(self._outcomes)
+            return {
+                "state": self.state,
+                "error_rate": round(outcomes.count(False) / len(outcomes), 4) if outcomes else 0.0,
+                **self.stats,
+            }
+
+
+class LLMResiliencePolicy:
+    """对冲请求与熔断器组合策略"""
+
+    def __init__(
+        self,
+        hedging_enabled: bool = False,
+        hedge_percentile: float = 95.0,
+        hedge_min_delay: float = 5.0,
+        hedge_budget: float = 0.1,
+        hedge_min_samples: int = 20,
+        breaker_enabled: bool = False,
+        breaker_error_threshold: float = 0.5,
+        breaker_cooldown: float = 30.0,
+        fallback_model: Optional[str] = None,
+        executor_workers: int = 64,
+    ):
+        self.hedging_enabled = hedging_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_budget = hedge_budget
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker_enabled = breaker_enabled
+        self.breaker_error_threshold = breaker_error_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.fallback_model = fallback_model
+        self.executor_workers = executor_workers
+
+        self._lock = threading.Lock()
+        self._latency: Dict[Tuple[str, str], LatencyTracker] = {}
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self._hedge_counts: Dict[Tuple[str, str], list] = {}  # [调用数, 对冲数]
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "fallbacks": 0, "fast_failures": 0}
+
+    def _get_latency(self, provider: str, model: str) -> LatencyTracker:
+        key = (provider, model)
+        with self._lock:
+            if key not in self._latency:
+                self._latency[key] = LatencyTracker()
+            return self._latency[key]
+
+    def _get_breaker(self, provider: str, model: str) -> CircuitBreaker:
+        key = (provider, model)
+        with self._lock:
+            if key not in self._breakers:
+                self._breakers[key] = CircuitBreaker(
+                    f"{provider}/{model}",
+                    error_threshold=self.breaker_error_threshold,
+                    cooldown=self.breaker_cooldown,
+                )
+            return self._breakers[key]
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.executor_workers, thread_name_prefix="llm-hedge")
+            return self._executor
+
+    def hedge_delay(self, provider: str, model: str) -> Optional[float]:
+        """当前对冲截止时间；样本不足或该模型的对冲预算用尽时返回 None"""
+        tracker = self._get_latency(provider, model)
+        if len(tracker) < self.hedge_min_samples:
+            return None
+        with self._lock:
+            calls, hedged = self._hedge_counts.get((provider, model), (0, 0))
+            if calls and hedged / calls >= self.hedge_budget:
+                return None
+        deadline = tracker.percentile(self.hedge_percentile)
+        return max(self.hedge_min_delay, deadline) if deadline is not None else None
+
+    def execute(self, provider: str, model: str, call: Callable[[str, bool], Any]) -> Any:
+        """按策略执行 LLM 调用
+
+        Args:
+            provider: 提供商
+            model: 主模型名称
+            call: call(model_name, is_hedge) 执行一次真实调用；请求发出前需调用 mark_attempt_started()，
+                否则对冲计时不会开始（不发出对冲）
+        """
+        with self._lock:
+            self.stats["calls"] += 1
+
+        target_model = model
+        breaker = self._get_breaker(provider, model) if self.breaker_enabled else None
+        if breaker is not None and not breaker.allow_request():
+            if not self.fallback_model or self.fallback_model == model:
+                with self._lock:
+                    self.stats["fast_failures"] += 1
+                raise CircuitOpenError(f"LLM 熔断器已打开: {provider}/{model}")
+            with self._lock:
+                self.stats["fallbacks"] += 1
+            logger.warning(f"🔀 [LLM熔断] {provider}/{model} 熔断中，切换备用模型 {self.fallback_model}")
+            target_model = self.fallback_model
+            breaker = None
+
+        with self._lock:
+            self._hedge_counts.setdefault((provider, target_model), [0, 0])[0] += 1
+
+        start = time.monotonic()
+        try:
+            result = self._call_with_hedge(provider, target_model, call)
+        except BaseException as e:
+            if breaker is not None:
+                # 请求本身的错误（4xx、参数校验等）说明服务已正常响应，按可用处理
+                breaker.record(not is_service_failure(e))
+            raise
+        self._get_latency(provider, target_model).record(time.monotonic() - start)
+        if breaker is not None:
+            breaker.record(True)
+        return result
+
+    def _call_with_hedge(self, provider: str, model: str, call: Callable[[str, bool], Any]) -> Any:
+        delay = self.hedge_delay(provider, model) if self.hedging_enabled else None
+        if delay is None:
+            return call(model, False)
+
+        executor = self._get_executor()
+        started = threading.Event()
+
+        def run_primary():
+            _attempt_started.set(started)
+            return call(model, False)
+
+        # 复制上下文，保证节点/任务等 ContextVar 在对冲线程中可见
+        primary = executor.submit(contextvars.copy_context().run, run_primary)
+        primary.add_done_callback(lambda future: started.set())
+        # 对冲计时从主请求发出时开始，线程池与并发槽位的排队时间不计入
+        started.wait()
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        with self._lock:
+            self.stats["hedged"] += 1
+            self._hedge_counts.setdefault((provider, model), [0, 0])[1] += 1
+        logger.info(f"🪁 [LLM对冲] {provider}/{model} 超过 {delay:.1f}秒未返回，发出对冲请求")
+        hedge = executor.submit(contextvars.copy_context().run, call, model, True)
+
+        pending = {primary, hedge}
+        last_error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    if future is hedge:
+                        with self._lock:
+                            self.stats["hedge_wins"] += 1
+                    # 落后的请求无法中断，其结果直接丢弃（并发槽位由调用方提前归还）
+                    return future.result()
+                last_error = error
+        raise last_error
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            breakers = list(self._breakers.values())
+            latency = dict(self._latency)
+        stats.update({
+            "hedging_enabled": self.hedging_enabled,
+            "breaker_enabled": self.breaker_enabled,
+            "fallback_model": self.fallback_model,
+            "breakers": {b.name: b.snapshot() for b in breakers},
+            "hedge_deadlines": {
+                f"{p}/{m}": tracker.percentile(self.hedge_percentile) for (p, m), tracker in latency.items()
+            },
+        })
+        return stats
+
+
+_policy: Optional[LLMResiliencePolicy] = None
+_policy_lock = threading.Lock()
+
+
+def get_llm_resilience_policy() -> LLMResiliencePolicy:
+    """获取全局 LLM 弹性策略"""
+    global _policy
+    if _policy is None:
+        with _policy_lock:
+            if _policy is None:
+                _policy = LLMResiliencePolicy(
+                    hedging_enabled=get_bool("TA_LLM_HEDGING_ENABLED", "ta_llm_hedging_enabled", False),
+                    hedge_percentile=get_float("TA_LLM_HEDGING_PERCENTILE", "ta_llm_hedging_percentile", 95.0),
+                    hedge_min_delay=get_float("TA_LLM_HEDGING_MIN_DELAY", "ta_llm_hedging_min_delay", 5.0),
+                    hedge_budget=get_float("TA_LLM_HEDGING_BUDGET", "ta_llm_hedging_budget", 0.1),
+                    hedge_min_samples=get_int("TA_LLM_HEDGING_MIN_SAMPLES", "ta_llm_hedging_min_samples", 20),
+                    breaker_enabled=get_bool(
+                        "TA_LLM_CIRCUIT_BREAKER_ENABLED", "ta_llm_circuit_breaker_enabled", False
+                    ),
+                    breaker_error_threshold=get_float(
+                        "TA_LLM_CIRCUIT_ERROR_THRESHOLD", "ta_llm_circuit_error_threshold", 0.5
+                    ),
+                    breaker_cooldown=get_float("TA_LLM_CIRCUIT_COOLDOWN", "ta_llm_circuit_cooldown", 30.0),
+                    fallback_model=os.getenv("TA_LLM_FALLBACK_MODEL") or None,
+                    # 主请求与对冲请求各占一个线程，按并发上限的两倍配置，线程池不成为瓶颈
+                    executor_workers=2 * get_int("TA_LLM_CONCURRENCY_MAX", "ta_llm_concurrency_max", 32),
+                )
+    return _policy
@@ -0,0 +1,386 @@
+"""
+LLM 响应缓存（可选启用）
+
+对同一股票/日期的重复分析（失败节点重试、用户重复提交、批量任务重叠）复用历史 LLM 响应：
+- 缓存键：xxhash(模型 + 温度 + 工具 schema + 归一化消息列表)
+- 本地层：SQLite 文件存储，响应体使用 zstd 压缩（未安装时回退 zlib）
+- 远端层：可选 Redis，多进程/多机共享
+- TTL：按图节点配置，TTL<=0 的节点不缓存
+- 容量：本地层超过行数上限时按最近访问时间淘汰（LRU）；打开时及每写入一批后清理过期条目
+- 指标：按节点统计命中/未命中次数
+
+配置（环境变量）：
+- TA_LLM_CACHE_ENABLED: 是否启用（默认 false）
+- TA_LLM_CACHE_DIR: SQLite 文件目录（默认 data_cache_dir/llm_cache）
+- TA_LLM_CACHE_DEFAULT_TTL: 默认 TTL 秒数（默认 86400）
+- TA_LLM_CACHE_MAX_ROWS: 本地层最大条目数（默认 50000，<=0 表示不限制）
+- TA_LLM_CACHE_NODE_TTL: 节点 TTL 覆盖，JSON 格式，例如 {"News Analyst": 1800}
+- TA_LLM_CACHE_REDIS_ENABLED: 是否启用 Redis 层（默认 false）
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+from tradingagents.config.runtime_settings import get_bool, get_int
+from tradingagents.default_config import DEFAULT_CONFIG
+from tradingagents.utils.logging_manager import get_logger
+
+logger = get_logger('agents')
+
+try:
+    import xxhash
+    _HAS_XXHASH = True
+except ImportError:  # pragma: no cover - 依赖缺失时回退
+    import hashlib
+    _HAS_XXHASH = False
+
+try:
+    import zstandard
+    _HAS_ZSTD = True
+except ImportError:  # pragma: no cover - 依赖缺失时回退
+    _HAS_ZSTD = False
+
+
+# 压缩格式标记（写在数据首字节，便于切换压缩库后仍可读取旧数据）
+_CODEC_ZSTD = b"Z"
+_CODEC_ZLIB = b"z"
+
+_REDIS_KEY_PREFIX = "ta:llm_cache:"
+
+# 每写入多少条检查一次本地层容量（统计行数需要全表扫描，不逐条检查）
+_TRIM_EVERY_WRITES = 100
+
+# 节点默认 TTL（秒）：新闻/情绪类数据时效性强，决策类节点依赖上游报告，可保留更久
+DEFAULT_NODE_TTL: Dict[str, int] = {
+    "Market Analyst": 6 * 3600,
+    "Fundamentals Analyst": 24 * 3600,
+    "News Analyst": 1800,
+    "Social Analyst": 1800,
+    "Bull Researcher": 24 * 3600,
+    "Bear Researcher": 24 * 3600,
+    "Research Manager": 24 * 3600,
+    "Trader": 24 * 3600,
+    "Risky Analyst": 24 * 3600,
+    "Safe Analyst": 24 * 3600,
+    "Neutral Analyst": 24 * 3600,
+    "Risk Judge": 24 * 3600,
+}
+
+
+def _normalize_message(message: Any) -> Dict[str, Any]:
+    """将消息归一化为稳定的字典（忽略 id 等每次调用都会变化的字段）"""
+    if isinstance(message, dict):
+        return {k: message[k] for k in sorted(message) if k != "id"}
+
+    normalized = {
+        "type": getattr(message, "type", message.__class__.__name__),
+        "content": getattr(message, "content", str(message)),
+    }
+    name = getattr(message, "name", None)
+    if name:
+        normalized["name"] = name
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        normalized["tool_calls"] = [
+            {"name": tc.get("name"), "args": tc.get("args")} for tc in tool_calls
+        ]
+    tool_call_id = getattr(message, "tool_call_id", None)
+    if tool_call_id:
+        normalized["tool_call_id"] = tool_call_id
+    return normalized
+
+
+def compute_fingerprint(
+    model: str,
+    temperature: Optional[float],
+    messages: List[Any],
+    tools: Any = None,
+    extra: Optional[Dict[str, Any]] = None,
+) -> str:
+    """计算 LLM 请求指纹
+
+    Args:
+        model: 模型名称
+        temperature: 采样温度
+        messages: 消息列表（BaseMessage 或 dict）
+        tools: 绑定的工具 schema
+        extra: 其他影响输出的参数（stop、tool_choice 等）
+    """
+    payload = {
+        "model": model,
+        "temperature": temperature,
+        "tools": tools,
+        "extra": extra or {},
+        "messages": [_normalize_message(m) for m in messages],
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    if _HAS_XXHASH:
+        return xxhash.xxh3_128_hexdigest(raw)
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _compress(data: bytes) -> bytes:
+    if _HAS_ZSTD:
+        return _CODEC_ZSTD + zstandard.ZstdCompressor(level=3).compress(data)
+    return _CODEC_ZLIB + zlib.compress(data, 6)
+
+
+def _decompress(blob: bytes) -> bytes:
+    codec, body = blob[:1], blob[1:]
+    if codec == _CODEC_ZSTD:
+        if not _HAS_ZSTD:
+            raise ValueError("缓存数据使用 zstd 压缩，但当前环境未安装 zstandard")
+        return zstandard.ZstdDecompressor().decompress(body)
+    return zlib.decompress(body)
+
+
+class LLMResponseCache:
+    """LLM 响应两级缓存（SQLite + 可选 Redis）"""
+
+    def __init__(
+        self,
+        cache_dir: str,
+        default_ttl: int = 86400,
+        node_ttl: Optional[Dict[str, int]] = None,
+        redis_client=None,
+        max_rows: int = 50000,
+    ):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.db_path = os.path.join(cache_dir, "llm_responses.sqlite3")
+        self.default_ttl = default_ttl
+        self.node_ttl = dict(DEFAULT_NODE_TTL)
+        if node_ttl:
+            self.node_ttl.update(node_ttl)
+        self.redis_client = redis_client
+        self.max_rows = max_rows
+        self._writes_since_trim = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                node TEXT,
+                model TEXT,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                accessed_at REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(llm_cache)")}
+        if "accessed_at" not in columns:
+            # 旧版缓存文件没有访问时间列，按写入时间初始化
+            self._conn.execute("ALTER TABLE llm_cache ADD COLUMN accessed_at REAL NOT NULL DEFAULT 0")
+            self._conn.execute("UPDATE llm_cache SET accessed_at = created_at")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_expires ON llm_cache(expires_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache(accessed_at)")
+        self._conn.commit()
+        removed = self.trim()
+
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+        logger.info(
+            f"🗄️ [LLM缓存] 初始化完成: {self.db_path}, "
+            f"压缩={'zstd' if _HAS_ZSTD else 'zlib'}, Redis层={'启用' if redis_client else '禁用'}, "
+            f"上限={max_rows if max_rows > 0 else '不限'}条, 清理={removed}条"
+        )
+
+    def ttl_for(self, node: Optional[str]) -> int:
+        """获取节点对应的 TTL（秒），<=0 表示不缓存"""
+        if node and node in self.node_ttl:
+            return int(self.node_ttl[node])
+        return self.default_ttl
+
+    def _record(self, node: Optional[str], field: str):
+        with self._stats_lock:
+            node_stats = self._stats.setdefault(node or "unknown", {
+                "hits": 0, "misses": 0, "sqlite_hits": 0, "redis_hits": 0, "stores": 0, "errors": 0,
+            })
+            node_stats[field] += 1
+
+    def get(self, key: str, node: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """读取缓存，未命中返回 None"""
+        if self.ttl_for(node) <= 0:
+            return None
+
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[1] > now:
+                    self._conn.execute(
+                        "UPDATE llm_cache SET hits = hits + 1, accessed_at = ? WHERE key = ?", (now, key)
+                    )
+                    self._conn.commit()
+            if row and row[1] > now:
+                self._record(node, "hits")
+                self._record(node, "sqlite_hits")
+                return json.loads(_decompress(row[0]))
+
+            if self.redis_client is not None:
+                blob = self.redis_client.get(_REDIS_KEY_PREFIX + key)
+                if blob:
+                    value = json.loads(_decompress(blob))
+                    ttl = self.redis_client.ttl(_REDIS_KEY_PREFIX + key)
+                    self._write_local(key, blob, node, value.get("model"), ttl if ttl and ttl > 0 else self.ttl_for(node))
+                    self._record(node, "hits")
+                    self._record(node, "redis_hits")
+                    return value
+        except Exception as e:
+            self._record(node, "errors")
+            logger.warning(f"⚠️ [LLM缓存] 读取失败: {e}")
+            return None
+
+        self._record(node, "misses")
+        return None
+
+    def set(self, key: str, value: Dict[str, Any], node: Optional[str] = None, model: Optional[str] = None):
+        """写入缓存（本地 + 可选 Redis）"""
+        ttl = self.ttl_for(node)
+        if ttl <= 0:
+            return
+        try:
+            blob = _compress(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+            self._write_local(key, blob, node, model, ttl)
+            if self.redis_client is not None:
+                self.redis_client.setex(_REDIS_KEY_PREFIX + key, ttl, blob)
+            self._record(node, "stores")
+        except Exception as e:
+            self._record(node, "errors")
+            logger.warning(f"⚠️ [LLM缓存] 写入失败: {e}")
+
+    def _write_local(self, key: str, blob: bytes, node: Optional[str], model: Optional[str], ttl: int):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, node, model, created_at, expires_at, hits, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0, ?)",
+                (key, blob, node, model, now, now + ttl, now),
+            )
+            self._conn.commit()
+            self._writes_since_trim += 1
+            due = self._writes_since_trim >= _TRIM_EVERY_WRITES
+        if due:
+            self.trim()
+
+    def purge_expired(self) -> int:
+        """清理本地已过期条目，返回删除数量"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def trim(self) -> int:
+        """清理过期条目，超过行数上限时淘汰最久未访问的条目，返回删除数量
+
+        写入后每 _TRIM_EVERY_WRITES 条执行一次，条目数最多超出上限这么多。
+        """
+        removed = self.purge_expired()
+        with self._lock:
+            self._writes_since_trim = 0
+            if self.max_rows <= 0:
+                return removed
+            excess = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_rows
+            if excess > 0:
+                cursor = self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)",
+                    (excess,),
+                )
+                self._conn.commit()
+                removed += cursor.rowcount
+        if removed:
+            logger.debug(f"🧹 [LLM缓存] 已清理 {removed} 条本地缓存")
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中统计（按节点 + 汇总）"""
+        with self._stats_lock:
+            by_node = {node: dict(s) for node, s in self._stats.items()}
+        hits = sum(s["hits"] for s in by_node.values())
+        misses = sum(s["misses"] for s in by_node.values())
+        lookups = hits + misses
+        with self._lock:
+            rows = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        return {
+            "enabled": True,
+            "rows": rows,
+            "max_rows": self.max_rows,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "by_node": by_node,
+        }
+
+
+_cache_instance: Optional[LLMResponseCache] = None
+_cache_checked = False
+_cache_init_lock = threading.Lock()
+
+
+def _load_node_ttl_overrides() -> Dict[str, int]:
+    raw = os.getenv("TA_LLM_CACHE_NODE_TTL")
+    if not raw:
+        return {}
+    try:
+        return {str(k): int(v) for k, v in json.loads(raw).items()}
+    except Exception as e:
+        logger.warning(f"⚠️ [LLM缓存] TA_LLM_CACHE_NODE_TTL 解析失败，忽略: {e}")
+        return {}
+
+
+def get_llm_response_cache() -> Optional[LLMResponseCache]:
+    """获取全局 LLM 响应缓存；未启用或初始化失败时返回 None"""
+    global _cache_instance, _cache_checked
+    if _cache_checked:
+        return _cache_instance
+
+    with _cache_init_lock:
+        if _cache_checked:
+            return _cache_instance
+        try:
+            if get_bool("TA_LLM_CACHE_ENABLED", "ta_llm_cache_enabled", False):
+                redis_client = None
+                if get_bool("TA_LLM_CACHE_REDIS_ENABLED", "ta_llm_cache_redis_enabled", False):
+                    from tradingagents.config.database_manager import get_redis_client
+                    redis_client = get_redis_client()
+                    if redis_client is None:
+                        logger.warning("⚠️ [LLM缓存] Redis 不可用，仅使用本地缓存")
+
+                cache_dir = os.getenv("TA_LLM_CACHE_DIR") or os.path.join(
+                    DEFAULT_CONFIG["data_cache_dir"], "llm_cache"
+                )
+                _cache_instance = LLMResponseCache(
+                    cache_dir=cache_dir,
+                    default_ttl=get_int("TA_LLM_CACHE_DEFAULT_TTL", "ta_llm_cache_default_ttl", 86400),
+                    node_ttl=_load_node_ttl_overrides(),
+                    redis_client=redis_client,
+                    max_rows=get_int("TA_LLM_CACHE_MAX_ROWS", "ta_llm_cache_max_rows", 50000),
+                )
+        except Exception as e:
+            logger.error(f"❌ [LLM缓存] 初始化失败，缓存将被禁用: {e}")
+            _cache_instance = None
+        _cache_checked = True
+    return _cache_instance
+
+
+def get_llm_cache_stats() -> Dict[str, Any]:
+    """获取 LLM 缓存统计，未启用时返回 {"enabled": False}"""
+    cache = get_llm_response_cache()
+    if cache is None:
+        return {"enabled": False}
+    return cache.get_stats()
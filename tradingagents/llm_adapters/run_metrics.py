@@ -0,0 +1,92 @@
+"""
+单次分析运行的 LLM 调用指标
+
+按 (任务ID, 节点) 汇总 LLM 调用次数、耗时、输入/输出 token、缓存命中与失败重试，
+以及发送前预估的 prompt token 数与预算裁剪次数；由 LLM 适配器与 token 预算预检写入，TradingAgentsGraph.propagate 结束时取出并合并进性能数据。
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from .call_context import get_current_node, get_current_task_id
+
+_GLOBAL_TASK = "_global"
+
+
+def _empty_node_metrics() -> Dict[str, float]:
+    return {
+        "llm_calls": 0,
+        "llm_time": 0.0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cache_hits": 0,
+        "errors": 0,
+        "estimated_prompt_tokens": 0,
+        "budget_trims": 0,
+    }
+
+
+class LLMRunMetrics:
+    """按任务记录各节点的 LLM 调用指标（只保留最近 max_tasks 个任务）"""
+
+    def __init__(self, max_tasks: int = 200):
+        self._lock = threading.Lock()
+        self._tasks: "OrderedDict[str, Dict[str, Dict[str, float]]]" = OrderedDict()
+        self._max_tasks = max_tasks
+
+    def record(
+        self,
+        latency: float = 0.0,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cache_hit: bool = False,
+        error: bool = False,
+        node: Optional[str] = None,
+        task_id: Optional[str] = None,
+    ):
+        """记录一次 LLM 调用，node/task_id 缺省时取调用上下文"""
+        node = node or get_current_node() or "unknown"
+        task_key = task_id or get_current_task_id() or _GLOBAL_TASK
+        with self._lock:
+            task_metrics = self._tasks.setdefault(task_key, {})
+            self._tasks.move_to_end(task_key)
+            metrics = task_metrics.setdefault(node, _empty_node_metrics())
+            metrics["llm_calls"] += 1
+            metrics["llm_time"] += latency
+            metrics["prompt_tokens"] += int(prompt_tokens or 0)
+            metrics["completion_tokens"] += int(completion_tokens or 0)
+            metrics["cache_hits"] += 1 if cache_hit else 0
+            metrics["errors"] += 1 if error else 0
+            while len(self._tasks) > self._max_tasks:
+                self._tasks.popitem(last=False)
+
+    def record_prompt_estimate(
+        self,
+        prompt_tokens: int,
+        trimmed: bool = False,
+        node: Optional[str] = None,
+        task_id: Optional[str] = None,
+    ):
+        """记录一次发送前的 prompt token 预估（fit_prompt_to_budget 写入），node/task_id 缺省时取调用上下文"""
+        node = node or get_current_node() or "unknown"
+        task_key = task_id or get_current_task_id() or _GLOBAL_TASK
+        with self._lock:
+            task_metrics = self._tasks.setdefault(task_key, {})
+            self._tasks.move_to_end(task_key)
+            metrics = task_metrics.setdefault(node, _empty_node_metrics())
+            metrics["estimated_prompt_tokens"] += int(prompt_tokens or 0)
+            metrics["budget_trims"] += 1 if trimmed else 0
+            while len(self._tasks) > self._max_tasks:
+                self._tasks.popitem(last=False)
+
+    def get(self, task_id: Optional[str]) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {k: dict(v) for k, v in self._tasks.get(task_id or _GLOBAL_TASK, {}).items()}
+
+    def pop(self, task_id: Optional[str]) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return self._tasks.pop(task_id or _GLOBAL_TASK, {})
+
+
+llm_run_metrics = LLMRunMetrics()
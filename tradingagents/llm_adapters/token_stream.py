@@ -0,0 +1,147 @@
+"""
+LLM 增量输出推送
+
+运行中的节点以流式方式调用 LLM，将 token 增量按 (任务ID, 节点) 推送给订阅方（如 WebSocket），
+让用户在节点完成前即可看到输出。
+
+- 合并：增量先写入缓冲区，距上次推送超过 flush_interval（默认 100ms）才推送一次
+- 背压：上一批消息尚未发送完成时不再投递，继续合并到缓冲区；
+  缓冲区超过 max_buffer_chars 时丢弃最旧的内容，下一条消息带 dropped_chars 标明缺口，
+  订阅方据此提示省略（节点完成后完整报告仍会正常下发）
+- 未注册订阅方或订阅方不活跃时，LLM 调用保持非流式，不增加任何开销
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from tradingagents.utils.logging_manager import get_logger
+
+logger = get_logger('agents')
+
+Publisher = Callable[[List[Dict]], Optional[Future]]
+
+
+class TokenStreamCoalescer:
+    """单个任务的 token 增量合并器"""
+
+    def __init__(
+        self,
+        task_id: str,
+        publish: Publisher,
+        is_active: Optional[Callable[[], bool]] = None,
+        flush_interval: float = 0.1,
+        max_buffer_chars: int = 8000,
+    ):
+        self.task_id = task_id
+        self._publish = publish
+        self._is_active = is_active
+        self.flush_interval = flush_interval
+        self.max_buffer_chars = max_buffer_chars
+
+        self._lock = threading.Lock()
+        self._buffers: Dict[str, List[str]] = {}
+        self._buffered_chars: Dict[str, int] = {}
+        self._seq: Dict[str, int] = {}
+        self._dropped: Dict[str, int] = {}
+        self._last_flush = 0.0
+        self._inflight: Optional[Future] = None
+        self.stats = {"deltas": 0, "messages": 0, "deferred_flushes": 0, "dropped_chars": 0}
+
+    def is_active(self) -> bool:
+        """是否有订阅方在接收（无订阅时 LLM 走非流式调用）"""
+        try:
+            return self._is_active() if self._is_active else True
+        except Exception:
+            return False
+
+    def emit(self, node: str, delta: str):
+        """写入一段 token 增量，达到推送间隔时合并推送"""
+        if not delta:
+            return
+        with self._lock:
+            self.stats["deltas"] += 1
+            self._buffers.setdefault(node, []).append(delta)
+            self._buffered_chars[node] = self._buffered_chars.get(node, 0) + len(delta)
+            self._trim_locked(node)
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+
+    def flush(self, final: bool = False):
+        """推送缓冲区中的全部增量（LLM 调用结束时调用）"""
+        with self._lock:
+            self._flush_locked(force=final)
+
+    def _trim_locked(self, node: str):
+        parts = self._buffers[node]
+        while self._buffered_chars[node] > self.max_buffer_chars and len(parts) > 1:
+            dropped = parts.pop(0)
+            self._buffered_chars[node] -= len(dropped)
+            self._dropped[node] = self._dropped.get(node, 0) + len(dropped)
+            self.stats["dropped_chars"] += len(dropped)
+
+    def _flush_locked(self, force: bool = False):
+        if not self._buffers:
+            return
+        if self._inflight is not None and not self._inflight.done() and not force:
+            # 背压：上一批尚未发送完成，继续合并
+            self.stats["deferred_flushes"] += 1
+            return
+
+        timestamp = datetime.now().isoformat()
+        messages = []
+        for node, parts in self._buffers.items():
+            seq = self._seq.get(node, 0) + 1
+            self._seq[node] = seq
+            message = {
+                "type": "llm_token",
+                "task_id": self.task_id,
+                "node": node,
+                "delta": "".join(parts),
+                "seq": seq,
+                "timestamp": timestamp,
+            }
+            dropped = self._dropped.pop(node, 0)
+            if dropped:
+                # 本条增量之前有内容因背压被丢弃，订阅方不应直接拼接
+                message["dropped_chars"] = dropped
+            messages.append(message)
+        self._buffers.clear()
+        self._buffered_chars.clear()
+        self._last_flush = time.monotonic()
+
+        try:
+            self._inflight = self._publish(messages)
+            self.stats["messages"] += len(messages)
+        except Exception as e:
+            logger.debug(f"⚠️ [Token推送] 推送失败: {self.task_id} - {e}")
+
+
+_sinks: Dict[str, TokenStreamCoalescer] = {}
+_sinks_lock = threading.Lock()
+
+
+def register_token_sink(task_id: str, sink: TokenStreamCoalescer):
+    """为任务注册 token 增量订阅方"""
+    with _sinks_lock:
+        _sinks[task_id] = sink
+
+
+def unregister_token_sink(task_id: str) -> Optional[TokenStreamCoalescer]:
+    with _sinks_lock:
+        sink = _sinks.pop(task_id, None)
+    if sink is not None:
+        sink.flush(final=True)
+    return sink
+
+
+def get_token_sink(task_id: Optional[str]) -> Optional[TokenStreamCoalescer]:
+    """获取任务的活跃订阅方；未注册或无人订阅时返回 None"""
+    if not task_id:
+        return None
+    sink = _sinks.get(task_id)
+    if sink is None or not sink.is_active():
+        return None
+    return sink
@@ -0,0 +1,40 @@
+import os
+
+import pytest
+from filelock import FileLock
+
+from tradingagents.agents.utils import chromadb_config
+from tradingagents.agents.utils.chromadb_config import ChromaDBDirectoryInUse
+from tradingagents.agents.utils.memory import ChromaDBManager
+
+
+@pytest.fixture
+def fresh_manager(monkeypatch):
+    monkeypatch.setattr(ChromaDBManager, "_instance", None)
+    monkeypatch.setattr(ChromaDBManager, "_client", None)
+    monkeypatch.setattr(ChromaDBManager, "_collections", {})
+    monkeypatch.setattr(chromadb_config, "_persist_owner_lock", None)
+
+
+def test_persist_dir_in_use_fails_instead_of_falling_back_to_memory(tmp_path, monkeypatch, fresh_manager):
+    monkeypatch.setenv("TA_CHROMA_MODE", "persistent")
+    monkeypatch.setenv("TA_CHROMA_PERSIST_DIR", str(tmp_path))
+    other_process = FileLock(os.path.join(tmp_path, ".owner.lock"))
+    other_process.acquire()
+    try:
+        manager = ChromaDBManager()
+        with pytest.raises(ChromaDBDirectoryInUse, match="TA_CHROMA_MODE=http"):
+            manager.get_or_create_collection("bull_memory")
+        assert manager.mode == "persistent"
+        assert not manager.is_client_open()
+    finally:
+        other_process.release()
+
+
+def test_write_lock_records_wait_stats(monkeypatch, fresh_manager):
+    monkeypatch.setenv("TA_CHROMA_MODE", "memory")
+    manager = ChromaDBManager()
+    with manager.write_lock("bull_memory"):
+        pass
+
+    assert manager.get_lock_stats()["write:bull_memory"]["count"] == 1
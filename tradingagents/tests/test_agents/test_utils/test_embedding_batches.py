@@ -0,0 +1,76 @@
+import pytest
+
+from tradingagents.agents.utils import memory
+from tradingagents.agents.utils.memory import FinancialSituationMemory
+
+
+class _FakeCollection:
+    def __init__(self):
+        self.upserts = []
+
+    def get(self, ids, include):
+        return {"ids": [], "metadatas": []}
+
+    def upsert(self, **kwargs):
+        self.upserts.append(kwargs)
+
+
+class _FakeManager:
+    def write_lock(self, name):
+        from contextlib import nullcontext
+        return nullcontext()
+
+
+@pytest.fixture
+def openai_memory(monkeypatch):
+    monkeypatch.setattr(memory, "get_embedding_cache", lambda: None)
+    monkeypatch.setattr(memory.time, "sleep", lambda seconds: None)
+    mem = object.__new__(FinancialSituationMemory)
+    mem.name = "bull_memory"
+    mem.llm_provider = "openai"
+    mem.client = object()
+    mem.embedding = "text-embedding-3-small"
+    mem.embedding_backend = "api"
+    mem.enable_embedding_length_check = False
+    mem.max_embedding_length = 50000
+    mem.chroma_manager = _FakeManager()
+    mem._situation_collection = _FakeCollection()
+    return mem
+
+
+def test_batch_limits_read_from_runtime_settings(openai_memory, monkeypatch):
+    monkeypatch.setenv("TA_EMBEDDING_OPENAI_BATCH_SIZE", "2")
+    monkeypatch.setenv("TA_EMBEDDING_OPENAI_BATCH_CHARS", "7")
+
+    batches = openai_memory._split_embedding_batches(["aaa", "bbb", "c", "dddddd"])
+
+    assert batches == [["aaa", "bbb"], ["c", "dddddd"]]
+
+
+def test_failed_batch_is_skipped_instead_of_written_as_zero_vectors(openai_memory, monkeypatch):
+    monkeypatch.setenv("TA_EMBEDDING_OPENAI_BATCH_SIZE", "1")
+    calls = []
+
+    def request(batch):
+        calls.append(batch)
+        if batch == ["bad"]:
+            raise RuntimeError("503 service unavailable")
+        return [[0.5, 0.5]]
+
+    monkeypatch.setattr(openai_memory, "_request_embedding_batch", request)
+
+    openai_memory.add_situations([("good", "buy"), ("bad", "sell")])
+
+    [upsert] = openai_memory._situation_collection.upserts
+    assert upsert["documents"] == ["good"]
+    assert upsert["embeddings"] == [[0.5, 0.5]]
+    assert calls.count(["bad"]) == 3  # 临时错误按 TA_EMBEDDING_BATCH_MAX_RETRIES 重试
+
+
+def test_missing_client_is_not_retried(openai_memory, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(memory.time, "sleep", sleeps.append)
+    openai_memory.client = None
+
+    assert openai_memory._embed_batch_with_retry(["a", "b"]) == [None, None]
+    assert sleeps == []
@@ -0,0 +1,49 @@
+import threading
+import time
+
+from tradingagents.agents.utils import embedding_cache
+from tradingagents.agents.utils.embedding_cache import EmbeddingCache
+
+
+def test_concurrent_requests_compute_once_and_count_waiters():
+    cache = EmbeddingCache(max_entries=8)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute(text):
+        calls.append(text)
+        started.set()
+        release.wait(5)
+        return [1.0, 2.0]
+
+    owner = threading.Thread(target=cache.get_or_compute, args=("m", "text", compute))
+    owner.start()
+    started.wait(5)
+    waiter = threading.Thread(target=cache.get_or_compute, args=("m", "text", compute))
+    waiter.start()
+    time.sleep(0.05)
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+
+    stats = cache.get_stats()
+    assert calls == ["text"]
+    assert stats["misses"] == 1
+    assert stats["waiter_hits"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_disk_store_drops_expired_rows_and_keeps_newest_within_cap(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "_PRUNE_EVERY_WRITES", 1)
+    cache = EmbeddingCache(cache_dir=str(tmp_path), max_entries=1, ttl=60, max_disk_entries=2)
+    for i in range(3):
+        cache.set("m", f"t{i}", [float(i)])
+        time.sleep(0.01)
+
+    reopened = EmbeddingCache(cache_dir=str(tmp_path), max_entries=1, ttl=60, max_disk_entries=2)
+    assert reopened.get("m", "t0") is None
+    assert reopened.get("m", "t2") == [2.0]
+
+    expired = EmbeddingCache(cache_dir=str(tmp_path), max_entries=1, ttl=0, max_disk_entries=2)
+    assert expired.get("m", "t2") is None
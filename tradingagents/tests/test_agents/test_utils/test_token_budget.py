@@ -0,0 +1,31 @@
+from tradingagents.agents.utils import token_budget
+from tradingagents.agents.utils.token_budget import fit_prompt_to_budget
+from tradingagents.graph.trading_graph import TradingAgentsGraph
+from tradingagents.llm_adapters.call_context import llm_call_context
+from tradingagents.llm_adapters.run_metrics import llm_run_metrics
+
+
+def _build(history, reports):
+    return f"{reports}\n{history}"
+
+
+def test_prompt_estimate_lands_in_node_metrics(monkeypatch):
+    monkeypatch.setitem(token_budget._BUDGETS, "Bull Researcher", 50)
+    with llm_call_context(node="Bull Researcher", task_id="budget-test"):
+        _, small = fit_prompt_to_budget("Bull Researcher", _build, {"history": "", "reports": "短报告"}, ["history"])
+        _, trimmed = fit_prompt_to_budget(
+            "Bull Researcher", _build, {"history": "多头：观点。" * 200, "reports": "短报告"}, ["history"]
+        )
+    with llm_call_context(node="Bull Researcher", task_id="budget-test"):
+        llm_run_metrics.record(latency=1.0, prompt_tokens=small + trimmed + 3)
+
+    result = TradingAgentsGraph._build_node_metrics(
+        None, {"Bull Researcher": 2.0}, llm_run_metrics.pop("budget-test")
+    )
+
+    node = result["node_metrics"]["Bull Researcher"]
+    assert trimmed < 80  # 裁剪后接近预算（拼接与重新分词有少量误差）
+    assert node["estimated_prompt_tokens"] == small + trimmed
+    assert node["budget_trims"] == 1
+    assert node["prompt_tokens"] == small + trimmed + 3
+    assert result["budget_trims"] == 1
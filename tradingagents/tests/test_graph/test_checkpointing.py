@@ -0,0 +1,34 @@
+import sys
+
+import pytest
+
+from tradingagents.graph import checkpointing
+
+
+@pytest.fixture(autouse=True)
+def reset_checkpointer(monkeypatch):
+    monkeypatch.setattr(checkpointing, "_checkpointer", None)
+    monkeypatch.setattr(checkpointing, "_checkpointer_checked", False)
+    monkeypatch.setenv("TA_CHECKPOINT_ENABLED", "true")
+
+
+def test_missing_backend_dependency_disables_checkpoints(monkeypatch, caplog):
+    monkeypatch.setenv("TA_CHECKPOINT_BACKEND", "redis")
+    # None 会让 import langgraph.checkpoint.redis 抛出 ImportError
+    monkeypatch.setitem(sys.modules, "langgraph.checkpoint.redis", None)
+
+    assert checkpointing.get_graph_checkpointer() is None
+    assert "langgraph-checkpoint-redis" in caplog.text
+
+
+def test_unknown_backend_disables_checkpoints(monkeypatch):
+    monkeypatch.setenv("TA_CHECKPOINT_BACKEND", "mongo")
+
+    assert checkpointing.get_graph_checkpointer() is None
+
+
+def test_memory_backend(monkeypatch):
+    pytest.importorskip("langgraph.checkpoint.memory")
+    monkeypatch.setenv("TA_CHECKPOINT_BACKEND", "memory")
+
+    assert checkpointing.get_graph_checkpointer() is not None
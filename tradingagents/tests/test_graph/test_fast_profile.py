@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("langgraph")
+
+from tradingagents.graph.conditional_logic import ConditionalLogic
+from tradingagents.graph.setup import GraphSetup
+
+
+def _tool_node(state):
+    return {}
+
+
+def _setup(config):
+    analysts = ["market", "fundamentals"]
+    return GraphSetup(
+        quick_thinking_llm=object(),
+        deep_thinking_llm=object(),
+        toolkit=object(),
+        tool_nodes={name: _tool_node for name in analysts},
+        bull_memory=None,
+        bear_memory=None,
+        trader_memory=None,
+        invest_judge_memory=None,
+        risk_manager_memory=None,
+        conditional_logic=ConditionalLogic(max_tool_calls=config.get("max_tool_calls", 3)),
+        config=config,
+    ).setup_graph(analysts)
+
+
+def test_fast_profile_skips_research_manager():
+    fast = _setup({"analysis_profile": "fast", "max_tool_calls": 1})
+    standard = _setup({})
+
+    assert "Research Manager" not in fast.nodes
+    assert "Risk Judge" in fast.nodes
+    assert "Research Manager" in standard.nodes
+
+
+def _state(prefix, count):
+    message = SimpleNamespace(content="", tool_calls=[{"name": "get_data", "id": "1", "args": {}}])
+    return {"messages": [message], f"{prefix}_tool_call_count": count}
+
+
+@pytest.mark.parametrize("max_tool_calls, count, expected", [
+    (1, 0, "tools_market"),
+    (1, 1, "Msg Clear Market"),
+    (3, 2, "tools_market"),
+])
+def test_market_respects_max_tool_calls(max_tool_calls, count, expected):
+    logic = ConditionalLogic(max_tool_calls=max_tool_calls)
+
+    assert logic.should_continue_market(_state("market", count)) == expected
+
+
+@pytest.mark.parametrize("max_tool_calls", [1, 3])
+def test_fundamentals_stops_after_one_tool_call(max_tool_calls):
+    logic = ConditionalLogic(max_tool_calls=max_tool_calls)
+
+    assert logic.should_continue_fundamentals(_state("fundamentals", 0)) == "tools_fundamentals"
+    assert logic.should_continue_fundamentals(_state("fundamentals", 1)) == "Msg Clear Fundamentals"
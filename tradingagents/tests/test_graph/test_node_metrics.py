@@ -0,0 +1,16 @@
+from tradingagents.graph.trading_graph import TradingAgentsGraph
+
+
+def test_non_llm_time_of_agent_nodes_is_other_time_not_tool_time():
+    result = TradingAgentsGraph._build_node_metrics(
+        None,
+        {"Market Analyst": 5.0, "tools_market": 2.0},
+        {"Market Analyst": {"llm_time": 3.5, "llm_calls": 1, "prompt_tokens": 100}},
+    )
+
+    analyst = result["node_metrics"]["Market Analyst"]
+    tools = result["node_metrics"]["tools_market"]
+    assert (analyst["tool_time"], analyst["other_time"]) == (0.0, 1.5)
+    assert (tools["tool_time"], tools["other_time"]) == (2.0, 0.0)
+    assert result["total_tool_time"] == 2.0
+    assert result["total_other_time"] == 1.5
@@ -0,0 +1,48 @@
+from tradingagents.graph.signal_processing import parse_signal_report
+
+
+def test_parse_basic_report():
+    parsed, reason = parse_signal_report("最终决策：**买入**\n目标价格：¥12.50\n置信度：85%\n风险评分：0.4")
+    assert reason == "ok"
+    assert parsed["action"] == "买入"
+    assert parsed["target_price"] == 12.5
+    assert parsed["confidence"] == 0.85
+    assert parsed["risk_score"] == 0.4
+
+
+def test_parse_thousands_separator():
+    parsed, _ = parse_signal_report("最终决策：买入\n目标价格：¥1,650.00\n置信度：0.8")
+    assert parsed["target_price"] == 1650.0
+
+
+def test_parse_thousands_separator_range():
+    parsed, _ = parse_signal_report("最终决策：持有\n目标价位：¥1,600-1,700")
+    assert parsed["target_price"] == 1650.0
+
+
+def test_ambiguous_percent_confidence_falls_back():
+    parsed, reason = parse_signal_report("最终决策：买入\n目标价格：¥12.50\n置信度：0.2%")
+    assert parsed is None
+    assert "置信度" in reason
+
+
+def test_implausibly_low_confidence_falls_back():
+    parsed, _ = parse_signal_report("最终决策：买入\n目标价格：¥12.50\n置信度：5%")
+    assert parsed is None
+
+
+def test_target_price_far_from_current_price_falls_back():
+    parsed, reason = parse_signal_report("当前价格：¥1,500.00\n最终决策：买入\n目标价格：¥1.0")
+    assert parsed is None
+    assert "当前价格" in reason
+
+
+def test_target_price_checked_against_given_current_price():
+    report = "最终决策：卖出\n目标价格：¥30"
+    assert parse_signal_report(report, current_price=10.0)[0] is None
+    assert parse_signal_report(report, current_price=28.0)[0]["target_price"] == 30.0
+
+
+def test_non_positive_target_price_falls_back():
+    parsed, _ = parse_signal_report("最终决策：买入\n目标价格：¥0")
+    assert parsed is None
@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+
+from tradingagents.llm_adapters import concurrency
+from tradingagents.llm_adapters.concurrency import (
+    AIMDLimiter,
+    ConcurrencyWaitExceeded,
+    LLMConcurrencyController,
+)
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(concurrency, "_RETRY_BASE_DELAY", 0.0)
+
+
+def test_acquire_gives_up_after_timeout():
+    limiter = AIMDLimiter("p/m", initial_limit=1)
+    limiter.acquire()
+    with pytest.raises(ConcurrencyWaitExceeded, match="p/m"):
+        limiter.acquire(timeout=0.05)
+    assert limiter.snapshot()["wait_exceeded"] == 1
+    assert limiter.in_flight == 1
+
+
+def test_acquire_wakes_when_slot_is_released():
+    limiter = AIMDLimiter("p/m", initial_limit=1)
+    limiter.acquire()
+    threading.Timer(0.05, limiter.release, args=(0.05, concurrency.OUTCOME_OK)).start()
+    assert limiter.acquire(timeout=5) >= 0.04
+
+
+def test_throttled_attempts_are_retried_and_seen_by_aimd():
+    controller = LLMConcurrencyController(initial_limit=8, max_retries=2)
+    attempts = []
+
+    def call(slot):
+        attempts.append(slot)
+        if len(attempts) < 3:
+            raise RateLimitError("429")
+        return "ok"
+
+    assert controller.call("p", "m", call) == "ok"
+    stats = controller.get_stats()["limiters"]["p/m"]
+    assert len(attempts) == 3
+    assert stats["throttled"] == 2
+    assert stats["retries"] == 2
+    assert stats["limit"] < 8
+
+
+def test_retries_are_bounded_and_skip_request_errors():
+    controller = LLMConcurrencyController(max_retries=1)
+    calls = []
+
+    def throttled(slot):
+        calls.append("throttled")
+        raise RateLimitError("429")
+
+    with pytest.raises(RateLimitError):
+        controller.call("p", "m", throttled)
+    assert calls == ["throttled", "throttled"]
+
+    def bad_request(slot):
+        calls.append("bad")
+        raise ValueError("invalid prompt")
+
+    with pytest.raises(ValueError):
+        controller.call("p", "m", bad_request)
+    assert calls.count("bad") == 1
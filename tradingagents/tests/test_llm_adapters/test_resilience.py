@@ -0,0 +1,44 @@
+import time
+
+from tradingagents.llm_adapters.resilience import LLMResiliencePolicy, mark_attempt_started
+
+
+def _warm_policy(delay=0.05):
+    policy = LLMResiliencePolicy(
+        hedging_enabled=True, hedge_min_delay=delay, hedge_budget=1.0, hedge_min_samples=1, executor_workers=4
+    )
+    policy._get_latency("p", "m").record(delay)
+    return policy
+
+
+def test_queue_wait_before_request_starts_does_not_trigger_hedge():
+    policy = _warm_policy()
+
+    def call(model, is_hedge):
+        if not is_hedge:
+            time.sleep(0.2)  # 等待并发槽位
+        mark_attempt_started()
+        return "hedge" if is_hedge else "primary"
+
+    assert policy.execute("p", "m", call) == "primary"
+    assert policy.get_stats()["hedged"] == 0
+
+
+def test_slow_primary_is_hedged_after_it_starts():
+    policy = _warm_policy()
+
+    def call(model, is_hedge):
+        mark_attempt_started()
+        if not is_hedge:
+            time.sleep(0.5)
+        return "hedge" if is_hedge else "primary"
+
+    assert policy.execute("p", "m", call) == "hedge"
+    stats = policy.get_stats()
+    assert stats["hedged"] == 1
+    assert stats["hedge_wins"] == 1
+
+
+def test_executor_is_sized_from_configuration():
+    policy = LLMResiliencePolicy(hedging_enabled=True, executor_workers=7)
+    assert policy._get_executor()._max_workers == 7
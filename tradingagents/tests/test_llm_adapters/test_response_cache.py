@@ -0,0 +1,63 @@
+import sqlite3
+import time
+
+from tradingagents.llm_adapters import response_cache
+from tradingagents.llm_adapters.response_cache import LLMResponseCache
+
+
+def _rows(cache):
+    return cache.get_stats()["rows"]
+
+
+def test_expired_entries_are_purged_on_open(tmp_path):
+    cache = LLMResponseCache(str(tmp_path), default_ttl=60)
+    cache.set("fresh", {"content": "a"})
+    cache.set("stale", {"content": "b"})
+    with cache._lock:
+        cache._conn.execute("UPDATE llm_cache SET expires_at = ? WHERE key = 'stale'", (time.time() - 1,))
+        cache._conn.commit()
+
+    reopened = LLMResponseCache(str(tmp_path), default_ttl=60)
+    assert _rows(reopened) == 1
+    assert reopened.get("fresh") == {"content": "a"}
+
+
+def test_least_recently_used_rows_are_evicted_over_cap(tmp_path, monkeypatch):
+    monkeypatch.setattr(response_cache, "_TRIM_EVERY_WRITES", 1)
+    cache = LLMResponseCache(str(tmp_path), default_ttl=60, max_rows=2)
+    cache.set("k1", {"content": "1"})
+    time.sleep(0.01)
+    cache.set("k2", {"content": "2"})
+    time.sleep(0.01)
+    assert cache.get("k1") == {"content": "1"}
+    time.sleep(0.01)
+    cache.set("k3", {"content": "3"})
+
+    assert _rows(cache) == 2
+    assert cache.get("k2") is None
+    assert cache.get("k1") == {"content": "1"}
+    assert cache.get("k3") == {"content": "3"}
+
+
+def test_cap_is_checked_in_batches_of_writes(tmp_path, monkeypatch):
+    monkeypatch.setattr(response_cache, "_TRIM_EVERY_WRITES", 3)
+    cache = LLMResponseCache(str(tmp_path), default_ttl=60, max_rows=1)
+    cache.set("k1", {"content": "1"})
+    cache.set("k2", {"content": "2"})
+    assert _rows(cache) == 2
+    cache.set("k3", {"content": "3"})
+    assert _rows(cache) == 1
+
+
+def test_cache_file_without_access_column_is_migrated(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "llm_responses.sqlite3"))
+    conn.execute(
+        "CREATE TABLE llm_cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, node TEXT, model TEXT, "
+        "created_at REAL NOT NULL, expires_at REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+    )
+    conn.commit()
+    conn.close()
+
+    cache = LLMResponseCache(str(tmp_path), default_ttl=60, max_rows=10)
+    cache.set("k1", {"content": "1"})
+    assert cache.get("k1") == {"content": "1"}